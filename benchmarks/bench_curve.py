@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import sys
+import random
+import timeit
+
+from common.curve import FanCurve
+
+#
+# bench_curve.py
+#
+#  Compares the per-segment loop previously used by `EditableGraph.getIntersection`
+#   against the compiled `FanCurve` lookup table
+#
+#  usage: python3 -m benchmarks.bench_curve
+#
+
+POINT_COUNTS = (4, 64, 1000)
+
+def legacy_intersection(pts, x):
+    """ `EditableGraph.getIntersection(x=...)` before the lookup table """
+    for i in range(0, len(pts) - 1):
+        x1 = pts[i][0]
+        x2 = pts[i+1][0]
+        y1 = pts[i][1]
+        y2 = pts[i+1][1]
+
+        if (( x >= x1 ) and ( x < x2)):
+            return (((x - x1) / (x2 - x1)) * (y2 - y1)) + y1
+
+    return 0
+
+def make_points(count):
+    """ a monotonic curve of `count` points spanning 0-`count * 2` degrees """
+    xs = sorted(random.sample(range(1, count * 2), count - 2))
+    ys = sorted(random.randint(0, 100) for _ in xs)
+
+    return [[0, 0]] + [list(p) for p in zip(xs, ys)] + [[count * 2, 100]]
+
+def main(number = 20000):
+    random.seed(0)
+
+    for count in POINT_COUNTS:
+        pts = make_points(count)
+        curve = FanCurve(pts)
+        temps = [random.randint(0, count * 2 - 1) for _ in range(number)]
+
+        # the table must agree with the loop everywhere inside the curve
+        assert all(abs(curve.speed(t) - legacy_intersection(curve.points, t)) < 1e-9 for t in temps)
+
+        legacy = timeit.timeit(lambda: [legacy_intersection(pts, t) for t in temps], number=1) / number
+        table = timeit.timeit(lambda: [curve.speed(t) for t in temps], number=1) / number
+        build = timeit.timeit(lambda: FanCurve(pts), number=20) / 20
+
+        print(f'{count:5d} points: loop {legacy * 1e9:9.0f} ns, table {table * 1e9:5.0f} ns, compile {build * 1e6:7.1f} us')
+
+        try:
+            import numpy as np
+        except ImportError:
+            continue
+
+        array = np.array(temps, dtype=float)
+        vector = timeit.timeit(lambda: curve.speeds(array), number=10) / 10 / number
+        print(f'{"":>12}  vectorized {vector * 1e9:5.1f} ns/temperature')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
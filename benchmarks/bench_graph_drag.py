@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import timeit
+
+os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
+
+import pyqtgraph as pg
+from PyQt5 import QtCore, QtWidgets
+
+from common.graphs import InitPlotWidget, EditableGraph, get_plotwidget_item, plotwidget_add_item
+
+#
+# bench_graph_drag.py
+#
+#  Per mouse move cost of `EditableGraph.mouseDragEvent` and of the item lookups
+#   done each tick, using the named item registry versus scanning `plotItem.items`
+#
+#  usage: QT_QPA_PLATFORM=offscreen python3 -m benchmarks.bench_graph_drag
+#
+
+class DragEvent:
+    """ the subset of `MouseDragEvent` used by `EditableGraph` """
+    def __init__(self, pos, start = False):
+        self.__pos = pos
+        self.__start = start
+
+    def button(self):
+        return QtCore.Qt.LeftButton
+    def isStart(self):
+        return self.__start
+    def isFinish(self):
+        return False
+    def buttonDownPos(self):
+        return self.__pos
+    def pos(self):
+        return self.__pos
+    def accept(self):
+        pass
+    def ignore(self):
+        pass
+
+def scan_plotwidget_item(parent, name = 'graph'):
+    """ `get_plotwidget_item` before the registry """
+    for item in parent.plotItem.items:
+        if (hasattr(item, '_name')) and (item._name == name):
+            return item
+
+    raise LookupError("The item '%s' was not found" % name)
+
+def scan_coord_widget(self):
+    """ `EditableGraph.getCoordWidget` before the registry """
+    for item in self.plotWidget.plotItem.items:
+        if (isinstance(item, pg.graphicsItems.TextItem.TextItem)):
+            return item
+
+def main(number = 2000):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    widget = pg.PlotWidget()
+    InitPlotWidget(widget, limits=(-3, 110))
+
+    # the main window adds its lines and markers after the curve
+    graph = EditableGraph(widget, data=[(0, 0), (39, 0), (40, 40), (65, 100)], staticPos=[100, 100])
+    for name in ('currTemp', 'currFan', 'tMax', 'targetFan'):
+        plotwidget_add_item(widget, pg.InfiniteLine(pos=0), name)
+
+    point = graph.data['pos'][2]
+    graph.mouseDragEvent(DragEvent(pg.Point(float(point[0]), float(point[1])), start=True))
+    move = DragEvent(pg.Point(float(point[0]), float(point[1])))
+
+    names = ('targetFan', 'targetFan', 'currTemp', 'currFan')
+
+    registry_lookup = timeit.timeit(lambda: [get_plotwidget_item(widget, n) for n in names], number=number) / number
+    scan_lookup = timeit.timeit(lambda: [scan_plotwidget_item(widget, n) for n in names], number=number) / number
+    print(f'tick lookups: scan {scan_lookup * 1e6:6.2f} us, registry {registry_lookup * 1e6:6.2f} us')
+
+    registry_drag = timeit.timeit(lambda: graph.mouseDragEvent(move), number=number) / number
+
+    graph.getCoordWidget = scan_coord_widget.__get__(graph)
+    scan_drag = timeit.timeit(lambda: graph.mouseDragEvent(move), number=number) / number
+    print(f'  drag move:  scan {scan_drag * 1e6:6.1f} us, registry {registry_drag * 1e6:6.1f} us')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
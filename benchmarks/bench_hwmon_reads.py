@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import time
+
+from common.hwmonInterface import HwMon
+from common.fakesysfs import make_fake_sysfs
+from common.backends import FakeSysfsBackend, set_backend
+
+#
+# bench_hwmon_reads.py
+#
+#  Compares the per-tick cost of the previous stat/open/read/close access pattern
+#   against the pooled `pread` descriptors used by `HwMon`
+#
+#  usage: python3 -m benchmarks.bench_hwmon_reads [TICKS]
+#
+
+# attributes touched by `_timer_update_tick` and `refresh_monitors` on every tick
+TICK_ATTRIBUTES = [
+    'pwm1_max', 'temp1_input', 'temp1_crit', 'pwm1_enable', 'pwm1', 'fan1_input',
+    'power1_average', 'in0_input', 'device/pp_dpm_mclk', 'device/pp_dpm_sclk',
+    'device/power_dpm_force_performance_level', 'device/pp_power_profile_mode',
+    'device/current_link_speed',
+    # monitor window
+    'temp1_input', 'fan1_input', 'device/pp_dpm_mclk', 'device/pp_dpm_sclk', 'power1_average',
+]
+
+def legacy_getvalue(base, path):
+    """ the access pattern `HwMon.__getvalue` used before the descriptor pool """
+    sysfs_file = f'{base}/{path}'
+    if not os.path.isfile(sysfs_file):
+        return "Unsupported"
+
+    return open(sysfs_file, "r").read().strip()
+
+def read_syscalls() -> int:
+    """ read syscalls issued by this process so far, -1 when /proc/self/io is unavailable """
+    try:
+        with open('/proc/self/io') as io:
+            for line in io:
+                if line.startswith('syscr:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return -1
+
+def measure(name, ticks, tick):
+    syscr = read_syscalls()
+    start = time.perf_counter()
+
+    for _ in range(ticks):
+        tick()
+
+    elapsed = time.perf_counter() - start
+    # the /proc read itself costs one open and two reads
+    syscr = (read_syscalls() - syscr - 2) / ticks if syscr >= 0 else float('nan')
+
+    print(f'{name:>8}: {elapsed / ticks * 1e6:8.1f} us/tick, {syscr:5.1f} read syscalls/tick')
+
+def main(ticks = 10000):
+    with tempfile.TemporaryDirectory() as root:
+        set_backend(FakeSysfsBackend(make_fake_sysfs(root)))
+
+        hwmon = HwMon()
+        base = hwmon.interface['path']
+        getvalue = hwmon._HwMon__getvalue
+
+        print(f'{len(TICK_ATTRIBUTES)} attribute reads per tick, {ticks} ticks')
+        # legacy: stat + open + fstat + ioctl + lseek + 2x read + close per attribute
+        measure('legacy', ticks, lambda: [legacy_getvalue(base, attr) for attr in TICK_ATTRIBUTES])
+        # pooled: a single pread per attribute once the pool is warm
+        measure('pooled', ticks, lambda: [getvalue(attr) for attr in TICK_ATTRIBUTES])
+
+        # snapshot: one `hwmon_sample` shared by the main and monitor windows
+        stats = hwmon.stats
+        measure('snapshot', ticks, hwmon.snapshot)
+        print(f'snapshot: {(hwmon.stats["reads"] - stats["reads"]) / ticks:.0f} attribute reads/tick, '
+              f'{(hwmon.stats["hits"] - stats["hits"]) / ticks:.0f} static cache hits/tick')
+
+        hwmon.close()
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
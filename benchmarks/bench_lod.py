@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import timeit
+
+import numpy as np
+
+from common.history import LodPyramid
+
+#
+# bench_lod.py
+#
+#  Cost of drawing a monitor graph versus the history length, handing every
+#   raw sample to pyqtgraph against drawing the `LodPyramid` envelope matching
+#   the width of the plot, each frame is rendered offscreen
+#
+#  usage: QT_QPA_PLATFORM=offscreen python3 -m benchmarks.bench_lod
+#
+
+HISTORY_LENGTHS = (60, 1000, 100000, 1000000)
+PLOT_WIDTH = 440
+
+def make_plot():
+    """ returns a `PlotWidget` holding a `PlotDataItem` as the monitor window does """
+    os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
+    import pyqtgraph as pg
+    from PyQt5 import QtWidgets
+
+    make_plot.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    widget = pg.PlotWidget()
+    widget.resize(PLOT_WIDTH, 120)
+
+    plot = pg.PlotDataItem()
+    widget.addItem(plot)
+
+    return widget, plot
+
+def main(number = 10):
+    widget, plot = make_plot()
+
+    for length in HISTORY_LENGTHS:
+        # a temperature-like random walk
+        values = np.cumsum(np.random.default_rng(0).normal(0, 0.5, length)) + 50
+        x = np.arange(length)
+
+        pyramid = LodPyramid(length)
+        build = timeit.timeit(lambda: pyramid.extend(values), number=1)
+        append = timeit.timeit(lambda: pyramid.append(50.0), number=1000) / 1000
+
+        def raw():
+            plot.setData(x, values)
+            widget.grab()
+
+        def lod():
+            plot.setData(*pyramid.envelope(widget.width()))
+            widget.grab()
+
+        rawTime = timeit.timeit(raw, number=number) / number
+        lodTime = timeit.timeit(lod, number=number) / number
+        points = len(pyramid.envelope(widget.width())[0])
+
+        print(f'{length:8d} samples: raw {rawTime * 1e3:8.2f} ms/frame, lod {lodTime * 1e3:6.2f} ms/frame ({points} points), '
+              f'append {append * 1e6:5.1f} us, load {build * 1e3:6.1f} ms')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
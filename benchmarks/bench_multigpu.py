@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import time
+
+from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR
+from common.poller import HwMonPoller
+from common.fakesysfs import make_fake_sysfs
+from common.backends import FakeSysfsBackend, set_backend
+
+#
+# bench_multigpu.py
+#
+#  Tick latency of `HwMonPoller` as the number of cards grows, reading every
+#   attribute of the cards one after another versus on the poller's thread pool
+#
+#  Files of a fake sysfs tree are answered instantly, a real amdgpu attribute read 
+#   blocks in the driver (often waiting on the SMU), `--latency` models that by
+#   sleeping in every `pread`. Without latency the pool only adds its overhead,
+#   `--latency 0` shows that cost
+#
+#  usage: python3 -m benchmarks.bench_multigpu [--latency MS]
+#
+
+CARD_COUNTS = (1, 2, 4, 8, 16)
+
+# typical duration of an amdgpu attribute read (seconds)
+DEFAULT_LATENCY = 0.0005
+
+def with_latency(pread, latency):
+    def slow_pread(fd, size, offset):
+        time.sleep(latency)
+        return pread(fd, size, offset)
+
+    return slow_pread
+
+def tick(poller, pooled):
+    """ reads every attribute of every card and applies the curves, as the first tick of the sampler does """
+    for scheduler in poller.schedulers.values():
+        scheduler.reset()
+
+    if pooled:
+        indices = poller.poll().keys()
+    else:
+        indices = [index for index, scheduler in poller.schedulers.items() if scheduler.poll()]
+
+    for index in indices:
+        poller.controllers[index].control(poller.schedulers[index].sample())
+
+def measure(fn, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+
+    return (time.perf_counter() - start) / ticks
+
+def main(latency = DEFAULT_LATENCY, ticks = 20):
+    pread = os.pread
+    points = DEFAULTCONFIG[CONFIG_POINT_VAR]
+
+    print(f'simulated sysfs read latency {latency * 1000:.2f}ms')
+
+    for cards in CARD_COUNTS:
+        with tempfile.TemporaryDirectory() as root:
+            set_backend(FakeSysfsBackend(make_fake_sysfs(root, cards)))
+
+            poller = HwMonPoller(points)
+
+            os.pread = with_latency(pread, latency) if latency else pread
+            try:
+                sequential = measure(lambda: tick(poller, False), ticks)
+                pooled = measure(lambda: tick(poller, True), ticks)
+            finally:
+                os.pread = pread
+
+            poller.close()
+
+        print(f'{cards:3d} cards: sequential {sequential * 1000:7.2f} ms/tick, pooled {pooled * 1000:7.2f} ms/tick')
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(float(args[args.index('--latency') + 1]) / 1000 if '--latency' in args else DEFAULT_LATENCY)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import time
+
+from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR
+from common.backends import SimulatedBackend, set_backend
+from common.trace import RecordingBackend, ReplayBackend
+from common.curve import FanCurve
+
+#
+# bench_replay.py
+#
+#  Records a simulated session to a trace, then replays it as fast as possible
+#   through `HwMonSampler._timer_update_tick` and `MonitorWindow.refresh_monitors`
+#   and reports the cost of each, a load generator for profiling the GUI tick
+#   without hardware, e.g. under `python3 -m cProfile`
+#
+#  usage: QT_QPA_PLATFORM=offscreen python3 -m benchmarks.bench_replay [ticks] [trace]
+#
+#  an existing trace, e.g. one recorded with `--record`, is replayed when given
+#
+
+RECORDED_SECONDS = 900
+
+def record(path):
+    """ records `RECORDED_SECONDS` of control ticks of a simulated card, one per simulated second """
+    from common.hwmonInterface import HwMon
+    from common.controller import FanController
+
+    clock = [0.0]
+    backend = set_backend(RecordingBackend(SimulatedBackend(1, clock=lambda: clock[0]), path, clock=lambda: clock[0]))
+
+    controller = FanController(HwMon(0), FanCurve(DEFAULTCONFIG[CONFIG_POINT_VAR]), enabled=True)
+
+    for second in range(RECORDED_SECONDS):
+        clock[0] = second
+        controller.tick()
+
+    controller.release()
+    backend.close()
+
+def main(ticks = 5000, path = None):
+    os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
+    from PyQt5 import QtWidgets
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    with tempfile.TemporaryDirectory() as root:
+        if path is None:
+            path = os.path.join(root, 'session.trace')
+            record(path)
+
+        backend = set_backend(ReplayBackend(path, speed=0))
+
+        from common.hwmonInterface import HwMon
+        from common.poller import HwMonPoller
+        from common.sampler import HwMonSampler
+        from common.scheduler import CONTROL_ATTRIBUTES
+        from ui.monitorwindow import MonitorWindow
+
+        hwmon = HwMon(0)
+
+        poller = HwMonPoller(DEFAULTCONFIG[CONFIG_POINT_VAR], [0])
+        poller.controllers[0].setEnabled(True)
+
+        sampler = HwMonSampler(poller, { 0: 1000 })
+        scheduler = poller.schedulers[0]
+
+        # ticks are driven from here, no timer is armed
+        sampler._schedule_next = lambda: None
+
+        monitor = MonitorWindow(hwmon)
+
+        sampler._timer_update_tick()
+
+        update = refresh = 0.0
+        temps = set()
+
+        for _ in range(ticks):
+            # every tick is a control tick, the other attributes follow their own periods
+            for attribute in CONTROL_ATTRIBUTES:
+                scheduler.expire(attribute)
+
+            start = time.perf_counter()
+            sampler._timer_update_tick()
+            update += time.perf_counter() - start
+
+            sample = scheduler.sample()
+            temps.add(sample.temp1_input_degrees)
+
+            start = time.perf_counter()
+            monitor.refresh_monitors(sample)
+            refresh += time.perf_counter() - start
+
+        print(f'replayed {ticks} ticks of {path} ({backend.duration:.0f}s recorded, temperatures {min(temps)}-{max(temps)}°C, {backend.writes} writes)')
+        print(f'_timer_update_tick {update / ticks * 1e6:8.1f} us/tick')
+        print(f'refresh_monitors   {refresh / ticks * 1e6:8.1f} us/tick')
+
+        monitor.close()
+        app.processEvents()
+
+if __name__ == '__main__':
+    main(*([int(arg) for arg in sys.argv[1:2]] + sys.argv[2:3]))
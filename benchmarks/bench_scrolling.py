@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import timeit
+
+import numpy as np
+
+from common.history import RingBuffer
+
+#
+# bench_scrolling.py
+#
+#  Cost of appending a monitor sample versus the history length, comparing the
+#   shift-by-copy previously used by `ScrollingGraph` against `RingBuffer`,
+#   with and without handing the data to a pyqtgraph `PlotDataItem`
+#
+#  usage: QT_QPA_PLATFORM=offscreen python3 -m benchmarks.bench_scrolling
+#
+
+HISTORY_LENGTHS = (60, 600, 3600, 86400)
+
+class ShiftBuffer:
+    """ the previous `ScrollingGraph.append_data` storage """
+    def __init__(self, length):
+        self.data = np.zeros(length)
+
+    def append(self, value):
+        self.data[:-1] = self.data[1:]
+        self.data[-1] = value
+
+    def view(self):
+        return self.data
+
+def make_plot():
+    """ returns a `PlotDataItem` inside a `PlotWidget`, or None without Qt """
+    try:
+        os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
+        import pyqtgraph as pg
+        from PyQt5 import QtWidgets
+    except ImportError:
+        return None
+
+    make_plot.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    make_plot.widget = pg.PlotWidget()
+
+    plot = pg.PlotDataItem()
+    make_plot.widget.addItem(plot)
+
+    return plot
+
+def main(number = 2000):
+    plot = make_plot()
+
+    for length in HISTORY_LENGTHS:
+        x = np.arange(length)
+        results = []
+
+        for buffer in (ShiftBuffer(length), RingBuffer(length)):
+            results.append(timeit.timeit(lambda: buffer.append(1), number=number) / number)
+
+            if plot is not None:
+                def render():
+                    buffer.append(1)
+                    plot.setData(x, buffer.view())
+
+                results.append(timeit.timeit(render, number=number // 10) / (number // 10))
+
+        line = f'{length:6d} samples: shift {results[0] * 1e6:8.2f} us'
+        if plot is not None:
+            line += f' (+render {results[1] * 1e6:8.1f} us), ring {results[2] * 1e6:6.2f} us (+render {results[3] * 1e6:8.1f} us)'
+        else:
+            line += f', ring {results[1] * 1e6:6.2f} us'
+
+        print(line)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import subprocess
+import resource
+import time
+
+#
+# bench_startup.py
+#
+#  Compares start-up time and peak resident memory of the modules loaded by
+#   `--daemon` against those loaded by the GUI, each in a fresh interpreter
+#
+#  usage: python3 -m benchmarks.bench_startup
+#
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'daemon': 'import common.daemon',
+    'gui': "import os; os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'; "
+           "import pyqtgraph, numpy, ui.mainwindow, ui.monitorwindow, common.graphs; "
+           "from PyQt5 import QtWidgets",
+}
+
+def measure(code):
+    """ returns (seconds, peak rss in KiB) for running `code` in a new interpreter """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    # each run is measured in its own child so the maximum is not shared
+    return elapsed, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+def main():
+    for name, code in MODES.items():
+        # run a child per mode so RUSAGE_CHILDREN only reflects that mode
+        pid = os.fork()
+        if pid == 0:
+            try:
+                elapsed, rss = measure(code)
+                print(f'{name:>8}: {elapsed * 1000:7.1f} ms, {rss / 1024:6.1f} MiB peak RSS')
+            except RuntimeError as e:
+                print(f'{name:>8}: unavailable ({e})')
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+#
+# suite.py
+#
+#  Times the hot paths of a tick offline, against a fake sysfs tree and the
+#   offscreen Qt platform, and writes the results as JSON so runs can be
+#   compared against each other:
+#
+#   hwmon       per-attribute `HwMon` reads and a full snapshot
+#   tick        `HwMonSampler._timer_update_tick` and `MonitorWindow.refresh_monitors`
+#   parse       pp_dpm_sclk and pp_power_profile_mode tables, uncached and cached
+#   curve       `FanCurve` evaluation and compilation
+#   graph       `EditableGraph.addPoint` and `removePoint` at large point counts
+#   scrolling   `ScrollingGraph.append_data` at growing history lengths
+#   timings     cost of a `PhaseTimings.timed` phase, disabled and enabled
+#
+#  usage: python3 -m benchmarks.suite [-o results.json] [--compare baseline.json] [-k FILTER] [--quick]
+#
+#  with `--compare` a case whose fastest repeat grew by more than `--threshold`
+#   is a regression and the exit status is 1, the fastest repeat is the least
+#   disturbed by the rest of the machine
+#
+
+SUITE_VERSION = 1
+
+# per-call times growing by more than this fraction are reported as regressions
+DEFAULT_THRESHOLD = 0.25
+
+# target duration of a single repeat of a case (seconds)
+REPEAT_SECONDS = 0.1
+
+POINT_COUNTS = (4, 64, 1024)
+HISTORY_LENGTHS = (60, 3600, 86400)
+
+CASES = []
+
+def case(group: str):
+    """ registers a generator of `(name, timed)` pairs, `timed(number)` returns the seconds spent in `number` calls """
+    def register(fn):
+        CASES.append((group, fn))
+        return fn
+
+    return register
+
+def calls(fn):
+    """ `timed` for a plain callable """
+    def timed(number):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+
+        return time.perf_counter() - start
+
+    return timed
+
+class fixtures:
+    """
+    state shared by the cases, the fake sysfs tree and Qt are set up on first use
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self.__app = None
+        self.__hwmon = None
+
+    @property
+    def app(self):
+        if self.__app is None:
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
+            from PyQt5 import QtWidgets
+
+            self.__app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+        return self.__app
+
+    @property
+    def hwmon(self):
+        if self.__hwmon is None:
+            from common.fakesysfs import make_fake_sysfs
+            from common.backends import FakeSysfsBackend, set_backend
+            from common.hwmonInterface import HwMon
+
+            set_backend(FakeSysfsBackend(make_fake_sysfs(self.root)))
+            self.__hwmon = HwMon()
+
+        return self.__hwmon
+
+def make_points(count: int, spacing: int = 1) -> list:
+    """ a monotonic curve of `count` points, `spacing` degrees apart on average """
+    rng = random.Random(count)
+
+    xs = sorted(rng.sample(range(1, count * 2 * spacing), count - 2))
+    ys = sorted(rng.randint(0, 100) for _ in xs)
+
+    return [[0, 0]] + [list(p) for p in zip(xs, ys)] + [[count * 2 * spacing, 100]]
+
+@case('hwmon')
+def hwmon_cases(fx):
+    from common.hwmonInterface import SNAPSHOT_ATTRIBUTES
+
+    hwmon = fx.hwmon
+
+    for attribute in SNAPSHOT_ATTRIBUTES:
+        yield f'read[{attribute}]', calls(lambda attribute=attribute: hwmon.read(attribute))
+
+    yield 'snapshot', calls(hwmon.snapshot)
+
+@case('tick')
+def tick_cases(fx):
+    from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR
+    from common.poller import HwMonPoller
+    from common.sampler import HwMonSampler
+    from common.scheduler import CONTROL_ATTRIBUTES
+    from ui.monitorwindow import MonitorWindow
+
+    fx.app
+    index = fx.hwmon.index
+
+    poller = HwMonPoller(DEFAULTCONFIG[CONFIG_POINT_VAR], [index])
+    poller.controllers[index].setEnabled(True)
+
+    sampler = HwMonSampler(poller, { index: 1000 })
+    scheduler = poller.schedulers[index]
+
+    # ticks are driven from here, no timer is armed
+    sampler._schedule_next = lambda: None
+    sampler._timer_update_tick()
+
+    def update_tick():
+        for attribute in CONTROL_ATTRIBUTES:
+            scheduler.expire(attribute)
+
+        sampler._timer_update_tick()
+
+    yield '_timer_update_tick', calls(update_tick)
+
+    monitor = MonitorWindow(fx.hwmon)
+    sample = scheduler.sample()
+
+    yield 'refresh_monitors', calls(lambda: monitor.refresh_monitors(sample))
+
+    poller.release()
+    poller.close()
+    monitor.close()
+
+@case('parse')
+def parse_cases(fx):
+    from common.fakesysfs import PP_POWER_PROFILE_MODE_TABLES, DEVICE_ATTRIBUTES
+    from common.hwmonInterface import parse_pp_dpm_levels, parse_pp_power_profile_mode
+
+    tables = { 'pp_dpm_sclk': (parse_pp_dpm_levels, DEVICE_ATTRIBUTES['pp_dpm_sclk']) }
+    tables.update({ f'pp_power_profile_mode[{name}]': (parse_pp_power_profile_mode, table) for name, table in PP_POWER_PROFILE_MODE_TABLES.items() })
+
+    for name, (parse, table) in tables.items():
+        yield name, calls(lambda parse=parse, table=table: parse.__wrapped__(table))
+        yield f'{name}.cached', calls(lambda parse=parse, table=table: parse(table))
+
+@case('curve')
+def curve_cases(fx):
+    from common.curve import FanCurve
+
+    for count in POINT_COUNTS:
+        points = make_points(count)
+        curve = FanCurve(points)
+
+        # the lookup table makes the cost independent of the temperature, take one mid-curve
+        yield f'speed[{count}]', calls(lambda curve=curve, temp=count: curve.speed(temp))
+        yield f'compile[{count}]', calls(lambda points=points: FanCurve(points))
+
+@case('graph')
+def graph_cases(fx):
+    fx.app
+    import pyqtgraph as pg
+    from common.graphs import InitPlotWidget, EditableGraph
+
+    for count in POINT_COUNTS:
+        widget = pg.PlotWidget()
+        InitPlotWidget(widget, limits=(-3, 110))
+
+        # spaced so the largest gap always leaves room for a new point
+        graph = EditableGraph(widget, data=make_points(count, EditableGraph.MIN_POINT_DISTANCE * 2))
+
+        def alternate(first, second):
+            """ times `first`, `second` restores the point count untimed """
+            def timed(number):
+                elapsed = 0.0
+                for _ in range(number):
+                    start = time.perf_counter()
+                    first()
+                    elapsed += time.perf_counter() - start
+                    second()
+
+                return elapsed
+
+            return timed
+
+        yield f'addPoint[{count}]', alternate(graph.addPoint, graph.removePoint)
+        yield f'removePoint[{count}]', alternate(graph.removePoint, graph.addPoint)
+
+@case('scrolling')
+def scrolling_cases(fx):
+    fx.app
+    import pyqtgraph as pg
+    import numpy as np
+    from common.graphs import ScrollingGraph
+
+    for length in HISTORY_LENGTHS:
+        widget = pg.PlotWidget()
+        widget.resize(440, 120)
+
+        graph = ScrollingGraph(widget, [], 120, length)
+        graph.extend_data(np.cumsum(np.random.default_rng(0).normal(0, 0.5, length)) + 50)
+
+        yield f'append_data[{length}]', calls(lambda graph=graph: graph.append_data(50))
+
+@case('timings')
+def timings_cases(fx):
+    from common.timings import PhaseTimings
+
+    timings = PhaseTimings()
+
+    def phase():
+        pass
+
+    timed = timings.timed('phase')(phase)
+
+    yield 'plain', calls(phase)
+    yield 'disabled', calls(timed)
+
+    timings.enabled = True
+    yield 'enabled', calls(timed)
+
+def measure(timed, repeat: int) -> dict:
+    """ per-call statistics of `timed` in microseconds, the number of calls is calibrated first """
+    number = 1
+    while True:
+        elapsed = timed(number)
+        if (elapsed >= REPEAT_SECONDS / 10) or (number >= 1000000):
+            break
+        number *= 10
+
+    number = max(1, int(number * (REPEAT_SECONDS / max(elapsed, 1e-9))))
+    times = [timed(number) / number * 1e6 for _ in range(repeat)]
+
+    return {
+        'median_us': statistics.median(times),
+        'min_us': min(times),
+        'max_us': max(times),
+        'number': number,
+        'repeat': repeat,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(filters: list, repeat: int) -> dict:
+    results = {}
+
+    with tempfile.TemporaryDirectory() as root:
+        fx = fixtures(root)
+
+        for group, generate in CASES:
+            for name, timed in generate(fx):
+                name = f'{group}.{name}'
+
+                if filters and not any(f in name for f in filters):
+                    continue
+
+                results[name] = measure(timed, repeat)
+                print(f'{name:48} {results[name]["median_us"]:12.2f} us', file=sys.stderr)
+
+    return {
+        'version': SUITE_VERSION,
+        'time': time.time(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """ prints the ratio of every case found in both reports, returns the regressed cases """
+    regressions = []
+
+    print(f'\ncompared to {baseline.get("revision")} (regression above +{threshold:.0%})', file=sys.stderr)
+
+    for name, result in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+
+        ratio = result['min_us'] / max(previous['min_us'], 1e-9)
+        regressed = ratio > (1 + threshold)
+
+        if regressed:
+            regressions.append(name)
+
+        print(f'{name:48} {previous["min_us"]:12.2f} -> {result["min_us"]:12.2f} us {ratio:6.2f}x{"  REGRESSION" if regressed else ""}', file=sys.stderr)
+
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='times the tick hot paths and writes the results as JSON')
+    parser.add_argument('-o', '--output', default=None, help='write the JSON results to OUTPUT instead of stdout')
+    parser.add_argument('-k', dest='filters', action='append', default=[], help='only run cases whose name contains FILTER')
+    parser.add_argument('--compare', default=None, metavar='BASELINE', help='JSON results of a previous run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='fraction a case may grow by before it is a regression')
+    parser.add_argument('--quick', action='store_true', help='fewer repeats, noisier results')
+    args = parser.parse_args(argv)
+
+    report = run(args.filters, 3 if args.quick else 7)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(report, json.load(f), args.threshold):
+                return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from common.curve import FanCurve
+from common.config import Config, CONFIG_ADAPTIVE_VAR, CONFIG_INTERVAL_MIN_VAR, CONFIG_INTERVAL_MAX_VAR
+
+#
+# adaptive.py
+#
+#  Adapts the control period to how fast the temperature is rising and how
+#   far it is below the next knee of the fan curve
+#
+
+LOG = logging.getLogger(__name__)
+
+# the period is chosen so the temperature rises at most this much between two ticks (°C)
+ADAPTIVE_TEMP_STEP = 1.0
+
+# fastest rise expected from a stable temperature, e.g. after a load step (°C/s),
+# bounds the period so a tick happens before the next knee of the curve can be reached
+ADAPTIVE_MAX_SLOPE = 2.0
+
+# weight of the newest slope measurement in the smoothed slope
+ADAPTIVE_SLOPE_SMOOTHING = 0.5
+
+# the period grows by at most this factor per tick, it shrinks without limit
+ADAPTIVE_MAX_GROWTH = 1.5
+
+# relative change of the period which is logged at info level
+ADAPTIVE_LOG_CHANGE = 0.25
+
+class AdaptiveInterval:
+    """
+    Control period which shortens while `temp1_input` rises quickly or is just
+    below a knee of the fan curve, and lengthens while the temperature is stable
+
+    The period is bounded by `minimum` and `maximum` seconds, every call of
+    `update` with a new temperature returns the period until the next tick
+    """
+    def __init__(self, minimum: float, maximum: float, initial: float = None):
+        if (minimum <= 0) or (maximum < minimum):
+            raise ValueError("bounds must satisfy 0 < minimum <= maximum")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.period = min(max(initial if initial is not None else maximum, minimum), maximum)
+
+        self.slope = 0.0
+        self.lastTemp = None
+        self.lastTime = None
+        self.loggedPeriod = self.period
+
+    def update(self, temp: float, now: float, curve: FanCurve = None) -> float:
+        """ takes the temperature `temp` measured at monotonic time `now` and returns the next period """
+        if (self.lastTime is not None) and (now > self.lastTime):
+            slope = (temp - self.lastTemp) / (now - self.lastTime)
+            self.slope += ADAPTIVE_SLOPE_SMOOTHING * (slope - self.slope)
+
+        self.lastTemp = temp
+        self.lastTime = now
+
+        # only a rising temperature risks an overshoot, it may rise by at most
+        # `ADAPTIVE_TEMP_STEP` until the next tick, a falling one can wait
+        rising = max(self.slope, 0.0)
+        target = (ADAPTIVE_TEMP_STEP / rising) if (rising > 0) else self.maximum
+
+        # unless cooling, the next tick happens before a load step starting now could
+        # reach the next knee, a cooling temperature moves away from that knee
+        if (curve is not None) and (self.slope >= 0):
+            target = min(target, curve.knee_headroom(temp) / ADAPTIVE_MAX_SLOPE)
+
+        # the period shrinks at once, it only grows by `ADAPTIVE_MAX_GROWTH` per tick
+        target = min(target, self.period * ADAPTIVE_MAX_GROWTH)
+        self.period = min(max(target, self.minimum), self.maximum)
+
+        if (abs(self.period - self.loggedPeriod) > (self.loggedPeriod * ADAPTIVE_LOG_CHANGE)):
+            LOG.info(f"control period {self.period * 1000:.0f}ms ({1 / self.period:.2f}Hz) at {temp}°C rising {self.slope:.2f}°C/s")
+            self.loggedPeriod = self.period
+
+        return self.period
+
+def adaptive_from_config(config: Config, interval: int):
+    """
+    `AdaptiveInterval` for the bounds in `config` starting at `interval` ms, the
+    interval of the card's profile, `None` unless the adaptive mode is enabled
+    """
+    if not config.getValue(CONFIG_ADAPTIVE_VAR):
+        return None
+
+    return AdaptiveInterval(
+        int(config.getValue(CONFIG_INTERVAL_MIN_VAR)) / 1000,
+        int(config.getValue(CONFIG_INTERVAL_MAX_VAR)) / 1000,
+        int(interval) / 1000
+    )
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+import os
+import math
+import time
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+
+from common.setperms import PERMISSIONS
+from common import fakesysfs
+
+#
+# backends.py
+#
+#  Storage behind `HwMon`, the real sysfs tree, a fake sysfs directory tree or
+#   an in-memory simulation of amdgpu cards. The backend is chosen by the
+#   `BACKEND_ENV_VAR` environment variable (or `--backend`), which takes:
+#
+#   sysfs               the real /sys/class/hwmon/ (default)
+#   fake[:DIR]          the fake sysfs tree at DIR, one card is created when omitted
+#   sim[:CARDS]         CARDS simulated cards (default 1)
+#   replay:FILE[@SPEED] the trace FILE replayed SPEED times faster than it was
+#                       recorded (default 1), `max` replays it as fast as it is read
+#
+#  Every read and write is recorded to a trace, see `common.trace`, when the
+#   `RECORD_ENV_VAR` environment variable (or `--record`) names a file
+#
+
+LOG = logging.getLogger(__name__)
+
+HWMON_SYSFS_DIR = "/sys/class/hwmon/"
+SUPPORTED_SYSFS_NAMES = ['amdgpu']
+
+BACKEND_ENV_VAR = "AMDGPU_FAN_BACKEND"
+RECORD_ENV_VAR = "AMDGPU_FAN_RECORD"
+
+# sysfs attributes are at most one page, `pread` of this size returns the whole value
+SYSFS_READ_SIZE = 4096
+
+class HwMonBackend(ABC):
+    """
+    Reads and writes the attributes of hwmon interfaces
+
+    Interfaces are the `{'name', 'path'}` entries returned by `discover`,
+    attributes are paths relative to the interface such as `pwm1` or
+    `device/pp_dpm_sclk`. A backend may be shared by several `HwMon` from
+    several threads
+    """
+    @abstractmethod
+    def discover(self) -> dict:
+        """ every supported interface by index """
+
+    @abstractmethod
+    def read(self, path: str, attribute: str):
+        """ value of `attribute` of the interface at `path`, `None` when it is not provided """
+
+    @abstractmethod
+    def write(self, path: str, attribute: str, value: str):
+        """ writes `value` to `attribute`, raises `OSError` on failure """
+
+    def release(self, path: str):
+        """ drops any resource held for the interface at `path` """
+
+    def close(self):
+        """ drops every resource held """
+
+class SysfsBackend(HwMonBackend):
+    """
+    The hwmon tree below `root`, attributes are read through a pool of
+    read-only descriptors with `pread`, so a read costs a single syscall
+    """
+    def __init__(self, root: str = HWMON_SYSFS_DIR):
+        self.root = root
+
+        self.__fds = {}
+        self.__lock = threading.Lock()
+
+    def discover(self) -> dict:
+        valid_interfaces = {}
+
+        # look at every device in the sysfs directory
+        for sysfs_dev in os.scandir(self.root):
+
+            # we only want subdirectories, not files here
+            if not sysfs_dev.is_dir():
+                continue
+
+            # check if the name exists, and ensure it matches a valid device node
+            if os.path.isfile(f'{sysfs_dev.path}/name'):
+                with open(f'{sysfs_dev.path}/name') as name_file:
+                    sysfs_name = name_file.read().strip()
+
+                if (sysfs_name in SUPPORTED_SYSFS_NAMES):
+                    valid_interfaces[len(valid_interfaces)] = {
+                        'name': sysfs_name,
+                        'path': sysfs_dev.path
+                    }
+
+        return valid_interfaces
+
+    def __getfd(self, file: str):
+        """
+        returns the pooled descriptor for `file`, opening it on first use,
+        `None` is pooled for attributes the interface does not provide
+        """
+        try:
+            return self.__fds[file]
+        except KeyError:
+            pass
+
+        with self.__lock:
+            if file in self.__fds:
+                return self.__fds[file]
+
+            try:
+                fd = os.open(file, os.O_RDONLY)
+            except (FileNotFoundError, IsADirectoryError):
+                fd = None
+
+            self.__fds[file] = fd
+            return fd
+
+    def read(self, path: str, attribute: str):
+        fd = self.__getfd(f'{path}/{attribute}')
+        if fd is None:
+            return None
+
+        # sysfs regenerates the attribute on every read from offset 0
+        return os.pread(fd, SYSFS_READ_SIZE, 0).decode().strip()
+
+    def ensure_writable(self, file: str):
+        PERMISSIONS.ensure_writable(file)
+
+    def write(self, path: str, attribute: str, value: str):
+        file = f'{path}/{attribute}'
+
+        self.ensure_writable(file)
+
+        try:
+            with open(file, "w") as sysfs_file:
+                sysfs_file.write(str(value))
+        except OSError as e:
+            # the path is asked for again on the next write
+            PERMISSIONS.forget(file, e)
+            raise
+
+    def release(self, path: str):
+        prefix = f'{path}/'
+
+        with self.__lock:
+            for file in [f for f in self.__fds if f.startswith(prefix)]:
+                fd = self.__fds.pop(file)
+                if fd is not None:
+                    os.close(fd)
+
+    def close(self):
+        with self.__lock:
+            for fd in self.__fds.values():
+                if fd is not None:
+                    os.close(fd)
+
+            self.__fds.clear()
+
+class FakeSysfsBackend(SysfsBackend):
+    """
+    A directory tree laid out like the hwmon tree, see `fakesysfs`, the files
+    are owned by the user so writing needs no permission helper
+    """
+    def __init__(self, root: str = None, cards: int = 1):
+        if root is None:
+            self.tempdir = tempfile.TemporaryDirectory(prefix='fakesysfs-')
+            root = fakesysfs.make_fake_sysfs(self.tempdir.name, cards)
+
+        super().__init__(root)
+
+    def ensure_writable(self, file: str):
+        pass
+
+# thermal model of a simulated card
+SIM_AMBIENT = 25.0          # °C
+SIM_RESISTANCE = 0.35       # °C/W with the fan stopped
+SIM_FAN_COOLING = 3.0       # the resistance is divided by 1 + SIM_FAN_COOLING at full speed
+SIM_THERMAL_TAU = 40.0      # s
+SIM_FAN_TAU = 1.5           # s
+SIM_FAN_MAX_RPM = 3300
+SIM_IDLE_WATTS = 20.0
+SIM_LOAD_WATTS = 180.0
+SIM_LOAD_PERIOD = 240.0     # the load is applied during the second half of each period (s)
+SIM_STEP = 0.25             # integration step (s)
+SIM_MAX_GAP = 600.0         # longer gaps between reads are not simulated (s)
+
+class simulated_card:
+    """
+    attributes and thermal state of a card of `SimulatedBackend`
+    """
+    def __init__(self, index: int, now: float):
+        self.attributes = dict(fakesysfs.HWMON_ATTRIBUTES)
+        self.attributes.update({ f'device/{name}': value for name, value in fakesysfs.DEVICE_ATTRIBUTES.items() })
+        self.attributes.update({ f'device/power/{name}': value for name, value in fakesysfs.POWER_ATTRIBUTES.items() })
+        self.attributes['device/uevent'] = fakesysfs.device_uevent(index)
+
+        self.temp = SIM_AMBIENT + (SIM_IDLE_WATTS * SIM_RESISTANCE)
+        self.fan = 0.0
+        self.time = now
+
+        # cards do not load up in lockstep
+        self.phase = index * SIM_LOAD_PERIOD / 7
+
+    def watts(self, now: float) -> float:
+        return SIM_LOAD_WATTS if (((now + self.phase) % SIM_LOAD_PERIOD) >= (SIM_LOAD_PERIOD / 2)) else SIM_IDLE_WATTS
+
+    def target_fan(self) -> float:
+        """ fan speed in percent requested by the driver or by `pwm1` """
+        if (self.attributes['pwm1_enable'] == '1'):
+            return int(self.attributes['pwm1']) / int(self.attributes['pwm1_max']) * 100
+
+        # the firmware curve in automatic mode
+        return min(max((self.temp - 40) * 3, 20), 100)
+
+    def advance(self, now: float):
+        """ integrates the thermal model up to `now` """
+        self.time = max(self.time, now - SIM_MAX_GAP)
+
+        while (self.time < now):
+            step = min(SIM_STEP, now - self.time)
+
+            self.fan += (self.target_fan() - self.fan) * (1 - math.exp(-step / SIM_FAN_TAU))
+
+            resistance = SIM_RESISTANCE / (1 + (SIM_FAN_COOLING * self.fan / 100))
+            equilibrium = SIM_AMBIENT + (self.watts(self.time) * resistance)
+            self.temp += (equilibrium - self.temp) * (1 - math.exp(-step / SIM_THERMAL_TAU))
+
+            self.time += step
+
+        watts = self.watts(now)
+
+        self.attributes['temp1_input'] = str(int(self.temp * 1000))
+        self.attributes['fan1_input'] = str(int(self.fan / 100 * SIM_FAN_MAX_RPM))
+        self.attributes['power1_average'] = str(int(watts * 1000000))
+
+        if (self.attributes['pwm1_enable'] != '1'):
+            self.attributes['pwm1'] = str(int(self.fan / 100 * int(self.attributes['pwm1_max'])))
+
+class SimulatedBackend(HwMonBackend):
+    """
+    `cards` amdgpu cards kept in memory, the load alternates between idle and
+    full load, the temperature follows a first order thermal model which
+    reacts to the fan speed set through `pwm1`, or to the automatic curve
+    """
+    def __init__(self, cards: int = 1, clock = time.monotonic):
+        self.clock = clock
+
+        now = clock()
+        self.cards = { f'sim://hwmon{index}': simulated_card(index, now) for index in range(cards) }
+
+        self.__lock = threading.Lock()
+
+    def discover(self) -> dict:
+        return { index: { 'name': card.attributes['name'], 'path': path } for index, (path, card) in enumerate(self.cards.items()) }
+
+    def read(self, path: str, attribute: str):
+        card = self.cards.get(path)
+        if (card is None) or (attribute not in card.attributes):
+            return None
+
+        with self.__lock:
+            card.advance(self.clock())
+            return card.attributes[attribute].strip()
+
+    def write(self, path: str, attribute: str, value: str):
+        card = self.cards.get(path)
+        if (card is None) or (attribute not in card.attributes):
+            raise FileNotFoundError(f'{path}/{attribute}')
+
+        with self.__lock:
+            card.advance(self.clock())
+            card.attributes[attribute] = str(value)
+
+def backend_from_spec(spec: str) -> HwMonBackend:
+    """ creates the backend described by `spec`, see the top of this module """
+    kind, _, argument = (spec or 'sysfs').partition(':')
+
+    if (kind == 'sysfs'):
+        return SysfsBackend(argument or HWMON_SYSFS_DIR)
+    if (kind == 'fake'):
+        return FakeSysfsBackend(argument or None)
+    if (kind == 'sim'):
+        return SimulatedBackend(int(argument or 1))
+    if (kind == 'replay') and argument:
+        from common.trace import ReplayBackend
+
+        path, _, speed = argument.rpartition('@')
+        if not path:
+            path, speed = argument, '1'
+
+        return ReplayBackend(path, 0 if (speed == 'max') else float(speed))
+
+    raise ValueError(f'unknown backend {spec!r}, expected sysfs, fake[:DIR], sim[:CARDS] or replay:FILE[@SPEED]')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> HwMonBackend:
+    """
+    the backend shared by every `HwMon`, created from `BACKEND_ENV_VAR` on first
+    use and recorded to the trace named by `RECORD_ENV_VAR`
+    """
+    global _backend
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = backend_from_spec(os.environ.get(BACKEND_ENV_VAR))
+            LOG.debug(f'using {type(_backend).__name__}')
+
+            if os.environ.get(RECORD_ENV_VAR):
+                from common.trace import RecordingBackend
+
+                _backend = RecordingBackend(_backend, os.environ[RECORD_ENV_VAR])
+                LOG.info(f'recording hwmon trace to {_backend.path}')
+
+        return _backend
+
+def set_backend(backend: HwMonBackend) -> HwMonBackend:
+    """ replaces the shared backend, the previous one is closed """
+    global _backend
+
+    with _backend_lock:
+        if (_backend is not None) and (_backend is not backend):
+            _backend.close()
+
+        _backend = backend
+        return backend
@@ -1,16 +1,31 @@
 # -*- coding: utf-8 -*-
 import json
 import os
+import atexit
+import tempfile
+import threading
 
 CONFIG_FILE = "config.json"
+CONFIG_ENV_VAR = "AMDGPU_FAN_CONFIG"
+
+# changes are written once nothing changed for this long (seconds)
+CONFIG_SAVE_DELAY = 2.0
 
 CONFIG_CARD_VAR = "card"
 CONFIG_POINT_VAR = "points"
 CONFIG_INDEX_VAR = "${index}"
 CONFIG_INTERVAL_VAR = "interval"
 CONFIG_LOGGING_VAR = "logging"
+CONFIG_HISTORY_VAR = "history"
+CONFIG_ADAPTIVE_VAR = "adaptive"
+CONFIG_INTERVAL_MIN_VAR = "interval_min"
+CONFIG_INTERVAL_MAX_VAR = "interval_max"
+CONFIG_HISTORY_DAYS_VAR = "history_days"
+CONFIG_METRICS_PORT_VAR = "metrics_port"
+CONFIG_PROFILES_VAR = "profiles"
+CONFIG_SLOTS_VAR = "slots"
 
-# requires tweaking to store fan profile based on card index
+# `points` and `interval` apply to every card without a profile in `profiles`
 DEFAULTCONFIG = {
     CONFIG_CARD_VAR : "0",
     CONFIG_POINT_VAR : (
@@ -20,25 +35,97 @@ DEFAULTCONFIG = {
         (65, 100)
     ),
     CONFIG_INTERVAL_VAR : "2500",
-    CONFIG_LOGGING_VAR : False
+    CONFIG_LOGGING_VAR : False,
+    # number of monitor samples shown, one sample per second
+    CONFIG_HISTORY_VAR : "60",
+    # adapt the interval to the temperature slope within these bounds (ms)
+    CONFIG_ADAPTIVE_VAR : False,
+    CONFIG_INTERVAL_MIN_VAR : "500",
+    CONFIG_INTERVAL_MAX_VAR : "5000",
+    # days of monitor samples kept on disk per card, 0 disables the history file
+    CONFIG_HISTORY_DAYS_VAR : "7",
+    # serve Prometheus metrics on localhost at this port, 0 disables the exporter
+    CONFIG_METRICS_PORT_VAR : "0",
+    # fan profile of every card by PCI slot, see `common.profiles`
+    CONFIG_PROFILES_VAR : {},
+    # PCI slots of every card found so far
+    CONFIG_SLOTS_VAR : []
 }
 
+def data_dir() -> str:
+    """ directory holding the files written at runtime, following the XDG base directory specification """
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+
+    return os.path.join(base, 'qt-amdgpu-fan-ctl')
+
+def config_dir() -> str:
+    """ directory holding the configuration, following the XDG base directory specification """
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+
+    return os.path.join(base, 'qt-amdgpu-fan-ctl')
+
+def config_path() -> str:
+    """ the configuration file, `CONFIG_ENV_VAR` overrides the default location in `config_dir()` """
+    return os.environ.get(CONFIG_ENV_VAR) or os.path.join(config_dir(), CONFIG_FILE)
+
 class Config():
-    def __init__(self):
+    """
+    The configuration file at `path`, default `config_path()`
+
+    `setValue` only marks the configuration dirty, changes are written once
+    nothing changed for `saveDelay` seconds so a burst of changes is written
+    once. A write goes to a temporary file renamed over the configuration,
+    and is skipped when the content did not change
+    """
+    def __init__(self, path: str = None, saveDelay: float = CONFIG_SAVE_DELAY):
+        self.path = path or config_path()
+        self.saveDelay = saveDelay
+        self.dirty = False
+
+        self.__saved = None
+        self.__timer = None
+        self.__lock = threading.RLock()
+
         self.load()
 
+        atexit.register(self.flush)
+
     def getValue(self, key):
         return self.myConfig[key]
 
     def setValue(self, key, value):
-        self.myConfig[key] = value
+        with self.__lock:
+            if (self.myConfig.get(key) == value) and (key in self.myConfig):
+                return
+
+            self.myConfig[key] = value
+            self.dirty = True
+
+            self.__schedule_save()
+
+    def __schedule_save(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+
+        self.__timer = threading.Timer(self.saveDelay, self.flush)
+        self.__timer.daemon = True
+        self.__timer.start()
 
     def load(self):
         conf = DEFAULTCONFIG
+        path = self.path
+
+        # configurations used to be written to the working directory
+        if (not os.path.exists(path)) and os.path.isfile(CONFIG_FILE):
+            path = CONFIG_FILE
         
         try:
-            with open(CONFIG_FILE, "r") as read_file:
-                conf = json.load(read_file)
+            with open(path, "r") as read_file:
+                text = read_file.read()
+                conf = json.loads(text)
+
+            if (path == self.path):
+                self.__saved = text
         except:
             print("Could not open file, using default config")
         
@@ -49,17 +136,57 @@ class Config():
         
         conf[CONFIG_POINT_VAR] = sorted(conf[CONFIG_POINT_VAR], key=lambda tup: tup[1])
 
-        print("Loaded %s: %s" % (CONFIG_FILE, conf))
+        print("Loaded %s: %s" % (path, conf))
         self.myConfig = conf
 
+        # only written when defaults were added or the file is missing
         self.save(False)
 
-    def save(self, notice = True):
-        try:
-            with open(CONFIG_FILE, "w") as write_file:
-                json.dump(self.myConfig, write_file, indent=4, sort_keys=True)
-            if (notice):
-                print("Saved %s: %s" % (CONFIG_FILE, self.myConfig))
-        except Exception as e:
-            if (notice):
-                print("Failed to save config!\nError Message: %s" % e )
\ No newline at end of file
+    def flush(self):
+        """ writes pending changes now """
+        if self.dirty:
+            self.save()
+
+    def save(self, notice = True) -> bool:
+        """ writes the configuration unless the file already holds it, returns whether it was written """
+        with self.__lock:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+
+            self.dirty = False
+            text = json.dumps(self.myConfig, indent=4, sort_keys=True)
+
+            if (text == self.__saved):
+                return False
+
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+                # a crash leaves either the previous or the new file, never a partial one
+                fd, temp = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=os.path.dirname(self.path) or '.')
+                try:
+                    try:
+                        os.fchmod(fd, os.stat(self.path).st_mode & 0o777)
+                    except FileNotFoundError:
+                        os.fchmod(fd, 0o644)
+
+                    with os.fdopen(fd, "w") as write_file:
+                        write_file.write(text)
+                        write_file.flush()
+                        os.fsync(write_file.fileno())
+
+                    os.replace(temp, self.path)
+                except BaseException:
+                    os.unlink(temp)
+                    raise
+
+                self.__saved = text
+
+                if (notice):
+                    print("Saved %s: %s" % (self.path, self.myConfig))
+                return True
+            except Exception as e:
+                if (notice):
+                    print("Failed to save config!\nError Message: %s" % e )
+                return False
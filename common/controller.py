@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from typing import NamedTuple
+
+from common.hwmonInterface import HwMon, hwmon_sample, accepted_pwm1_enable
+from common.curve import FanCurve
+from common.timings import TIMINGS
+
+LOG = logging.getLogger(__name__)
+
+class controller_state(NamedTuple):
+    """
+    result of a single control tick of a `FanController`
+    """
+    sample: hwmon_sample
+    targetSpeed: int
+
+class FanController:
+    """
+    Applies a `FanCurve` to a single `HwMon` interface
+
+    While `enabled` the fan control method is kept at manual and `pwm1` is
+    written whenever the curve asks for a different level
+    """
+    def __init__(self, hwmon: HwMon, curve: FanCurve = None, enabled: bool = False):
+        self.hwmon = hwmon
+        self.curve = curve
+        self.enabled = enabled
+
+        self.lastFanValue = -1
+
+    def tick(self) -> controller_state:
+        """ samples the hardware and applies the curve """
+        return self.control(self.hwmon.snapshot())
+
+    def control(self, sample: hwmon_sample) -> controller_state:
+        """ applies the curve to an already acquired `hwmon_sample` """
+        state = self._get_hwmon_values(sample)
+        self._set_hwmon_values(state)
+
+        return state
+
+    def setEnabled(self, value: bool):
+        """ takes (`True`) or releases (`False`) manual control of the fan """
+        self.enabled = value
+        self.lastFanValue = -1
+
+        self.hwmon.pwm1_enable = accepted_pwm1_enable.Manual if value else accepted_pwm1_enable.Auto
+
+    def release(self):
+        """ hands fan control back to the driver if it was set to manual """
+        self.enabled = False
+
+        if (self.hwmon.pwm1_enable == accepted_pwm1_enable.Manual.value):
+            self.hwmon.pwm1_enable = accepted_pwm1_enable.Auto
+
+    @TIMINGS.timed('FanController._get_hwmon_values')
+    def _get_hwmon_values(self, sample: hwmon_sample) -> controller_state:
+        """ Derives the target fan speed from a `hwmon_sample` """
+        return controller_state(
+            sample=sample,
+            targetSpeed=self.curve.pwm(sample.temp1_input_degrees, sample.pwm1_max)
+        )
+
+    @TIMINGS.timed('FanController._set_hwmon_values')
+    def _set_hwmon_values(self, state: controller_state):
+        """ Sends values to the `hwmon` interface """
+        if ( state.sample.pwm1_enable == accepted_pwm1_enable.Manual.value ):
+            if ( self.lastFanValue != state.targetSpeed ):
+                self.hwmon.pwm1 = state.targetSpeed
+                self.lastFanValue = state.targetSpeed
+        else:
+            if ( self.enabled ):
+                # restore the state we set last
+                self.hwmon.pwm1_enable = accepted_pwm1_enable.Manual
+                self.lastFanValue = -1
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from bisect import bisect_right
+
+LOG = logging.getLogger(__name__)
+
+def curve_points(points, staticPos = None) -> list:
+    """
+    returns `points` as a list of [temperature, speed] pairs, starting at the
+    origin and ending at `staticPos` in the same way as `EditableGraph`
+    """
+    pos = [[int(x), int(y)] for x, y in points]
+
+    if (len(pos) == 0) or (pos[0] != [0, 0]):
+        pos.insert(0, [0, 0])
+
+    if (staticPos is not None) and (pos[-1] != [int(staticPos[0]), int(staticPos[1])]):
+        pos.append([int(staticPos[0]), int(staticPos[1])])
+
+    return pos
+
+class FanCurve:
+    """
+    Evaluates a fan curve made of (temperature °C, fan speed %) control points
+    without requiring a graph widget, temperatures outside of the curve are
+    clamped to the first and last point
+
+    The curve is compiled into a table holding the speed at every whole degree,
+    control points are integers so the curve is linear between two entries and
+    any temperature is evaluated in constant time
+    """
+    def __init__(self, points, staticPos = None):
+        self.points = curve_points(points, staticPos)
+        self.compile()
+
+    def compile(self):
+        """
+        builds the per-degree lookup table from `points`
+        """
+        pts = sorted(self.points, key=lambda p: p[0])
+
+        self.lo = pts[0][0]
+        self.hi = pts[-1][0]
+        self.table = []
+
+        segment = 0
+        for x in range(self.lo, self.hi):
+            # the segment containing x satisfies x1 <= x < x2
+            while not (pts[segment][0] <= x < pts[segment + 1][0]):
+                segment += 1
+
+            x1, y1 = pts[segment]
+            x2, y2 = pts[segment + 1]
+
+            self.table.append((((x - x1) / (x2 - x1)) * (y2 - y1)) + y1)
+
+        self.table.append(pts[-1][1])
+
+        # interior points at which the slope of the curve changes
+        self.knees = [
+            pts[i][0] for i in range(1, len(pts) - 1)
+            if ((pts[i][1] - pts[i - 1][1]) * (pts[i + 1][0] - pts[i][0])) != ((pts[i + 1][1] - pts[i][1]) * (pts[i][0] - pts[i - 1][0]))
+        ]
+
+    def speed(self, x) -> float:
+        """
+        fan speed in percent for temperature `x` in degrees Celsius
+        """
+        if (x <= self.lo):
+            return self.table[0]
+        if (x >= self.hi):
+            return self.table[-1]
+
+        index = int(x) - self.lo
+        fraction = x - int(x)
+
+        if (fraction == 0):
+            return self.table[index]
+
+        return self.table[index] + ((self.table[index + 1] - self.table[index]) * fraction)
+
+    def knee_headroom(self, x) -> float:
+        """
+        degrees Celsius from `x` up to the next knee of the curve, infinite above the last one
+        """
+        index = bisect_right(self.knees, x)
+
+        return (self.knees[index] - x) if (index < len(self.knees)) else float('inf')
+
+    def speeds(self, x):
+        """
+        fan speed in percent for every temperature in the array `x`
+        """
+        import numpy as np
+
+        return np.interp(x, np.arange(self.lo, self.hi + 1), self.table)
+
+    def pwm(self, x, pwm1_max: int) -> int:
+        """
+        pulse width modulation level (0-`pwm1_max`) for temperature `x` in degrees Celsius
+        """
+        return int((self.speed(x) / 100) * pwm1_max)
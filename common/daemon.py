@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import signal
+import asyncio
+import logging
+
+from common.config import Config, CONFIG_POINT_VAR, CONFIG_METRICS_PORT_VAR, CONFIG_LOGGING_VAR
+from common.poller import HwMonPoller
+from common.backends import get_backend
+from common.profiles import ProfileStore
+from common.hwmonInterface import accepted_pwm1_enable, read_identity, discover_interfaces
+from common.scheduler import CONTROL_ATTRIBUTES
+from common.adaptive import adaptive_from_config
+from common.exporter import MetricsStore, exporter_from_config
+from common.timings import TIMINGS
+from common.profiling import ProfileSession, PROFILE_ENV_VAR, PROFILE_SIGNAL, profile_seconds
+
+#
+# daemon.py
+#
+#  Headless fan control, applies the saved fan curve without loading Qt,
+#   pyqtgraph or numpy
+#
+
+LOG = logging.getLogger(__name__)
+
+class FanDaemon:
+    """
+    Control loop which sets `pwm1` of every controlled card from its fan
+    profile, see `common.profiles`, the fan control method is restored to
+    automatic when the loop stops. Cards whose profile asks for automatic
+    control are left to the driver
+
+    Every card is read by its own `SensorScheduler` on a shared asyncio event
+    loop, the curve is applied whenever the control attributes were read, that
+    is every interval of the profile, or at the rate chosen by an
+    `AdaptiveInterval` per card when the adaptive mode is enabled
+    """
+    def __init__(self, config: Config, indices = None):
+        self.config = config
+
+        self.profiles = ProfileStore(config, accepted_pwm1_enable.Manual)
+        self.poller = HwMonPoller(config.getValue(CONFIG_POINT_VAR), indices)
+
+        self.profiles.setPresent(read_identity(get_backend(), iface['path']) for iface in discover_interfaces().values())
+        self.poller.bindProfiles(self.profiles)
+
+        self.schedulers = self.poller.schedulers
+        self.adaptive = {}
+
+        for index, scheduler in self.schedulers.items():
+            scheduler.setControlPeriod(self.profiles.profile(index).interval / 1000)
+            scheduler.callback = lambda batch, index=index: self._control(index, batch)
+
+            self.adaptive[index] = adaptive_from_config(config, self.profiles.profile(index).interval)
+
+        self.metrics = MetricsStore()
+        self.exporter = None
+        self.telemetry = None
+
+        if config.getValue(CONFIG_LOGGING_VAR):
+            # numpy is only loaded when telemetry is recorded
+            from common.telemetry import TelemetryLogger
+            self.telemetry = TelemetryLogger()
+
+        self.loop = None
+        self.stopped = None
+        self.profile = None
+
+    def stop(self, *args):
+        """ stops `run`, may be called from any thread """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+
+    def _control(self, index: int, batch: dict):
+        if not any(attribute in batch for attribute in CONTROL_ATTRIBUTES):
+            return
+
+        scheduler = self.schedulers[index]
+        controller = self.poller.controllers[index]
+
+        state = controller.control(scheduler.sample())
+
+        curvePercent = controller.curve.speed(state.sample.temp1_input_degrees)
+
+        self.metrics.update(index, controller.hwmon.interface['name'], state, curvePercent, controller.enabled)
+
+        if self.telemetry is not None:
+            self.telemetry.record(index, state, curvePercent)
+
+        if self.adaptive[index] is not None:
+            scheduler.setControlPeriod(self.adaptive[index].update(state.sample.temp1_input_degrees, time.monotonic(), controller.curve))
+
+    async def _run(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self.loop.add_signal_handler(signum, self.stopped.set)
+            except (ValueError, RuntimeError):
+                # not the main thread, `stop` is the only way out
+                pass
+
+        try:
+            self.loop.add_signal_handler(signal.SIGUSR1, TIMINGS.dump)
+            self.loop.add_signal_handler(PROFILE_SIGNAL, self._toggle_profiling)
+        except (ValueError, RuntimeError):
+            pass
+
+        if os.environ.get(PROFILE_ENV_VAR):
+            self._start_profiling(float(os.environ[PROFILE_ENV_VAR]))
+
+        # sysfs reads block, give every card its own executor thread
+        self.loop.set_default_executor(self.poller.executor)
+
+        await asyncio.gather(*(scheduler.run(self.stopped) for scheduler in self.schedulers.values()))
+
+    def _toggle_profiling(self):
+        if (self.profile is None):
+            self._start_profiling(profile_seconds())
+        else:
+            self._stop_profiling()
+
+    def _start_profiling(self, seconds: float):
+        """ profiles the event loop for `seconds`, the sysfs reads in the executor threads are not profiled """
+        self.profile = ProfileSession(seconds)
+        self.profile.start()
+
+        self.profileTimer = self.loop.call_later(seconds, self._stop_profiling)
+
+    def _stop_profiling(self):
+        session, self.profile = self.profile, None
+        if (session is None):
+            return
+
+        self.profileTimer.cancel()
+        session.finish()
+
+    def run(self):
+        for index, controller in self.poller.controllers.items():
+            identity = controller.hwmon.identity
+
+            if not controller.enabled:
+                LOG.info(f"leaving card {index} ({controller.hwmon.interface['path']}, {identity.key}) to the driver")
+                continue
+
+            if self.adaptive[index] is not None:
+                every = f"every {self.adaptive[index].minimum}-{self.adaptive[index].maximum}s (adaptive)"
+            else:
+                every = f"every {self.profiles.profile(index).interval / 1000}s"
+
+            LOG.info(f"controlling card {index} ({controller.hwmon.interface['path']}, {identity.key}) {every} using {controller.curve.points}")
+
+        self.exporter = exporter_from_config(self.metrics, self.config.getValue(CONFIG_METRICS_PORT_VAR))
+
+        try:
+            asyncio.run(self._run())
+        finally:
+            if self.exporter is not None:
+                self.exporter.close()
+
+            if self.telemetry is not None:
+                self.telemetry.close()
+
+            if TIMINGS.enabled:
+                TIMINGS.dump()
+
+            self._stop_profiling()
+
+            # hand control back to the driver
+            self.poller.release()
+            self.poller.close()
+
+def select_cards(config: Config, card: str = None) -> list:
+    """
+    interface indices to control, `card` is the interface index or the PCI slot of a
+    card. Without it every card with a saved fan profile is controlled, or the first
+    card found when none has one
+    """
+    backend = get_backend()
+    identities = { index: read_identity(backend, iface['path']) for index, iface in sorted(discover_interfaces().items()) }
+
+    if card is not None:
+        return [index for index, identity in identities.items() if card in (str(index), identity.slot)]
+
+    profiles = ProfileStore(config)
+    profiles.setPresent(identities.values())
+
+    return [index for index, identity in identities.items() if identity in profiles] or list(identities)[:1]
+
+def main(args) -> int:
+    config = Config()
+
+    indices = None if args.all_cards else select_cards(config, args.card)
+
+    if not indices:
+        LOG.error(f"no card {args.card} found" if args.card is not None else "no card found")
+        return 1
+
+    FanDaemon(config, indices).run()
+    return 0
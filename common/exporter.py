@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from common.hwmonInterface import sysfs_device_hwmon_monitors_amdgpu
+from common.controller import controller_state
+
+#
+# exporter.py
+#
+#  Serves the latest sample of every card in the Prometheus text format, the
+#   samples are pushed by the control loop so a scrape never reads sysfs.
+#   `http.server` is only imported once an exporter is created
+#
+
+LOG = logging.getLogger(__name__)
+
+METRICS_HOST = '127.0.0.1'
+METRICS_PATH = '/metrics'
+METRICS_PREFIX = 'amdgpu_'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# metrics of the controller, name: (help, value of the `card_metrics` entry)
+CONTROLLER_METRICS = {
+    'pwm1': ('Fan pulse width modulation level', lambda card: card.state.sample.pwm1),
+    'pwm1_max': ('Maximum fan pulse width modulation level', lambda card: card.state.sample.pwm1_max),
+    'pwm1_enable': ('Fan control method, 0 none, 1 manual, 2 automatic', lambda card: card.state.sample.pwm1_enable),
+    'fan_target_pwm': ('Fan pulse width modulation level requested by the fan curve', lambda card: card.state.targetSpeed),
+    'fan_curve_percent': ('Fan speed of the fan curve at the current temperature in percent', lambda card: card.curvePercent),
+    'fan_control_enabled': ('Whether the fan curve is applied (1) or the driver controls the fan (0)', lambda card: int(card.enabled)),
+    'temp1_crit_degrees': ('Critical temperature in degrees Celsius', lambda card: card.state.sample.temp1_crit_degrees),
+    'sample_timestamp_seconds': ('Unix time of the latest sample', lambda card: card.timestamp),
+}
+
+class card_metrics:
+    """
+    most recent control tick of a single card
+    """
+    __slots__ = ('name', 'state', 'curvePercent', 'enabled', 'timestamp')
+
+    def __init__(self, name: str, state: controller_state, curvePercent: float, enabled: bool, timestamp: float):
+        self.name = name
+        self.state = state
+        self.curvePercent = curvePercent
+        self.enabled = enabled
+        self.timestamp = timestamp
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsStore:
+    """
+    Latest `controller_state` of every card, written by the control loop and
+    read by the exporter, which only ever formats what is stored here
+    """
+    def __init__(self):
+        self.__cards = {}
+        self.__lock = threading.Lock()
+
+    def update(self, index: int, name: str, state: controller_state, curvePercent: float, enabled: bool):
+        """ stores the result of a control tick of card `index` """
+        card = card_metrics(name, state, curvePercent, enabled, time.time())
+
+        with self.__lock:
+            self.__cards[index] = card
+
+    def render(self) -> str:
+        """ every metric of every card in the Prometheus text exposition format """
+        with self.__lock:
+            cards = sorted(self.__cards.items())
+
+        lines = []
+
+        def family(name, kind, help, values):
+            lines.append(f'# HELP {METRICS_PREFIX}{name} {help}')
+            lines.append(f'# TYPE {METRICS_PREFIX}{name} {kind}')
+
+            for index, card in cards:
+                lines.append(f'{METRICS_PREFIX}{name}{{card="{index}",name="{escape_label(card.name)}"}} {values(card)}')
+
+        for monitor in sysfs_device_hwmon_monitors_amdgpu:
+            attribute = monitor.value['attribute']
+
+            family(
+                attribute,
+                'gauge',
+                f"{monitor.value['descriptor']} ({monitor.value['unit']})",
+                lambda card, attribute=attribute: getattr(card.state.sample, attribute)
+            )
+
+        for name, (help, value) in CONTROLLER_METRICS.items():
+            family(name, 'gauge', help, value)
+
+        return '\n'.join(lines) + '\n'
+
+@lru_cache(maxsize=None)
+def metrics_request_handler():
+    """ request handler class answering `METRICS_PATH` from the `MetricsStore` of its server """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if (self.path.split('?', 1)[0] != METRICS_PATH):
+                self.send_error(404)
+                return
+
+            body = self.server.store.render().encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            LOG.debug(format % args)
+
+    return MetricsRequestHandler
+
+class MetricsExporter:
+    """
+    HTTP server on its own thread answering `METRICS_PATH` from a `MetricsStore`
+    """
+    def __init__(self, store: MetricsStore, port: int, host: str = METRICS_HOST):
+        from http.server import ThreadingHTTPServer
+
+        self.store = store
+
+        self.server = ThreadingHTTPServer((host, port), metrics_request_handler())
+        self.server.daemon_threads = True
+        self.server.store = store
+
+        self.worker = threading.Thread(target=self.server.serve_forever, name='metrics-exporter', daemon=True)
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self.worker.start()
+        LOG.info(f'serving metrics on http://{self.address[0]}:{self.address[1]}{METRICS_PATH}')
+
+    def close(self):
+        """ stops serving and waits for the server thread """
+        if self.worker.is_alive():
+            self.server.shutdown()
+            self.worker.join()
+
+        self.server.server_close()
+
+def exporter_from_config(store: MetricsStore, port) -> MetricsExporter:
+    """ started `MetricsExporter` on `port`, `None` when the port is 0 or cannot be bound """
+    if not int(port):
+        return None
+
+    try:
+        exporter = MetricsExporter(store, int(port))
+    except OSError as e:
+        LOG.warning(f'unable to serve metrics on port {port}: {e}')
+        return None
+
+    exporter.start()
+    return exporter
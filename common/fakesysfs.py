@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import os
+
+#
+# fakesysfs.py
+#
+#  Builds a directory tree that mimics /sys/class/hwmon/ for the amdgpu driver
+#   so that `HwMon` can be exercised on machines without an AMD GPU
+#
+
+HWMON_ATTRIBUTES = {
+    'name': 'amdgpu',
+    'pwm1': '128',
+    'pwm1_enable': '2',
+    'pwm1_min': '0',
+    'pwm1_max': '255',
+    'temp1_input': '45000',
+    'temp1_crit': '100000',
+    'fan1_input': '1200',
+    'power1_cap': '150000000',
+    'power1_cap_min': '0',
+    'power1_cap_max': '200000000',
+    'power1_average': '35000000',
+    'in0_input': '900',
+}
+
+DEVICE_ATTRIBUTES = {
+    'current_link_speed': '8.0 GT/s PCIe',
+    'current_link_width': '16',
+    'pp_dpm_mclk': '0: 300Mhz\n1: 1000Mhz *\n',
+    'pp_dpm_pcie': '0: 2.5GT/s, x8\n1: 8.0GT/s, x16 *\n',
+    'pp_dpm_sclk': '0: 300Mhz\n1: 600Mhz *\n2: 900Mhz\n3: 1200Mhz\n',
+    'power_dpm_state': 'performance',
+    'power_dpm_force_performance_level': 'auto',
+    'pp_power_profile_mode': (
+        'NUM        MODE_NAME     SCLK_UP_HYST   SCLK_DOWN_HYST SCLK_ACTIVE_LEVEL     MCLK_UP_HYST   MCLK_DOWN_HYST MCLK_ACTIVE_LEVEL\n'
+        '  0   BOOTUP_DEFAULT:        -                -                -                -                -                -\n'
+        '  1 3D_FULL_SCREEN *:        0              100               30                0              100               10\n'
+        '  2     POWER_SAVING:       10                0               30                -                -                -\n'
+        '  3            VIDEO:        -                -                -               10               16               31\n'
+        '  4               VR:        0               11               50                0              100               10\n'
+        '  5          COMPUTE:        0                5               30                -                -                -\n'
+        '  6           CUSTOM:        -                -                -                -                -                -\n'
+    ),
+}
+
+# pp_power_profile_mode and pp_dpm_sclk tables as reported by different GPU generations
+PP_POWER_PROFILE_MODE_TABLES = {
+    'polaris': DEVICE_ATTRIBUTES['pp_power_profile_mode'],
+    'vega20': (
+        'PROFILE_INDEX(NAME) BUSY_SET_POINT FPS USE_RLC_BUSY MIN_ACTIVE_LEVEL\n'
+        '  0 BOOTUP_DEFAULT :        0        0        0        0\n'
+        '  1 3D_FULL_SCREEN*:       70       60        0        3\n'
+        '  2   POWER_SAVING :       90       60        0        0\n'
+        '  3          VIDEO :       70       60        0        0\n'
+        '  4             VR :       70       90        0        0\n'
+        '  5        COMPUTE :       30       60        0        6\n'
+        '  6         CUSTOM :        0        0        0        0\n'
+    ),
+    'navi10': (
+        'PROFILE_INDEX(NAME) CLOCK_TYPE(NAME) FPS MinFreqType MinActiveFreqType MinActiveFreq BoosterFreqType BoosterFreq PD_Data_limit_c PD_Data_error_coeff PD_Data_error_rate_coeff\n'
+        ' 0 BOOTUP_DEFAULT :\n'
+        '                    0(       GFXCLK)       0       5       1       0       4     800 4587520  -65536       0\n'
+        '                    1(       SOCCLK)       0       5       1       0       1       0 3276800  -65536   -6553\n'
+        '                    2(        MEMLK)       0       5       1       0       4     800  327680  -65536       0\n'
+        ' 1 3D_FULL_SCREEN*:\n'
+        '                    0(       GFXCLK)       0       5       1       0       4     650 4587520   -3277   -6553\n'
+        '                    1(       SOCCLK)       0       5       1       0       1       0 3276800  -65536   -6553\n'
+        '                    2(        MEMLK)       0       5       4       0       4     800  327680  -65536       0\n'
+        ' 2   POWER_SAVING :\n'
+        '                    0(       GFXCLK)       0       5       1       0       3       0 5898240 -262144    9830\n'
+        ' 5        COMPUTE :\n'
+        '                    0(       GFXCLK)       0       5       1       0       4     800 4587520   -3277   -6553\n'
+    ),
+    'vangogh': (
+        'PROFILE_INDEX(NAME)\n'
+        '  0 BOOTUP_DEFAULT\n'
+        '  1 3D_FULL_SCREEN\n'
+        '  2   POWER_SAVING*\n'
+        '  3          VIDEO\n'
+        '  4             VR\n'
+        '  5        COMPUTE\n'
+        '  6         CUSTOM\n'
+    ),
+    'smu13': (
+        '                         0 BOOTUP_DEFAULT 1 3D_FULL_SCREEN*2 POWER_SAVING   3 VIDEO          4 VR             5 COMPUTE        6 CUSTOM         7 WINDOW_3D\n'
+        '0(FPS)                   0                1                0                0                0                0                0                1\n'
+        '1(GFXCLK_ACTIVE)         0                1                0                0                0                0                0                1\n'
+    ),
+}
+
+PP_DPM_SCLK_TABLES = {
+    'polaris': '0: 300Mhz \n1: 608Mhz \n2: 910Mhz *\n3: 1077Mhz \n4: 1145Mhz \n5: 1191Mhz \n6: 1236Mhz \n7: 1266Mhz \n',
+    'navi10': '0: 800Mhz\n1: 1300Mhz *\n2: 2100Mhz\n',
+    'rdna2': 'S: 19Mhz *\n0: 500Mhz\n1: 2575Mhz\n',
+}
+
+def device_uevent(index: int) -> str:
+    """ device/uevent of card `index`, every card sits in its own PCI slot """
+    return (
+        'DRIVER=amdgpu\n'
+        'PCI_CLASS=30000\n'
+        'PCI_ID=1002:67DF\n'
+        'PCI_SUBSYS_ID=1DA2:E387\n'
+        f'PCI_SLOT_NAME=0000:{index + 3:02x}:00.0\n'
+    )
+
+POWER_ATTRIBUTES = {
+    'runtime_usage': '0',
+}
+
+def _write_attributes(path, attributes):
+    os.makedirs(path, exist_ok=True)
+
+    for name, value in attributes.items():
+        with open(os.path.join(path, name), 'w') as attr_file:
+            attr_file.write(f'{value}\n' if not value.endswith('\n') else value)
+
+def make_fake_sysfs(root, cards = 1):
+    """
+    creates `cards` amdgpu hwmon nodes (plus one unrelated node) below `root` 
+    and returns `root`, suitable for use as `HWMON_SYSFS_DIR`
+    """
+    for index in range(cards):
+        hwmon = os.path.join(root, f'hwmon{index}')
+
+        _write_attributes(hwmon, HWMON_ATTRIBUTES)
+        _write_attributes(os.path.join(hwmon, 'device'), dict(DEVICE_ATTRIBUTES, uevent=device_uevent(index)))
+        _write_attributes(os.path.join(hwmon, 'device', 'power'), POWER_ATTRIBUTES)
+
+    # a non-amdgpu node which must be ignored by interface discovery
+    _write_attributes(os.path.join(root, f'hwmon{cards}'), { 'name': 'k10temp', 'temp1_input': '40000' })
+
+    return root
@@ -6,6 +6,8 @@ import pyqtgraph as pg
 from pyqtgraph import PlotWidget, PlotItem
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtGui import QPalette
+from common.curve import FanCurve
+from common.history import LodPyramid
 
 import logging
 
@@ -16,13 +18,41 @@ def graph_from_widget(parent):
     return get_plotwidget_item(parent, 'graph')
 
 def graph_add_data(parent, data):
-    graph = graph_from_widget(parent)
     graph_from_widget(parent).append_data(data)
 
+def get_plotwidget_registry(parent) -> dict:
+    """ Helper function to acquire the name to item registry of the `PlotWidget` """
+    try:
+        return parent._itemRegistry
+    except AttributeError:
+        parent._itemRegistry = {}
+        return parent._itemRegistry
+
+def plotwidget_add_item(parent, item, name = None):
+    """ Helper function to add an item to the `PlotWidget` and register it by `name` or its `_name` """
+    if (name is not None):
+        item._name = name
+
+    parent.addItem(item)
+
+    if (getattr(item, '_name', None) is not None):
+        get_plotwidget_registry(parent)[item._name] = item
+
+    return item
+
 def get_plotwidget_item(parent, name = 'graph') -> PlotItem:
     """ Helper function to acquire items added to the `PlotWidget` """
+    registry = get_plotwidget_registry(parent)
+
+    try:
+        return registry[name]
+    except KeyError:
+        pass
+
+    # the item was added without `plotwidget_add_item`, register it once found
     for item in parent.plotItem.items:
-        if (hasattr(item, '_name')) and (item._name == name):
+        if (getattr(item, '_name', None) == name):
+            registry[name] = item
             return item
     
     raise LookupError("The item '%s' was not found" % name)
@@ -56,6 +86,8 @@ def InitPlotWidget(plotwidget, **kwds):
 
     data = dict(kwds_default, **kwds)
 
+    plotwidget._itemRegistry = {}
+
     plotwidget.setMenuEnabled(data['menuEnabled'])
     plotwidget.setLabels(**data['labels'])
     plotwidget.setAspectLocked(data['aspectLocked'])
@@ -87,6 +119,9 @@ def InitPlotWidget(plotwidget, **kwds):
 class EditableGraph(pg.GraphItem):
     MIN_POINT_DISTANCE = 16
 
+    # the `FanCurve` compiled from the points, whenever they change
+    curveChanged = QtCore.pyqtSignal(object)
+
     def __init__(self, parent: PlotWidget, data: list, staticPos=None):
         super().__init__()
 
@@ -102,8 +137,8 @@ class EditableGraph(pg.GraphItem):
         self.setData(pos=np.stack(data))
 
         # adds pg.GraphItem to the parent PlotItems
-        parent.addItem(pg.TextItem())
-        parent.addItem(self)
+        plotwidget_add_item(parent, pg.TextItem(), 'coord')
+        plotwidget_add_item(parent, self)
 
     def setData(self, **kwds):
         self.data = kwds
@@ -128,7 +163,18 @@ class EditableGraph(pg.GraphItem):
             self.data['pos'] = self.data['pos'].astype(int)
 
             self.updateGraph()
+    def setPoints(self, points):
+        """ replaces every point of the curve, points at or beyond `staticPos` give way to it """
+        if (self.staticPos is not None):
+            points = [p for p in points if p[0] < self.staticPos[0]]
+
+        self.setData(pos=np.stack(points))
+
     def updateGraph(self):
+        # recompile the curve, every change to the points ends up here
+        self.curve = FanCurve(self.data['pos'].tolist())
+        self.curveChanged.emit(self.curve)
+
         super().setData(**self.data)
 
     def addPoint(self):
@@ -180,6 +226,9 @@ class EditableGraph(pg.GraphItem):
     def getIntersection(self, x = None, y = None):
         if (x == None) and (y == None):
             raise SyntaxError("Must specify either x or y intersection value")
+
+        if (x != None):
+            return self.curve.speed(x)
         
         pts = self.data['pos']
 
@@ -189,10 +238,7 @@ class EditableGraph(pg.GraphItem):
             y1 = pts[i][1]
             y2 = pts[i+1][1]
 
-            if ((x != None) and ( x >= x1 ) and ( x < x2)):
-                return (((x - x1) / (x2 - x1)) * (y2 - y1)) + y1
-                    
-            if ((y != None) and ( y >= y1 ) and ( y < y2)):
+            if (( y >= y1 ) and ( y < y2)):
                 return (((y - y1) / (y2 - y1)) * (x2 - x1)) + x1
 
         return 0
@@ -204,14 +250,7 @@ class EditableGraph(pg.GraphItem):
         )
 
     def getCoordWidget(self):
-        coordWidget = None
-
-        for item in self.plotWidget.plotItem.items:
-            if (isinstance(item, pg.graphicsItems.TextItem.TextItem)):
-                coordWidget = item
-                break
-
-        return coordWidget
+        return get_plotwidget_registry(self.plotWidget).get('coord')
 
     def setCoordText(self, text = ""):
         coordWidget = self.getCoordWidget()
@@ -287,18 +326,24 @@ class EditableGraph(pg.GraphItem):
         event.accept()
 
 class ScrollingGraph(pg.GraphItem):
-    def __init__(self, parent: PlotWidget, data: list, maxY: int):
+    HISTORY = 60
+
+    def __init__(self, parent: PlotWidget, data: list, maxY: int, history: int = HISTORY):
         super().__init__()
 
         self.plot = pg.PlotDataItem()
         self.plot._name = 'graph'
 
+        # samples are aggregated into levels of detail, only about one point per pixel is drawn
+        self.plotWidget = parent
+        self.buffer = LodPyramid(history)
+
         parent.showAxis('bottom', False)
         parent.setLimits(
                 yMin = -3,
                 #xMax = 60,
                 yMax = maxY - 3,
-                maxXRange = 60,
+                maxXRange = history,
                 minYRange = maxY,
                 maxYRange = maxY
             )
@@ -308,7 +353,7 @@ class ScrollingGraph(pg.GraphItem):
         self.plot.setPen(pg.mkPen(highlight, width = 2))
         self.plot.setBrush(highlight.darker())
         self.plot.setFillLevel(-1.0)
-        self.plot.setData(np.zeros(60))# + int(data))
+        self.redraw()
 
         self.plot.append_data = self.append_data
 
@@ -316,14 +361,26 @@ class ScrollingGraph(pg.GraphItem):
         # prevent mouse wheel event
         parent.getViewBox().wheelEvent = lambda event: None
         parent.getViewBox().hoverEvent = self.mouse_hover
-        parent.addItem(self.plot)
+        plotwidget_add_item(parent, self.plot)
 
     def mouse_hover(self, event):
         if event.exit:
             return
 
-    def append_data(self, y):
-        self.plot.yData[:-1] = self.plot.yData[1:]
-        self.plot.yData[-1] = int(y)
+    def redraw(self):
+        """ draws the level of detail matching the width of the plot """
+        self.plot.setData(*self.buffer.envelope(max(1, self.plotWidget.width())))
 
-        self.plot.setData(self.plot.yData)
\ No newline at end of file
+    def append_data(self, y):
+        self.buffer.append(int(y))
+        self.redraw()
+
+    def extend_data(self, values):
+        """ appends every value of `values` with a single redraw """
+        self.buffer.extend(values)
+        self.redraw()
+
+    def clear_data(self):
+        """ drops every value """
+        self.buffer = LodPyramid(self.buffer.length)
+        self.redraw()
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+import os
+import math
+import time
+
+import numpy as np
+
+import logging
+
+from common.hwmonInterface import hwmon_sample, card_identity
+from common.config import data_dir
+
+LOG = logging.getLogger(__name__)
+
+# one record per card and monitor tick, the names are `hwmon_sample` fields
+HISTORY_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('temp1_input_degrees', '<f4'),
+    ('fan1_input', '<f4'),
+    ('pwm1', '<f4'),
+    ('pp_dpm_sclk_mhz', '<f4'),
+    ('pp_dpm_mclk_mhz', '<f4'),
+    ('power1_average_watts', '<f4'),
+    ('in0_input', '<f4'),
+])
+
+HISTORY_SAMPLE_FIELDS = HISTORY_DTYPE.names[1:]
+
+HISTORY_MAGIC = b'AGFCHIST'
+HISTORY_VERSION = 1
+
+# fixed size header in front of the records, `head` is the next record written
+HISTORY_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('itemsize', '<u4'),
+    ('capacity', '<u8'),
+    ('head', '<u8'),
+    ('count', '<u8'),
+    ('reserved', 'V24'),
+])
+
+# samples aggregated per bucket of each level of detail, one sample per second
+# gives levels of 1 s, 10 s, 1 min, 10 min and 1 h
+LOD_BUCKETS = (1, 10, 60, 600, 3600)
+
+def history_path(identity: card_identity, index: int) -> str:
+    """
+    history file of a card, named after its `card_identity.key` like its fan
+    profile, the hwmon interface `index` is only used without a PCI identity
+    """
+    if not identity.key:
+        return os.path.join(data_dir(), f'card{index}.history')
+
+    return os.path.join(data_dir(), f'card-{identity.key.replace("/", "-")}.history')
+
+class RingBuffer:
+    """
+    Fixed length circular buffer holding the most recent samples
+
+    The storage is twice `length` long and every sample is written to both
+    halves, so the samples ordered from oldest to newest are always available
+    as a contiguous view without shifting or rolling the array
+    """
+    def __init__(self, length: int, dtype = float, fill = 0):
+        if (length < 1):
+            raise ValueError("length must be at least 1")
+
+        self.length = length
+        self.count = 0
+
+        self.__data = np.full(length * 2, fill, dtype=dtype)
+        self.__index = 0
+
+    def append(self, value):
+        """
+        overwrites the oldest sample with `value`
+        """
+        index = self.__index
+
+        self.__data[index] = value
+        self.__data[index + self.length] = value
+
+        self.__index = (index + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def extend(self, values):
+        """
+        appends every sample of `values` in order, only the last `length` are kept
+        """
+        values = np.asarray(values)[-self.length:]
+        indices = (self.__index + np.arange(len(values))) % self.length
+
+        self.__data[indices] = values
+        self.__data[indices + self.length] = values
+
+        self.__index = (self.__index + len(values)) % self.length
+        self.count = min(self.count + len(values), self.length)
+
+    def view(self) -> np.ndarray:
+        """
+        read-only view of every sample ordered from oldest to newest
+        """
+        view = self.__data[self.__index:self.__index + self.length]
+        view.flags.writeable = False
+
+        return view
+
+    def latest(self):
+        """
+        the most recently appended sample
+        """
+        return self.__data[self.__index + self.length - 1]
+
+class LodLevel:
+    """
+    Min, max and mean of every `bucket` consecutive samples, the most recent
+    `length` buckets are kept and the incomplete bucket is accumulated apart
+    """
+    def __init__(self, bucket: int, length: int):
+        self.bucket = bucket
+        self.length = length
+
+        self.min = RingBuffer(length)
+        self.max = RingBuffer(length)
+        self.mean = RingBuffer(length)
+
+        self.reset_partial()
+
+    def reset_partial(self):
+        self.partialCount = 0
+        self.partialMin = math.inf
+        self.partialMax = -math.inf
+        self.partialSum = 0.0
+
+    def append(self, value):
+        self.partialMin = min(self.partialMin, value)
+        self.partialMax = max(self.partialMax, value)
+        self.partialSum += value
+        self.partialCount += 1
+
+        if (self.partialCount == self.bucket):
+            self.min.append(self.partialMin)
+            self.max.append(self.partialMax)
+            self.mean.append(self.partialSum / self.bucket)
+            self.reset_partial()
+
+    def extend(self, values: np.ndarray):
+        # complete the pending bucket first, then aggregate whole buckets at once
+        head = min(len(values), (self.bucket - self.partialCount) % self.bucket)
+        for value in values[:head]:
+            self.append(value)
+
+        values = values[head:]
+        whole = (len(values) // self.bucket) * self.bucket
+
+        if (whole > 0):
+            buckets = values[:whole][-self.length * self.bucket:].reshape(-1, self.bucket)
+
+            self.min.extend(buckets.min(axis=1))
+            self.max.extend(buckets.max(axis=1))
+            self.mean.extend(buckets.mean(axis=1))
+
+        for value in values[whole:]:
+            self.append(value)
+
+class LodPyramid:
+    """
+    Pre-aggregated levels of detail of the last `length` samples
+
+    Every append updates each level incrementally, `envelope` picks the finest
+    level with no more buckets than pixels available and returns its min/max
+    outline, so drawing any history costs about as much as drawing one point
+    per pixel
+    """
+    def __init__(self, length: int, buckets = LOD_BUCKETS):
+        if (length < 1):
+            raise ValueError("length must be at least 1")
+
+        self.length = length
+        self.levels = [ LodLevel(bucket, -(-length // bucket)) for bucket in sorted(buckets) if bucket <= length ] or [ LodLevel(1, length) ]
+
+    def append(self, value):
+        for level in self.levels:
+            level.append(value)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=float)
+
+        for level in self.levels:
+            level.extend(values)
+
+    def level(self, pixels: int) -> LodLevel:
+        """ finest level with at most `pixels` buckets, or the coarsest """
+        return next((level for level in self.levels if level.length <= pixels), self.levels[-1])
+
+    def envelope(self, pixels: int):
+        """
+        x and y arrays to draw the history in about `pixels` points, the newest
+        sample is at x = `length` - 1 and each bucket spans `bucket` samples
+        """
+        level = self.level(pixels)
+
+        if (level.bucket == 1):
+            return np.arange(self.length), level.mean.view()
+
+        # the incomplete bucket is drawn last, the complete ones precede it
+        partial = level.partialCount
+        end = self.length - 1 - partial
+        x = end - (np.arange(level.length - 1, -1, -1) * level.bucket)
+
+        xs = np.empty((level.length + 1) * 2)
+        ys = np.empty((level.length + 1) * 2)
+
+        xs[0:-2:2] = x
+        xs[1:-2:2] = x
+        ys[0:-2:2] = level.min.view()
+        ys[1:-2:2] = level.max.view()
+
+        xs[-2:] = self.length - 1
+
+        if (partial > 0):
+            ys[-2] = level.partialMin
+            ys[-1] = level.partialMax
+        else:
+            ys[-2:] = ys[-3]
+
+        return xs, ys
+
+class HistoryFile:
+    """
+    Circular buffer of `HISTORY_DTYPE` records kept in a memory-mapped file
+
+    The file holds a `HISTORY_HEADER_DTYPE` header followed by `capacity`
+    records, appending writes a single record in place and advances `head`,
+    so the file never grows. The kernel writes the pages back, `flush` forces it
+    """
+    def __init__(self, path: str, capacity: int, readonly: bool = False):
+        if (capacity < 1):
+            raise ValueError("capacity must be at least 1")
+
+        self.path = path
+        self.capacity = capacity
+        self.readonly = readonly
+
+        if not readonly:
+            self.__prepare()
+
+        mode = 'r' if readonly else 'r+'
+
+        self.__header = np.memmap(path, dtype=HISTORY_HEADER_DTYPE, mode=mode, shape=(1,))
+        self.__records = np.memmap(path, dtype=HISTORY_DTYPE, mode=mode, offset=HISTORY_HEADER_DTYPE.itemsize, shape=(capacity,))
+
+    def __valid_header(self, header) -> bool:
+        return (header['magic'] == HISTORY_MAGIC) and (header['version'] == HISTORY_VERSION) and (header['itemsize'] == HISTORY_DTYPE.itemsize)
+
+    def __prepare(self):
+        """ creates the file, or rebuilds it when it was written with another layout or capacity """
+        previous = None
+
+        if os.path.isfile(self.path):
+            try:
+                header = np.fromfile(self.path, dtype=HISTORY_HEADER_DTYPE, count=1)[0]
+
+                if not self.__valid_header(header):
+                    LOG.warning(f'{self.path} has an unknown layout, starting a new history')
+                elif (int(header['capacity']) == self.capacity):
+                    return
+                else:
+                    previous = HistoryFile(self.path, int(header['capacity']), readonly=True)
+                    records = previous.records(self.capacity)
+                    previous.close()
+                    previous = records
+            except (OSError, IndexError, ValueError) as e:
+                LOG.warning(f'unable to read {self.path}, starting a new history: {e}')
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        header = np.zeros(1, dtype=HISTORY_HEADER_DTYPE)
+        header['magic'] = HISTORY_MAGIC
+        header['version'] = HISTORY_VERSION
+        header['itemsize'] = HISTORY_DTYPE.itemsize
+        header['capacity'] = self.capacity
+
+        if previous is not None:
+            # keep the most recent records of the previous capacity
+            header['head'] = len(previous) % self.capacity
+            header['count'] = len(previous)
+
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'wb') as f:
+            header.tofile(f)
+
+            if previous is not None:
+                previous.tofile(f)
+
+            # the remaining records are left as a hole in the file until written
+            f.truncate(HISTORY_HEADER_DTYPE.itemsize + (self.capacity * HISTORY_DTYPE.itemsize))
+
+        os.replace(tmp, self.path)
+
+    @property
+    def count(self) -> int:
+        """ number of records held, at most `capacity` """
+        return int(self.__header[0]['count'])
+
+    def append(self, timestamp: float, *values):
+        """ writes a record of `timestamp` and `values` in `HISTORY_SAMPLE_FIELDS` order over the oldest one """
+        header = self.__header[0]
+        head = int(header['head'])
+
+        self.__records[head] = (timestamp, *values)
+
+        header['head'] = (head + 1) % self.capacity
+        header['count'] = min(int(header['count']) + 1, self.capacity)
+
+    def append_sample(self, sample: hwmon_sample, timestamp: float = None):
+        """ appends the `HISTORY_SAMPLE_FIELDS` of `sample` """
+        self.append(
+            time.time() if timestamp is None else timestamp,
+            *(getattr(sample, field) for field in HISTORY_SAMPLE_FIELDS)
+        )
+
+    def records(self, last: int = None) -> np.ndarray:
+        """ copy of the most recent `last` (default all) records ordered from oldest to newest """
+        header = self.__header[0]
+        head = int(header['head'])
+        count = int(header['count'])
+
+        if last is not None:
+            count = min(count, last)
+
+        start = head - count
+
+        if (start >= 0):
+            return np.array(self.__records[start:head])
+
+        return np.concatenate((self.__records[start:], self.__records[:head]))
+
+    def flush(self):
+        """ writes the modified pages back to the file """
+        if not self.readonly:
+            self.__records.flush()
+            self.__header.flush()
+
+    def close(self):
+        self.flush()
+
+        # numpy unmaps the file once the arrays are released
+        self.__records = None
+        self.__header = None
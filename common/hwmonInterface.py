@@ -1,6 +1,9 @@
-import os
+import re
 import logging
 from enum import Enum
+from functools import lru_cache
+from typing import NamedTuple
+from common.backends import HwMonBackend, get_backend
 #
 # Documentation for the amdgpu hwmon interfaces
 # Source: https://www.kernel.org/doc/html/latest/gpu/amdgpu.html#hwmon-interfaces 
@@ -8,8 +11,11 @@ from enum import Enum
 
 LOG = logging.getLogger(__name__)
 
-HWMON_SYSFS_DIR = "/sys/class/hwmon/"
-SUPPORTED_SYSFS_NAMES = ['amdgpu']
+# number of distinct raw tables remembered by the parse caches
+PARSE_CACHE_SIZE = 32
+
+PP_DPM_LEVEL_RE = re.compile(r'^\s*(\w+):\s*(\d+)\s*mhz\s*(\*)?', re.IGNORECASE)
+PP_POWER_PROFILE_RE = re.compile(r'(\d+)\s+([A-Z0-9_]*[A-Z][A-Z0-9_]*)\s*(\*)?')
 
 class accepted_pwm1_enable(Enum):
     """
@@ -63,18 +69,42 @@ class accepted_power_dpm_state(Enum):
     balanced = "balanced"
     performance = "performance"
 
+class pp_dpm_level:
+    """
+    a single row of a pp_dpm_sclk or pp_dpm_mclk table
+    """
+    __slots__ = ('index', 'mhz', 'active')
+
+    def __init__(self, index: str, mhz: int, active: bool):
+        self.index = index
+        self.mhz = mhz
+        self.active = active
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_pp_dpm_levels(values: str) -> tuple:
+    """
+    parses a pp_dpm_sclk or pp_dpm_mclk table into `pp_dpm_level` rows, 
+    results are cached on the raw table so unchanged tables are not parsed again
+    """
+    levels = []
+
+    for line in str(values).splitlines():
+        match = PP_DPM_LEVEL_RE.match(line)
+        if match:
+            levels.append(pp_dpm_level(match[1], int(match[2]), match[3] is not None))
+
+    return tuple(levels)
+
 class accepted_pp_dpm_sclk(dict):
     """
     create a dictionary of accepted pp_dpm_sclk speeds from the current power level state 
     """
     def __init__(self, values: str):
-        index = 0
-        for value in str(values).splitlines():
+        for index, level in enumerate(parse_pp_dpm_levels(values)):
             self[index] = {
-                'active': ('*' in value),
-                'value': int(value[3:].replace('Mhz', '').replace('*', '').strip())
+                'active': level.active,
+                'value': level.mhz
             }
-            index += 1
 
 class sysfs_device_hwmon(Enum):
     """
@@ -82,6 +112,7 @@ class sysfs_device_hwmon(Enum):
     """
     def __str__(self):
         return str(self.name)
+    name = "name"
     pwm1 = "pwm1"
     pwm1_enable = "pwm1_enable"
     pwm1_min = "pwm1_min"
@@ -90,6 +121,8 @@ class sysfs_device_hwmon(Enum):
     temp1_crit = "temp1_crit"
     fan1_input = "fan1_input"
     power1_cap = "power1_cap"
+    power1_cap_min = "power1_cap_min"
+    power1_cap_max = "power1_cap_max"
     power1_average = "power1_average"
     in0_input = "in0_input"
 
@@ -142,6 +175,7 @@ class sysfs_device(Enum):
     power_dpm_state = "power_dpm_state"
     pp_power_profile_mode = "pp_power_profile_mode"
     power_dpm_force_performance_level = "power_dpm_force_performance_level"
+    uevent = "uevent"
 
 class sysfs_device_power(Enum):
     """
@@ -153,55 +187,199 @@ class sysfs_device_power(Enum):
 
     runtime_usage = "runtime_usage"
 
+# hardware constants, these are read once per interface and cached by `HwMon` for
+# as long as it uses the interface, a reloaded driver requires a new `HwMon`
+STATIC_SYSFS_ATTRIBUTES = frozenset((
+    sysfs_device_hwmon.name,
+    sysfs_device_hwmon.pwm1_min,
+    sysfs_device_hwmon.pwm1_max,
+    sysfs_device_hwmon.temp1_crit,
+    sysfs_device_hwmon.power1_cap_min,
+    sysfs_device_hwmon.power1_cap_max,
+    sysfs_device.uevent,
+))
+
 class power_dpm_force_performance_level_profile:
     def __init__(self, data):
         pass
 class pp_power_profile:
-    def __init__(self, data):
-        if "*:" in data:
-            data[2] = "True"
-        else:
-            data.insert(2, "False")
-
-        self.__data = {
-            "NUM" : data[0],
-            "MODE_NAME" : data[1].replace(":", "").replace("_", " "),
-            "ACTIVE" : data[2],
-            "SCLK_UP_HYST" : data[3],
-            "SCLK_DOWN_HYST" : data[4],
-            "SCLK_ACTIVE_LEVEL" : data[5],
-            "MCLK_UP_HYST" : data[6],
-            "MCLK_DOWN_HYST" : data[7],
-            "MCLK_ACTIVE_LEVEL" : data[0]
-        }
+    """
+    a single profile of the pp_power_profile_mode table, the heuristic values are 
+    only reported by the SCLK/MCLK hysteresis layout, other layouts report "-"
+    """
+    __slots__ = ('num', 'mode_name', 'active', 'values')
+
+    def __init__(self, num: int, mode_name: str, active: bool, values: tuple = ()):
+        self.num = num
+        self.mode_name = mode_name.replace("_", " ")
+        self.active = active
+        self.values = values
+
+    def __value(self, index):
+        return self.values[index] if index < len(self.values) else "-"
 
-    @property 
-    def num(self):
-        return self.__data["NUM"]
-    @property
-    def active(self):
-        return self.__data["ACTIVE"]
-    @property 
-    def mode_name(self):
-        return self.__data["MODE_NAME"]
     @property 
     def sclk_up_hyst(self):
-        return self.__data["SCLK_UP_HYST"]
+        return self.__value(0)
     @property 
     def sclk_down_hyst(self):
-        return self.__data["SCLK_DOWN_HYST"]
+        return self.__value(1)
     @property 
     def sclk_active_level(self):
-        return self.__data["SCLK_ACTIVE_LEVEL"]
+        return self.__value(2)
     @property 
     def mclk_up_hyst(self):
-        return self.__data["MCLK_UP_HYST"]
+        return self.__value(3)
     @property 
     def mclk_down_hyst(self):
-        return self.__data["MCLK_DOWN_HYST"]
+        return self.__value(4)
     @property 
     def mclk_active_level(self):
-        return self.__data["MCLK_ACTIVE_LEVEL"]
+        return self.__value(5)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_pp_power_profile_mode(values: str) -> tuple:
+    """
+    parses a pp_power_profile_mode table into `pp_power_profile` rows, 
+    results are cached on the raw table so unchanged tables are not parsed again
+
+    profiles are either listed one per row (`  1 3D_FULL_SCREEN*:  ...`), optionally 
+    followed by indented per-clock rows, or all of them in a single header row
+    """
+    profiles = []
+
+    for line in str(values).splitlines():
+        matches = list(PP_POWER_PROFILE_RE.finditer(line))
+
+        # a profile is always the first thing on its line
+        if (not matches) or (matches[0].start() != len(line) - len(line.lstrip())):
+            continue
+
+        if (len(matches) > 1) and (':' not in line):
+            profiles.extend(pp_power_profile(int(m[1]), m[2], m[3] is not None) for m in matches)
+            continue
+
+        match = matches[0]
+        values = tuple(line[match.end():].lstrip(' :').split())
+        profiles.append(pp_power_profile(int(match[1]), match[2], match[3] is not None, values))
+
+    return tuple(profiles)
+
+class hwmon_sample(NamedTuple):
+    """
+    immutable record of every value required for a single update tick, 
+    produced by `HwMon.snapshot` with the units already converted
+    """
+    temp1_input_degrees: int
+    temp1_crit_degrees: int
+    pwm1: int
+    pwm1_max: int
+    pwm1_enable: int
+    fan1_percent: int
+    fan1_input: int
+    power1_average_watts: int
+    in0_input: int
+    pp_dpm_mclk_mhz: int
+    pp_dpm_sclk_mhz: int
+    power_dpm_force_performance_level: str
+    pp_power_profile_mode_name: str
+    current_link_speed: str
+
+# every attribute read by `HwMon.snapshot`
+SNAPSHOT_ATTRIBUTES = (
+    sysfs_device_hwmon.temp1_input,
+    sysfs_device_hwmon.temp1_crit,
+    sysfs_device_hwmon.pwm1,
+    sysfs_device_hwmon.pwm1_max,
+    sysfs_device_hwmon.pwm1_enable,
+    sysfs_device_hwmon.fan1_input,
+    sysfs_device_hwmon.power1_average,
+    sysfs_device_hwmon.in0_input,
+    sysfs_device.pp_dpm_mclk,
+    sysfs_device.pp_dpm_sclk,
+    sysfs_device.power_dpm_force_performance_level,
+    sysfs_device.pp_power_profile_mode,
+    sysfs_device.current_link_speed,
+)
+
+def active_pp_dpm_mhz(values: str) -> int:
+    """
+    clock in megahertz of the active level of a pp_dpm_sclk or pp_dpm_mclk table, 0 if none is active
+    """
+    for level in parse_pp_dpm_levels(values):
+        if level.active:
+            return level.mhz
+
+    return 0
+
+def sample_from_values(values: dict) -> hwmon_sample:
+    """
+    converts the raw sysfs values of every attribute in `SNAPSHOT_ATTRIBUTES` into a `hwmon_sample`
+    """
+    pwm1 = int(values[sysfs_device_hwmon.pwm1])
+    pwm1_max = int(values[sysfs_device_hwmon.pwm1_max])
+
+    profile = next((p for p in parse_pp_power_profile_mode(values[sysfs_device.pp_power_profile_mode]) if p.active), None)
+
+    return hwmon_sample(
+        temp1_input_degrees = int(int(values[sysfs_device_hwmon.temp1_input]) / 1000),
+        temp1_crit_degrees = int(int(values[sysfs_device_hwmon.temp1_crit]) / 1000),
+        pwm1 = pwm1,
+        pwm1_max = pwm1_max,
+        pwm1_enable = int(values[sysfs_device_hwmon.pwm1_enable]),
+        fan1_percent = int((pwm1 / pwm1_max) * 100),
+        fan1_input = int(values[sysfs_device_hwmon.fan1_input]),
+        power1_average_watts = int(int(values[sysfs_device_hwmon.power1_average]) / 1000000),
+        in0_input = int(values[sysfs_device_hwmon.in0_input]),
+        pp_dpm_mclk_mhz = active_pp_dpm_mhz(values[sysfs_device.pp_dpm_mclk]),
+        pp_dpm_sclk_mhz = active_pp_dpm_mhz(values[sysfs_device.pp_dpm_sclk]),
+        power_dpm_force_performance_level = values[sysfs_device.power_dpm_force_performance_level],
+        pp_power_profile_mode_name = profile.mode_name if profile else "Unsupported",
+        current_link_speed = values[sysfs_device.current_link_speed]
+    )
+
+class card_identity(NamedTuple):
+    """
+    identifiers of the PCI device behind a hwmon interface, unlike the
+    interface index these survive a reboot
+    """
+    slot: str           # PCI_SLOT_NAME, e.g. 0000:03:00.0
+    pci_id: str         # PCI_ID, vendor:device
+    subsys_id: str      # PCI_SUBSYS_ID, subsystem vendor:device
+
+    @property
+    def model(self) -> str:
+        """ vendor, device and subsystem ids, shared by identical cards """
+        return f'{self.pci_id}/{self.subsys_id}' if self.pci_id else ''
+
+    @property
+    def key(self) -> str:
+        return self.slot or self.model
+
+def identity_from_uevent(values: str) -> card_identity:
+    """
+    parses the `KEY=value` lines of device/uevent, the fields are empty when
+    the device does not provide them
+    """
+    fields = dict(line.split('=', 1) for line in str(values).splitlines() if '=' in line)
+
+    return card_identity(
+        slot = fields.get('PCI_SLOT_NAME', ''),
+        pci_id = fields.get('PCI_ID', ''),
+        subsys_id = fields.get('PCI_SUBSYS_ID', '')
+    )
+
+def read_identity(backend: HwMonBackend, path: str) -> card_identity:
+    """
+    `card_identity` of the interface at `path`, without a `HwMon` for it
+    """
+    return identity_from_uevent(backend.read(path, str(sysfs_device.uevent)) or '')
+
+def discover_interfaces() -> dict:
+    """
+    returns every supported hwmon interface of the shared backend, by index
+    """
+    return get_backend().discover()
 
 class HwMon:
     """
@@ -243,55 +421,48 @@ class HwMon:
         fan[1-*]_target: Desired fan speed Unit: revolution/min (RPM)
         fan[1-*]_enable: Enable or disable the sensors.1: Enable 0: Disable
     """
-    def __init__(self, interface = 0):
+    def __init__(self, interface = 0, backend: HwMonBackend = None):
+        """
+        `backend` defaults to the shared backend, see `common.backends`
+        """
+        self.__backend = backend or get_backend()
+        self.__static = {}
+        self.__reads = 0
+        self.__hits = 0
+        self.__interface = None
         self.__interfaces = self.__getinterfaces()
         self.interface = interface
 
         self.update_ext_attributes()
 
     def __getinterfaces(self) -> tuple:
-        valid_interfaces = {}
+        return self.__backend.discover()
 
-        # look at every device in the sysfs directory
-        for sysfs_dev in os.scandir(HWMON_SYSFS_DIR):
+    def __getvalue(self, path):
+        if path in STATIC_SYSFS_ATTRIBUTES:
+            try:
+                value = self.__static[path]
+            except KeyError:
+                value = self.__static[path] = self.__readvalue(path)
+            else:
+                self.__hits += 1
 
-            # we only want subdirectories, not files here
-            if not sysfs_dev.is_dir():
-                continue
-            
-            # check if the name exists, and ensure it matches a valid device node
-            if os.path.isfile(f'{sysfs_dev.path}/name'):
-                sysfs_name = open(f'{sysfs_dev.path}/name').read().strip()
-
-                if (sysfs_name in SUPPORTED_SYSFS_NAMES):
-                    valid_interfaces[len(valid_interfaces)] = { 
-                        'name': sysfs_name, 
-                        'path': sysfs_dev.path 
-                    }
-        
-        return valid_interfaces
+            return value
 
-    def __setperms(self, path):
-        os.system(f'python3 {os.getcwd()}/common/setperms.py {path}')
+        return self.__readvalue(path)
 
-    def __getvalue(self, path):
-        try:
-            sysfs_file = f'{self.__interface["path"]}/{path}'
-            if not os.path.isfile(sysfs_file):
-                return "Unsupported"
+    def __readvalue(self, path):
+        self.__reads += 1
+
+        value = self.__backend.read(self.__interface["path"], str(path))
+        if value is None:
+            return "Unsupported"
 
-            value = open(sysfs_file, "r").read().strip()
-        except Exception as e:
-            raise e
-            
         return value
     
     def __setvalue(self, path: str, value: str) -> bool:
-        sysfs_file = f'{self.__interface["path"]}/{path}'
         try:
-            self.__setperms(sysfs_file)
-            
-            open(sysfs_file, "w").write(str(value))
+            self.__backend.write(self.__interface["path"], str(path), str(value))
         except Exception as e:
             LOG.info(f"__setvalue({path}, {value})::failed: {e}")
             return False
@@ -299,6 +470,10 @@ class HwMon:
             LOG.info(f"__setvalue({path}, {value})::success")
             return True
 
+    @property
+    def backend(self) -> HwMonBackend:
+        return self.__backend
+
     @property
     def interfaces(self) -> list:
         return self.__interfaces
@@ -309,18 +484,66 @@ class HwMon:
     @interface.setter
     def interface(self, value):
         if value not in self.__interfaces:
-            raise IndexError(f'{value} is out of range of 0-{len(self._interfaces)}')
+            raise IndexError(f'{value} is out of range of 0-{len(self.__interfaces)}')
         
+        # the pooled descriptors and cached constants belong to the previous interface
+        if (self.__interface is not None) and (self.__interface is not self.__interfaces[value]):
+            self.__backend.release(self.__interface["path"])
+
+        self.__static.clear()
         self.__interface = self.__interfaces[value]
 
-    def update_ext_attributes(self):
+    @property
+    def index(self) -> int:
+        """
+        index of the current interface in `interfaces`
+        """
+        return next((i for i, iface in self.__interfaces.items() if iface is self.__interface), 0)
+
+    def close(self):
+        """
+        releases the pooled sysfs descriptors of the interface, they are reopened on the next read
+        """
+        self.__backend.release(self.__interface["path"])
+
+    @property
+    def reads(self) -> int:
+        """
+        number of sysfs attribute reads performed by this instance
+        """
+        return self.__reads
+
+    @property
+    def stats(self) -> dict:
+        """
+        number of sysfs attribute reads and of static attributes served from the cache
+        """
+        return { 'reads': self.__reads, 'hits': self.__hits }
+
+    def snapshot(self) -> hwmon_sample:
+        """
+        reads every attribute required for an update tick exactly once and 
+        returns them as a `hwmon_sample`
+        """
+        return sample_from_values({ attribute: self.__getvalue(attribute) for attribute in SNAPSHOT_ATTRIBUTES })
+
+    def read(self, attribute) -> str:
+        """
+        raw value of a `sysfs_device_hwmon`, `sysfs_device` or `sysfs_device_power` attribute
+        """
+        return self.__getvalue(attribute)
+
+    def update_ext_attributes(self, sample: hwmon_sample = None):
         """
         adds or updates extended min and max attributes, for those 
-        devices in `sysfm_device_hwmon_monitors`
+        devices in `sysfm_device_hwmon_monitors`, using the values of
+        `sample` when provided instead of reading them from sysfs
         """
+        source = self if sample is None else sample
+
         for monitor in sysfs_device_hwmon_monitors_amdgpu:
             base_attr = monitor.value['attribute']
-            new_value = int(getattr(self, base_attr))
+            new_value = int(getattr(source, base_attr))
 
             for ext_attr in ['min', 'max']:
                 full_attr = f'{base_attr}_{ext_attr}'
@@ -332,10 +555,22 @@ class HwMon:
 
                 setattr(self, full_attr, curr_value)
     
+    def reset_ext_attributes(self):
+        """
+        forgets the extended min and max attributes, they start over from the next sample
+        """
+        for monitor in sysfs_device_hwmon_monitors_amdgpu:
+            for ext_attr in ['min', 'max']:
+                self.__dict__.pop(f"{monitor.value['attribute']}_{ext_attr}", None)
+
     @property
     def name(self):
         return str(self.__getvalue(sysfs_device_hwmon.name))
 
+    @property
+    def identity(self) -> card_identity:
+        return identity_from_uevent(self.__getvalue(sysfs_device.uevent))
+
     @property
     def pwm1(self):
         return int(self.__getvalue(sysfs_device_hwmon.pwm1))
@@ -412,6 +647,20 @@ class HwMon:
         """
         return int(self.__getvalue(sysfs_device_hwmon.fan1_input))
 
+    @property
+    def power1_cap_min(self):
+        """
+        minimum cap supported in microWatts
+        """
+        return int(self.__getvalue(sysfs_device_hwmon.power1_cap_min))
+
+    @property
+    def power1_cap_max(self):
+        """
+        maximum cap supported in microWatts
+        """
+        return int(self.__getvalue(sysfs_device_hwmon.power1_cap_max))
+
     @property
     def power1_average(self):
         """
@@ -471,11 +720,7 @@ class HwMon:
         """
         current power level state memory clock in megahertz 
         """
-        for line in str(self.__getvalue(sysfs_device.pp_dpm_mclk)).splitlines():
-            if "*" in line:
-                return line[3:-5]
-
-        return 0
+        return active_pp_dpm_mhz(self.__getvalue(sysfs_device.pp_dpm_mclk))
 
     @property
     def pp_dpm_sclk(self):
@@ -515,9 +760,7 @@ class HwMon:
         """
         current power level state core clock in megahertz 
         """
-        for sclk in accepted_pp_dpm_sclk(self.__getvalue(sysfs_device.pp_dpm_sclk)).values():
-            if sclk['active']:
-                return sclk['value']
+        return active_pp_dpm_mhz(self.__getvalue(sysfs_device.pp_dpm_sclk))
 
     @property
     def pp_power_profile_mode(self):
@@ -542,23 +785,14 @@ class HwMon:
         """
         list of pp_power_profiles containing all data read from pp_power_profile_mode
         """
-        # FIXME: the result should be a new class that stores the values
-        result = []
-
-        lines = str(self.pp_power_profile_mode).splitlines()
-        del lines[0]
-
-        for line in lines:
-            result.append ( pp_power_profile(line.split()) )
-
-        return result
+        return list(parse_pp_power_profile_mode(self.pp_power_profile_mode))
 
     @property
     def pp_power_profile_mode_active(self) -> pp_power_profile:
         """
         returns the active pp_power_profile_mode
         """
-        for profile in self.pp_power_profile_list:
+        for profile in parse_pp_power_profile_mode(self.pp_power_profile_mode):
             if (profile.active):
                 return profile
 
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from common.hwmonInterface import HwMon, accepted_pwm1_enable, discover_interfaces
+from common.controller import FanController
+from common.scheduler import SensorScheduler
+from common.profiles import ProfileStore
+from common.curve import FanCurve
+
+LOG = logging.getLogger(__name__)
+
+# sysfs reads block in the driver, one thread per card up to this limit
+MAX_POLLER_WORKERS = 16
+
+class HwMonPoller:
+    """
+    Samples and controls several hwmon interfaces concurrently
+
+    Every interface gets its own `HwMon`, `FanController` and `SensorScheduler`,
+    `poll` reads the due attributes of every card on a thread pool and returns
+    once every card was read, so it takes about as long as the slowest card
+    rather than their sum
+    """
+    def __init__(self, points, indices = None, enabled: bool = False):
+        """
+        `points` is the fan curve applied to every card until `setCurve` or
+        `bindProfiles` assigns one per card, `indices` limits the poller to
+        those interfaces
+        """
+        if indices is None:
+            indices = discover_interfaces().keys()
+
+        self.controllers = {}
+        self.schedulers = {}
+
+        for index in indices:
+            hwmon = HwMon(index)
+
+            self.controllers[index] = FanController(
+                hwmon,
+                FanCurve(points, staticPos=[hwmon.temp1_crit_degrees, 100]),
+                enabled
+            )
+            self.schedulers[index] = SensorScheduler(hwmon)
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, min(len(self.controllers), MAX_POLLER_WORKERS)),
+            thread_name_prefix='hwmon-poller'
+        )
+
+    def setCurve(self, index: int, points):
+        """ assigns the fan curve `points` to interface `index` """
+        controller = self.controllers[index]
+        controller.curve = FanCurve(points, staticPos=[controller.hwmon.temp1_crit_degrees, 100])
+
+    def bindProfiles(self, profiles: ProfileStore):
+        """
+        binds the fan profile of every card in `profiles` and applies its curve, cards
+        whose profile asks for manual control are taken over, the others are left to
+        the driver
+        """
+        for index, controller in self.controllers.items():
+            profile = profiles.bind(index, controller.hwmon.identity, controller.hwmon.temp1_crit_degrees)
+            controller.curve = profiles.curve(index)
+
+            if (profile.mode == accepted_pwm1_enable.Manual):
+                controller.setEnabled(True)
+            else:
+                controller.release()
+
+    def next_deadline(self):
+        """ monotonic time at which the next batch of any card is due, `None` once nothing remains to be read """
+        return min((deadline for deadline in (s.next_deadline() for s in self.schedulers.values()) if deadline is not None), default=None)
+
+    def poll(self, now: float = None) -> dict:
+        """ reads the due attributes of every card, returns the batches of the cards read by index """
+        if now is None:
+            now = time.monotonic()
+
+        due = [index for index, scheduler in self.schedulers.items() if scheduler.due(now)]
+
+        # a single card is read right here, handing it to the pool only adds its overhead
+        if (len(due) == 1):
+            return { due[0]: self.schedulers[due[0]].poll(now) }
+
+        return dict(zip(due, self.executor.map(lambda index: self.schedulers[index].poll(now), due)))
+
+    def release(self):
+        """ hands fan control of every card back to the driver """
+        for controller in self.controllers.values():
+            controller.release()
+
+    def close(self):
+        """ stops the worker threads and closes every `HwMon` """
+        self.executor.shutdown()
+
+        for controller in self.controllers.values():
+            controller.hwmon.close()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from common.config import Config, CONFIG_POINT_VAR, CONFIG_INTERVAL_VAR, CONFIG_PROFILES_VAR, CONFIG_SLOTS_VAR
+from common.hwmonInterface import card_identity, accepted_pwm1_enable
+from common.curve import FanCurve
+
+#
+# profiles.py
+#
+#  Fan profiles per card, stored in the configuration under `CONFIG_PROFILES_VAR`
+#   and keyed by the PCI slot of the card (see `card_identity`), which unlike
+#   the interface index does not depend on the order hwmon nodes are found in.
+#   A card found in a slot never seen before takes over the profile of its
+#   model whose card is gone, as long as it is the only card of that model
+#   without a profile and that profile the only one of the model without a
+#   card. Cards without a profile use the configured `points` and `interval`
+#
+
+LOG = logging.getLogger(__name__)
+
+# control methods a profile may ask for
+PROFILE_MODES = (accepted_pwm1_enable.Manual, accepted_pwm1_enable.Auto)
+
+class fan_profile:
+    """
+    curve, control interval (ms) and control method of a card
+    """
+    __slots__ = ('points', 'interval', 'mode', 'model')
+
+    def __init__(self, points, interval: int, mode: accepted_pwm1_enable, model: str = ''):
+        self.points = [[int(x), int(y)] for x, y in points]
+        self.interval = int(interval)
+        self.mode = mode
+        self.model = model
+
+    def to_dict(self) -> dict:
+        return {
+            'points': self.points,
+            'interval': str(self.interval),
+            'mode': self.mode.name,
+            'model': self.model
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict, default: 'fan_profile') -> 'fan_profile':
+        """ missing fields are taken from `default`, raises `ValueError` on invalid fields """
+        mode = accepted_pwm1_enable[values.get('mode', default.mode.name)]
+        if mode not in PROFILE_MODES:
+            raise ValueError(f'unsupported mode {mode}')
+
+        points = values.get('points', default.points)
+        if len(points) < 2:
+            raise ValueError('a curve needs at least 2 points')
+
+        return cls(points, values.get('interval', default.interval), mode, values.get('model', ''))
+
+class ProfileStore:
+    """
+    The `fan_profile` of every card, indexed by `card_identity.key` and by
+    model when loaded. `bind` resolves the profile of an interface index once,
+    from then on `profile` and `curve` are dictionary lookups, the `FanCurve`
+    of a card is compiled on first use and whenever its profile changes
+
+    Changes are written through `Config.setValue`, so they are saved once a
+    burst of changes is over
+    """
+    def __init__(self, config: Config, mode: accepted_pwm1_enable = accepted_pwm1_enable.Auto):
+        """ `mode` is the control method of cards without a profile """
+        self.config = config
+        self.default = fan_profile(config.getValue(CONFIG_POINT_VAR), int(config.getValue(CONFIG_INTERVAL_VAR)), mode)
+
+        self.__profiles = {}
+        self.__models = {}
+        self.__bound = {}
+        self.__curves = {}
+
+        self.load()
+
+    def load(self):
+        """ reads every profile from the configuration, invalid profiles are skipped """
+        self.__profiles.clear()
+        self.__models.clear()
+
+        for key, values in self.config.getValue(CONFIG_PROFILES_VAR).items():
+            try:
+                profile = fan_profile.from_dict(values, self.default)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                LOG.warning(f'ignoring the fan profile of {key}: {e}')
+                continue
+
+            self.__profiles[key] = profile
+
+            if profile.model:
+                self.__models.setdefault(profile.model, []).append(key)
+
+    def __len__(self) -> int:
+        return len(self.__profiles)
+
+    def __contains__(self, identity: card_identity) -> bool:
+        """ whether the card `identity` has a profile of its own """
+        return identity.key in self.__profiles
+
+    def setPresent(self, identities):
+        """
+        the cards installed, called before binding them. The profile of a card which
+        moved is stored under its new slot, which like every new slot is remembered
+        """
+        present = { identity.key: identity for identity in identities if identity.key }
+
+        seen = self.config.getValue(CONFIG_SLOTS_VAR)
+        new = sorted(key for key in present if key not in seen)
+
+        for model, keys in list(self.__models.items()):
+            orphans = [key for key in keys if key not in present]
+            unbound = [key for key, identity in present.items() if (identity.model == model) and (key not in self.__profiles)]
+
+            # a card seen before had no profile on purpose
+            if (len(orphans) == 1) and (len(unbound) == 1) and (unbound[0] in new):
+                LOG.info(f'moving the fan profile of {orphans[0]} to {unbound[0]}, a {model} without one')
+                self.__move(orphans[0], unbound[0])
+
+        if new:
+            self.config.setValue(CONFIG_SLOTS_VAR, list(seen) + new)
+
+    def resolve(self, identity: card_identity) -> fan_profile:
+        """ the profile of the card `identity`, `default` when it has none """
+        return self.__profiles.get(identity.key, self.default)
+
+    def bind(self, index: int, identity: card_identity, crit: float) -> fan_profile:
+        """ resolves the profile of interface `index`, whose critical temperature is `crit` °C """
+        profile = self.resolve(identity)
+
+        self.__bound[index] = (identity, crit, profile)
+        self.__curves.pop(index, None)
+
+        return profile
+
+    def profile(self, index: int) -> fan_profile:
+        """ profile of the bound interface `index` """
+        return self.__bound[index][2]
+
+    def curve(self, index: int) -> FanCurve:
+        """ compiled curve of the bound interface `index` """
+        try:
+            return self.__curves[index]
+        except KeyError:
+            _, crit, profile = self.__bound[index]
+            curve = self.__curves[index] = FanCurve(profile.points, staticPos=[crit, 100])
+
+            return curve
+
+    def update(self, index: int, points = None, interval: int = None, mode: accepted_pwm1_enable = None) -> fan_profile:
+        """ changes the profile of the bound interface `index`, it gets its own profile if it used another one """
+        identity, crit, current = self.__bound[index]
+
+        profile = fan_profile(
+            current.points if points is None else points,
+            current.interval if interval is None else interval,
+            current.mode if mode is None else mode,
+            identity.model
+        )
+
+        if (profile.points, profile.interval, profile.mode) == (current.points, current.interval, current.mode):
+            return current
+
+        if not identity.key:
+            LOG.warning(f'interface {index} has no PCI identity, its profile is not saved')
+        else:
+            if identity.key not in self.__profiles and profile.model:
+                self.__models.setdefault(profile.model, []).append(identity.key)
+
+            self.__profiles[identity.key] = profile
+            self.__save()
+
+        self.__bound[index] = (identity, crit, profile)
+        if points is not None:
+            self.__curves.pop(index, None)
+
+        return profile
+
+    def __move(self, old: str, new: str):
+        profile = self.__profiles[new] = self.__profiles.pop(old)
+
+        keys = self.__models[profile.model]
+        keys[keys.index(old)] = new
+
+        self.__save()
+
+    def __save(self):
+        self.config.setValue(CONFIG_PROFILES_VAR, { key: p.to_dict() for key, p in self.__profiles.items() })
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import sys
+import time
+import signal
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+
+from common.config import data_dir
+
+#
+# profiling.py
+#
+#  Profiles a running process for a while, with cProfile for the CPU time and
+#   tracemalloc for the allocations, and writes the results to `profile_dir()`.
+#   A session is started at launch by the `PROFILE_ENV_VAR` environment
+#   variable, holding its length in seconds, or at any time by sending
+#   `PROFILE_SIGNAL`, which stops the running session early
+#
+#  Every session writes, prefixed by its start time and the process id:
+#
+#   .prof               cProfile statistics, for `python3 -m pstats` or snakeviz
+#   -cpu.txt            the functions taking the most cumulative time
+#   -memory.txt         the largest allocations and what grew during the session
+#   -start/-end.tracemalloc   snapshots, `python3 -m common.profiling A B` diffs any two
+#
+
+LOG = logging.getLogger(__name__)
+
+PROFILE_ENV_VAR = "AMDGPU_FAN_PROFILE"
+PROFILE_SECONDS_ENV_VAR = "AMDGPU_FAN_PROFILE_SECONDS"
+PROFILE_DIR_ENV_VAR = "AMDGPU_FAN_PROFILE_DIR"
+
+# starts a session, or stops the running one
+PROFILE_SIGNAL = signal.SIGUSR2
+
+# length of a session started by `PROFILE_SIGNAL` (seconds)
+PROFILE_SECONDS = 30
+
+# frames kept per allocation by tracemalloc
+PROFILE_FRAMES = 5
+
+# lines written per report
+PROFILE_TOP = 40
+
+# allocations made by the import machinery and tracemalloc itself are left out
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+def profile_dir() -> str:
+    return os.environ.get(PROFILE_DIR_ENV_VAR) or os.path.join(data_dir(), 'profiles')
+
+def profile_seconds() -> float:
+    """ length of a session started by `PROFILE_SIGNAL` """
+    return float(os.environ.get(PROFILE_SECONDS_ENV_VAR) or PROFILE_SECONDS)
+
+def format_snapshot_diff(old: tracemalloc.Snapshot, new: tracemalloc.Snapshot, top: int = PROFILE_TOP) -> str:
+    """ the lines whose allocations grew the most from `old` to `new` """
+    return '\n'.join(str(stat) for stat in new.compare_to(old, 'lineno')[:top])
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+class ProfileSession:
+    """
+    A cProfile and tracemalloc session writing its results to `directory`
+
+    cProfile only sees the threads it was enabled on, `start` enables it on
+    the calling thread and every other thread of interest calls
+    `enableThread` and `disableThread` itself. `finish` writes the results,
+    once every thread disabled its profiler
+    """
+    def __init__(self, seconds: float, directory: str = None):
+        self.seconds = seconds
+        self.directory = directory or profile_dir()
+        self.prefix = os.path.join(self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}')
+
+        self.__profiles = {}
+        self.__lock = threading.Lock()
+        self.__snapshot = None
+        self.__tracing = False
+        self.__started = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.__tracing = not tracemalloc.is_tracing()
+        if self.__tracing:
+            tracemalloc.start(PROFILE_FRAMES)
+
+        self.__snapshot = take_snapshot()
+        self.__started = time.monotonic()
+
+        self.enableThread()
+
+        LOG.info(f'profiling for {self.seconds:.0f}s to {self.prefix}*')
+
+    def enableThread(self):
+        """ profiles the calling thread until `disableThread` """
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+        except ValueError:
+            # a profiler sees every thread on Python 3.12 and later, only one may be active
+            return
+
+        with self.__lock:
+            self.__profiles[threading.get_ident()] = profile
+
+    def disableThread(self):
+        with self.__lock:
+            profile = self.__profiles.get(threading.get_ident())
+
+        if profile is not None:
+            profile.disable()
+
+    def finish(self):
+        """ writes every result, the profiler of the calling thread is disabled first """
+        self.disableThread()
+
+        end = take_snapshot()
+        if self.__tracing:
+            tracemalloc.stop()
+
+        elapsed = time.monotonic() - self.__started
+
+        with self.__lock:
+            profiles = list(self.__profiles.values())
+
+        if profiles:
+            stats = pstats.Stats(*profiles)
+            stats.dump_stats(f'{self.prefix}.prof')
+
+            report = io.StringIO()
+            pstats.Stats(*profiles, stream=report).sort_stats('cumulative').print_stats(PROFILE_TOP)
+
+            with open(f'{self.prefix}-cpu.txt', 'w') as f:
+                f.write(f'{elapsed:.1f}s on {len(profiles)} threads\n')
+                f.write(report.getvalue())
+
+        self.__snapshot.dump(f'{self.prefix}-start.tracemalloc')
+        end.dump(f'{self.prefix}-end.tracemalloc')
+
+        with open(f'{self.prefix}-memory.txt', 'w') as f:
+            current = sum(stat.size for stat in end.statistics('filename'))
+
+            f.write(f'{current / 1024:.1f} KiB traced after {elapsed:.1f}s\n\n')
+            f.write('largest allocations\n')
+            f.write('\n'.join(str(stat) for stat in end.statistics('lineno')[:PROFILE_TOP]))
+            f.write('\n\ngrowth during the session\n')
+            f.write(format_snapshot_diff(self.__snapshot, end))
+            f.write('\n')
+
+        LOG.info(f'profile written to {self.prefix}*')
+
+def main(argv) -> int:
+    """ prints the growth from the first to the second tracemalloc snapshot """
+    if len(argv) != 2:
+        print('usage: python3 -m common.profiling OLD.tracemalloc NEW.tracemalloc', file=sys.stderr)
+        return 2
+
+    print(format_snapshot_diff(tracemalloc.Snapshot.load(argv[0]), tracemalloc.Snapshot.load(argv[1])))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+
+from PyQt5 import QtCore
+
+from common.curve import FanCurve
+from common.poller import HwMonPoller
+from common.scheduler import CONTROL_ATTRIBUTES
+from common.adaptive import AdaptiveInterval
+from common.history import HistoryFile, history_path
+from common.exporter import MetricsStore
+from common.telemetry import TelemetryLogger
+from common.timings import TIMINGS
+
+LOG = logging.getLogger(__name__)
+
+class sampled_card:
+    """
+    control period and history of a card of the `HwMonSampler`, its `FanController`
+    and `SensorScheduler` belong to the poller
+    """
+    __slots__ = ('interval', 'effectiveInterval', 'adaptive', 'historyFile')
+
+    def __init__(self, interval: int, adaptive: AdaptiveInterval = None, historyFile: HistoryFile = None):
+        self.interval = int(interval)
+        self.effectiveInterval = float(self.interval)
+        self.adaptive = adaptive
+        self.historyFile = historyFile
+
+class HwMonSampler(QtCore.QObject):
+    """
+    Owns every read and write of the cards of a `HwMonPoller` on a dedicated thread
+
+    Every card is controlled with its own curve and period at the same time.
+    Attributes are read by the `SensorScheduler` of each card, each at its own
+    period, from a single-shot timer armed for the next batch due on any card,
+    the cards due together are read concurrently by the poller. Whenever a batch
+    contains the `CONTROL_ATTRIBUTES` the fan curve of that card is evaluated and
+    `pwm1` applied, the monitor tick publishes the most recent values of every
+    card without reading anything. With an `AdaptiveInterval` the control period
+    of a card follows its temperature, the effective period is published through
+    `intervalChanged` in milliseconds.
+    Every monitor tick is also appended to the `HistoryFile` of the card when
+    `historyCapacity` is given, and every control tick is stored in `metrics`
+    and recorded by the `TelemetryLogger` while telemetry is enabled.
+    Results are published with the index of their card through the `updated`,
+    `monitored` and `historyLoaded` signals, which are queued to the GUI thread
+    """
+    updated = QtCore.pyqtSignal(int, object)
+    monitored = QtCore.pyqtSignal(int, object)
+    intervalChanged = QtCore.pyqtSignal(int, float)
+    historyLoaded = QtCore.pyqtSignal(int, object)
+
+    _invoked = QtCore.pyqtSignal(object)
+
+    def __init__(self, poller: HwMonPoller, intervals: dict, monitorInterval: int = 1000, adaptive: dict = None, historyCapacity: int = 0, metrics: MetricsStore = None, telemetry: bool = False):
+        """
+        `intervals` is the control period of every card of `poller` in milliseconds,
+        or the initial period of the cards given an `AdaptiveInterval` in `adaptive`,
+        `historyCapacity` is the number of monitor ticks kept on disk per card.
+        The curve and control state of each card are those of its `FanController`
+        until `setCurve` and `setEnabled` change them
+        """
+        super().__init__()
+
+        self.poller = poller
+        self.monitorInterval = int(monitorInterval)
+        self.historyCapacity = int(historyCapacity)
+        self.metrics = metrics
+        self.telemetry = TelemetryLogger() if telemetry else None
+
+        adaptive = adaptive or {}
+
+        self.cards = {}
+        for index in poller.controllers:
+            self.cards[index] = sampled_card(intervals[index], adaptive.get(index), self._open_history(index))
+            poller.schedulers[index].setControlPeriod(self.cards[index].interval / 1000)
+
+        self.worker = QtCore.QThread()
+        self.moveToThread(self.worker)
+
+        self._invoked.connect(self._run_invoked)
+        self.worker.started.connect(self._start)
+
+    def start(self):
+        """ starts the sampler thread, the first control tick of every card runs immediately """
+        self.worker.start()
+
+    def stop(self):
+        """ stops the sampler thread, every card is handed back to the driver """
+        if self.worker.isRunning():
+            self.invoke(self._stop)
+            self.worker.wait()
+
+    def invoke(self, fn):
+        """ runs `fn` on the sampler thread, between ticks """
+        self._invoked.emit(fn)
+
+    def setInterval(self, index: int, value: int):
+        """ sets the control period of card `index` in milliseconds, in adaptive mode the period continues from there """
+        card = self.cards[index]
+
+        def apply():
+            card.interval = int(value)
+            period = card.interval / 1000
+
+            if card.adaptive is not None:
+                period = min(max(period, card.adaptive.minimum), card.adaptive.maximum)
+                card.adaptive.period = period
+
+            self._set_control_period(index, period)
+            self._schedule_next()
+
+        self.invoke(apply)
+
+    def setCurve(self, index: int, curve: FanCurve):
+        """ applies `curve` to card `index` from its next control tick, it must not be modified afterwards """
+        controller = self.poller.controllers[index]
+
+        self.invoke(lambda: setattr(controller, 'curve', curve))
+
+    def setEnabled(self, index: int, value: bool):
+        """ takes (`True`) or releases (`False`) manual control of the fan of card `index` """
+        controller = self.poller.controllers[index]
+
+        self.invoke(lambda: controller.setEnabled(value))
+
+    def setTelemetry(self, value: bool):
+        """ starts (`True`) or stops (`False`) recording every control tick """
+        def apply():
+            if value and (self.telemetry is None):
+                self.telemetry = TelemetryLogger()
+            elif (not value) and (self.telemetry is not None):
+                self.telemetry.close()
+                self.telemetry = None
+
+        self.invoke(apply)
+
+    def write(self, index: int, attribute, value):
+        """ writes `value` to `attribute` of card `index` and reads it back on the next batch """
+        def apply():
+            setattr(self.poller.controllers[index].hwmon, attribute.name, value)
+            self.poller.schedulers[index].expire(attribute)
+            self._schedule_next()
+
+        self.invoke(apply)
+
+    def loadHistory(self, index: int, last: int = None):
+        """ publishes the most recent `last` history records of card `index` through `historyLoaded`, `None` without a history """
+        def apply():
+            historyFile = self.cards[index].historyFile
+            self.historyLoaded.emit(index, None if historyFile is None else historyFile.records(last))
+
+        self.invoke(apply)
+
+    @QtCore.pyqtSlot(object)
+    def _run_invoked(self, fn):
+        fn()
+
+    @QtCore.pyqtSlot()
+    def _start(self):
+        # timers are created here so they belong to the sampler thread
+        self.timerUpdate = QtCore.QTimer(self)
+        self.timerUpdate.setSingleShot(True)
+        self.timerUpdate.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timerUpdate.timeout.connect(self._timer_update_tick)
+
+        self.timerMonitor = QtCore.QTimer(self)
+        self.timerMonitor.timeout.connect(self._timer_monitor_tick)
+        self.timerMonitor.start(self.monitorInterval)
+
+        self._timer_update_tick()
+
+    def _stop(self):
+        # timers may only be stopped from the thread they belong to
+        self.timerUpdate.stop()
+        self.timerMonitor.stop()
+
+        for card in self.cards.values():
+            if card.historyFile is not None:
+                card.historyFile.close()
+                card.historyFile = None
+
+        if self.telemetry is not None:
+            self.telemetry.close()
+            self.telemetry = None
+
+        # hand control back to the driver
+        self.poller.release()
+
+        self.worker.quit()
+
+    def _open_history(self, index: int):
+        if (self.historyCapacity < 1):
+            return None
+
+        hwmon = self.poller.controllers[index].hwmon
+
+        try:
+            return HistoryFile(history_path(hwmon.identity, index), self.historyCapacity)
+        except OSError as e:
+            LOG.warning(f'monitor history of card {index} is not recorded: {e}')
+            return None
+
+    def _set_control_period(self, index: int, period: float):
+        card = self.cards[index]
+        self.poller.schedulers[index].setControlPeriod(period)
+
+        if (period * 1000 != card.effectiveInterval):
+            card.effectiveInterval = period * 1000
+            self.intervalChanged.emit(index, card.effectiveInterval)
+
+    def _schedule_next(self):
+        """ arms the update timer for the next batch due on any card """
+        deadline = self.poller.next_deadline()
+
+        if deadline is not None:
+            self.timerUpdate.start(max(0, round((deadline - time.monotonic()) * 1000)))
+
+    @TIMINGS.timed('HwMonSampler._timer_update_tick')
+    def _timer_update_tick(self):
+        """ reads the due attributes, applies the fan curve of every card whose control attributes were read """
+        batches = self.poller.poll()
+
+        for index, batch in batches.items():
+            if any(attribute in batch for attribute in CONTROL_ATTRIBUTES):
+                self._control(index)
+
+        self._schedule_next()
+
+    def _control(self, index: int):
+        card = self.cards[index]
+        controller = self.poller.controllers[index]
+
+        state = controller.control(self.poller.schedulers[index].sample())
+
+        if card.adaptive is not None:
+            self._set_control_period(index, card.adaptive.update(state.sample.temp1_input_degrees, time.monotonic(), controller.curve))
+
+        curvePercent = controller.curve.speed(state.sample.temp1_input_degrees)
+
+        if self.metrics is not None:
+            self.metrics.update(index, controller.hwmon.interface['name'], state, curvePercent, controller.enabled)
+
+        if self.telemetry is not None:
+            self.telemetry.record(index, state, curvePercent)
+
+        self.updated.emit(index, state)
+
+    def _timer_monitor_tick(self):
+        """ publishes the most recent values of every card for the monitor window, nothing is read here """
+        # records of control ticks which stopped coming are written all the same
+        if self.telemetry is not None:
+            self.telemetry.flushDue()
+
+        for index, scheduler in self.poller.schedulers.items():
+            # wait for the first batch of the card
+            if not scheduler.ready:
+                continue
+
+            sample = scheduler.sample()
+            self.monitored.emit(index, sample)
+
+            historyFile = self.cards[index].historyFile
+            if historyFile is not None:
+                historyFile.append_sample(sample)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import logging
+
+from common.hwmonInterface import HwMon, sysfs_device_hwmon, sysfs_device, sample_from_values, hwmon_sample, SNAPSHOT_ATTRIBUTES
+from common.timings import TIMINGS
+
+LOG = logging.getLogger(__name__)
+
+# attributes are read together when their deadlines are this close (seconds)
+COALESCE_WINDOW = 0.01
+
+# attributes required by the control loop, they share the control period
+CONTROL_ATTRIBUTES = (
+    sysfs_device_hwmon.temp1_input,
+    sysfs_device_hwmon.pwm1_enable,
+)
+
+# sampling period of every attribute in seconds, 0 reads the attribute once
+DEFAULT_PERIODS = {
+    sysfs_device_hwmon.temp1_input: 0.25,
+    sysfs_device_hwmon.pwm1_enable: 0.25,
+    sysfs_device_hwmon.pwm1: 1,
+    sysfs_device_hwmon.fan1_input: 1,
+    sysfs_device_hwmon.power1_average: 1,
+    sysfs_device_hwmon.in0_input: 1,
+    sysfs_device.pp_dpm_sclk: 1,
+    sysfs_device.pp_dpm_mclk: 1,
+    sysfs_device.power_dpm_force_performance_level: 5,
+    sysfs_device.pp_power_profile_mode: 5,
+    sysfs_device.current_link_speed: 30,
+    sysfs_device_hwmon.pwm1_max: 0,
+    sysfs_device_hwmon.temp1_crit: 0,
+}
+
+class SensorScheduler:
+    """
+    Reads every attribute of a `HwMon` at its own period
+
+    `poll` reads the attributes which are due, those due within `COALESCE_WINDOW`
+    of each other are read in the same batch, and `next_deadline` tells when the
+    next batch is due. `run` drives the scheduler from an asyncio event loop, the
+    same methods can be driven from any other loop, such as a Qt timer
+    """
+    def __init__(self, hwmon: HwMon, periods: dict = None, callback = None):
+        """
+        `callback` is called with every batch of raw values read by `run`
+        """
+        self.hwmon = hwmon
+        self.periods = dict(DEFAULT_PERIODS if periods is None else periods)
+        self.callback = callback
+
+        self.reset()
+
+    def reset(self):
+        """ forgets every value read so far, all attributes are due immediately """
+        now = time.monotonic()
+
+        self.values = {}
+        self.deadlines = { attribute: now for attribute in self.periods }
+
+    def setPeriod(self, attribute, period: float):
+        """ changes the period of `attribute`, a shorter period takes effect immediately """
+        self.periods[attribute] = period
+
+        if (period > 0):
+            now = time.monotonic()
+            self.deadlines[attribute] = min(self.deadlines.get(attribute, now), now + period)
+
+    def expire(self, attribute):
+        """ makes `attribute` due immediately, e.g. after it was written """
+        self.deadlines[attribute] = time.monotonic()
+
+    def setControlPeriod(self, period: float):
+        """ changes the period of every attribute in `CONTROL_ATTRIBUTES` """
+        for attribute in CONTROL_ATTRIBUTES:
+            self.setPeriod(attribute, period)
+
+    def next_deadline(self):
+        """ monotonic time at which the next batch is due, `None` once nothing remains to be read """
+        return min(self.deadlines.values(), default=None)
+
+    def due(self, now: float) -> list:
+        """ attributes which are due at `now` """
+        cutoff = now + COALESCE_WINDOW
+
+        return [ attribute for attribute, deadline in self.deadlines.items() if deadline <= cutoff ]
+
+    @TIMINGS.timed('SensorScheduler.poll')
+    def poll(self, now: float = None) -> dict:
+        """ reads every attribute which is due and returns the batch of raw values """
+        if now is None:
+            now = time.monotonic()
+
+        batch = { attribute: self.hwmon.read(attribute) for attribute in self.due(now) }
+        self.values.update(batch)
+
+        for attribute in batch:
+            period = self.periods[attribute]
+
+            if (period <= 0):
+                del self.deadlines[attribute]
+                continue
+
+            # keep the cadence unless we fell behind by more than a period
+            deadline = self.deadlines[attribute] + period
+            self.deadlines[attribute] = deadline if (deadline > now) else now + period
+
+        return batch
+
+    @property
+    def ready(self) -> bool:
+        """ whether every attribute of a `hwmon_sample` was read since the last `reset` """
+        return all(attribute in self.values for attribute in SNAPSHOT_ATTRIBUTES)
+
+    def sample(self) -> hwmon_sample:
+        """ `hwmon_sample` of the most recent value of every attribute, requires `ready` """
+        return sample_from_values(self.values)
+
+    async def run(self, stopped: asyncio.Event = None):
+        """ polls whenever a batch is due until `stopped` is set, reads run in the default executor """
+        loop = asyncio.get_running_loop()
+
+        while (stopped is None) or (not stopped.is_set()):
+            deadline = self.next_deadline()
+            if deadline is None:
+                return
+
+            delay = deadline - time.monotonic()
+            if (delay > 0) and (stopped is None):
+                await asyncio.sleep(delay)
+            elif (delay > 0):
+                try:
+                    await asyncio.wait_for(stopped.wait(), delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = await loop.run_in_executor(None, self.poll)
+
+            if batch and (self.callback is not None):
+                self.callback(batch)
@@ -1,71 +1,179 @@
 import os
 import sys
+import stat as st
+import errno
+import threading
+import subprocess
 from os import stat
 from pwd import getpwuid
 import getpass
 
 #
 # setperms.py
-# 
-#  Spawns a subprocess of this script as root to change ownership of a file
-#   to allow the current user to write to the file
 #
+#  Changes ownership of sysfs files to allow the current user to write to them
+#
+#  Run as `setperms.py --serve UID` this is a long-lived helper, escalated once
+#   through sudo, which reads one path per line on stdin and chowns it to UID,
+#   only regular files resolving below the device of an amdgpu hwmon node are
+#   accepted, see `allowed_devices`:
+#
+#     request:  <path>\n
+#     response: OK\n  or  ERR <message>\n
+#
+#  `PermissionHelper` is the in-process client, it remembers every path known to
+#   be writable so the helper is only contacted for the first write to a path
 #
 
-TMP_FILE = "file.tmp"
-
-if (len(sys.argv) == 1):
-    print("Usage: %s PATH" % (sys.argv[0]))
-    exit()
+SERVE_ARG = "--serve"
 
-path = sys.argv[1]
+# the helper only hands out attributes of the devices of these hwmon nodes
+HWMON_CLASS_DIR = "/sys/class/hwmon"
+ALLOWED_HWMON_NAMES = ("amdgpu",)
 
 def find_owner(filename):
     return getpwuid(stat(filename).st_uid).pw_name
 
-if (os.geteuid() == 0):
-    print("Done!")
-    
-    try:
-        print("Trying to set file owner... ", end='')
-        with open(TMP_FILE, "r") as tmp_file:
-            uid = int(tmp_file.read())
-        
-        os.chown(path, uid, -1)
-        print("Done!")
+def allowed_devices(root: str = HWMON_CLASS_DIR) -> list:
+    """
+    resolved `device` directory of every hwmon node below `root` whose `name` is
+    one of `ALLOWED_HWMON_NAMES`, the hwmon node itself lies below its device
+    """
+    devices = []
 
-    except Exception as e:
-        print("Error! Failed to chown, the error was:\n" + str(e))
+    for node in os.listdir(root):
+        try:
+            with open(os.path.join(root, node, 'name')) as name_file:
+                name = name_file.read().strip()
+        except OSError:
+            continue
 
-else:
-    owner = find_owner(path)
-    user = getpass.getuser()
-    uid = str(os.geteuid())
+        if name in ALLOWED_HWMON_NAMES:
+            devices.append(os.path.realpath(os.path.join(root, node, 'device')))
 
-    if (user == owner):
-        #print("%s is already owned by %s" % (path, getpass.getuser()) )
-        exit()
+    return devices
 
-    print("*************************************************************")
-    print("path: %s\nuser: %s (uid: %s)\nowner: %s" % (path, user, uid, owner))
+def is_allowed(path: str, devices) -> bool:
+    """ whether the resolved `path` is a regular file below one of `devices` """
+    if not any(os.path.commonpath((path, device)) == device for device in devices):
+        return False
+
+    return st.S_ISREG(os.lstat(path).st_mode)
+
+def serve(uid: int, rfile = sys.stdin, wfile = sys.stdout, root: str = HWMON_CLASS_DIR):
+    """
+    answers chown requests from `rfile` until it is closed, devices are looked
+    up below `root` for every request as a reloaded driver recreates them
+    """
+    for line in rfile:
+        path = line.rstrip('\n')
+
+        if not path:
+            continue
 
-    if os.path.isfile(TMP_FILE):
-        print("Failed!")
-    else:
         try:
-            #create temporary file
-            with open(TMP_FILE, "w") as tmp_file:
-                tmp_file.write(uid)
+            path = os.path.realpath(path)
+            if not is_allowed(path, allowed_devices(root)):
+                raise PermissionError(f"{path} is not an attribute of an {'/'.join(ALLOWED_HWMON_NAMES)} device")
+
+            os.chown(path, uid, -1)
         except Exception as e:
-            print("Error!\nFailed to create temporary file, the error was:\n" + str(e))
-            exit
+            wfile.write(f"ERR {e}\n")
+        else:
+            wfile.write("OK\n")
+
+        wfile.flush()
+
+class PermissionHelper:
+    """
+    client for the privileged helper, the helper process is started on the
+    first path which is not already writable and reused for every later request
+    """
+    def __init__(self):
+        self.__writable = set()
+        self.__process = None
+        self.__lock = threading.Lock()
+
+    def __spawn(self):
+        args = [sys.executable, os.path.abspath(__file__), SERVE_ARG, str(os.geteuid())]
+
+        if (os.geteuid() != 0):
+            print(f"{getpass.getuser()} requires ownership of sysfs paths, respawning helper using sudo...")
+            args.insert(0, 'sudo')
+
+        return subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+
+    def __request(self, path):
+        if (self.__process is None) or (self.__process.poll() is not None):
+            self.__process = self.__spawn()
 
-        print('Respawning using sudo...', end=' ')
-        sys.stdout.flush()
-        os.execvp('sudo', ['sudo', 'python3'] + sys.argv)
+        self.__process.stdin.write(f"{path}\n")
+        self.__process.stdin.flush()
 
-# clean up temporary file
-if os.path.isfile(TMP_FILE):
-    os.remove(TMP_FILE)
+        response = self.__process.stdout.readline().strip()
 
-print("*************************************************************")
+        if (response == ""):
+            self.__process = None
+            raise PermissionError(f"permission helper exited while changing owner of {path}")
+        if (response != "OK"):
+            raise PermissionError(f"failed to change owner of {path}: {response[4:]}")
+
+    def ensure_writable(self, path):
+        """
+        makes `path` writable for the current user, raises `PermissionError` on failure
+        """
+        if path in self.__writable:
+            return
+
+        with self.__lock:
+            if path in self.__writable:
+                return
+
+            if not os.access(path, os.W_OK):
+                self.__request(path)
+
+            self.__writable.add(path)
+
+    def forget(self, path, error: OSError = None):
+        """
+        drops `path` from the writable paths, when given only if `error` denied access to it
+        """
+        if (error is None) or (error.errno in (errno.EACCES, errno.EPERM)):
+            self.__writable.discard(path)
+
+    def close(self):
+        """
+        stops the helper process, closing stdin ends its request loop
+        """
+        with self.__lock:
+            if self.__process is not None:
+                self.__process.stdin.close()
+                self.__process.wait()
+                self.__process = None
+
+# shared by every `HwMon` instance so the helper is only escalated once
+PERMISSIONS = PermissionHelper()
+
+if __name__ == '__main__':
+    if (len(sys.argv) == 1):
+        print("Usage: %s PATH\n       %s %s UID" % (sys.argv[0], sys.argv[0], SERVE_ARG))
+        exit()
+
+    if (sys.argv[1] == SERVE_ARG):
+        serve(int(sys.argv[2]))
+        exit()
+
+    path = sys.argv[1]
+
+    print("*************************************************************")
+    print("path: %s\nuser: %s (uid: %s)\nowner: %s" % (path, getpass.getuser(), os.geteuid(), find_owner(path)))
+
+    try:
+        PERMISSIONS.ensure_writable(path)
+        print("Done!")
+    except Exception as e:
+        print("Error! Failed to chown, the error was:\n" + str(e))
+    finally:
+        PERMISSIONS.close()
+
+    print("*************************************************************")
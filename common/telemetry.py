@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import logging
+
+import numpy as np
+
+from common.controller import controller_state
+from common.config import data_dir
+
+#
+# telemetry.py
+#
+#  Records every control tick of every card to rotating binary files, records
+#   are collected in memory and written in batches
+#
+
+LOG = logging.getLogger(__name__)
+
+TELEMETRY_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('card', '<u2'),
+    ('pwm1_enable', '<u1'),
+    ('temp1_input_degrees', '<f4'),
+    ('fan1_input', '<f4'),
+    ('pwm1', '<u2'),
+    ('pwm1_max', '<u2'),
+    ('target_pwm', '<u2'),
+    ('curve_percent', '<f4'),
+    ('power1_average_watts', '<f4'),
+    ('pp_dpm_sclk_mhz', '<f4'),
+    ('pp_dpm_mclk_mhz', '<f4'),
+])
+
+# a file starts with the magic, the length of the json header and the header,
+# which describes the records following it
+TELEMETRY_MAGIC = b'AGFCTLM1'
+
+TELEMETRY_FILE = 'telemetry.bin'
+
+# records held in memory before they are written
+TELEMETRY_BATCH = 512
+
+# pending records are written at least this often (seconds)
+TELEMETRY_FLUSH_INTERVAL = 30
+
+# a file is rotated once it grows beyond this size, this many are kept
+TELEMETRY_MAX_BYTES = 16 * 1024 * 1024
+TELEMETRY_BACKUPS = 4
+
+def telemetry_path() -> str:
+    """ default telemetry file next to the monitor history """
+    return os.path.join(data_dir(), TELEMETRY_FILE)
+
+def telemetry_header() -> bytes:
+    header = json.dumps({ 'descr': TELEMETRY_DTYPE.descr }).encode('utf-8')
+
+    return TELEMETRY_MAGIC + len(header).to_bytes(4, 'little') + header
+
+class TelemetryLogger:
+    """
+    Appends a `TELEMETRY_DTYPE` record per control tick to `path`
+
+    Records are stored into a preallocated array, nothing is formatted or
+    written per tick. The batch is written once `batch` records are pending
+    or `flushInterval` seconds passed, without fsync, `flushDue` checks the
+    interval between records. Files are rotated like
+    `logging.handlers.RotatingFileHandler` does, `path.1` being the newest
+    backup. A logger must only be used from a single thread
+    """
+    def __init__(self, path: str = None, batch: int = TELEMETRY_BATCH, flushInterval: float = TELEMETRY_FLUSH_INTERVAL,
+                 maxBytes: int = TELEMETRY_MAX_BYTES, backups: int = TELEMETRY_BACKUPS):
+        self.path = path or telemetry_path()
+        self.flushInterval = flushInterval
+        self.maxBytes = maxBytes
+        self.backups = backups
+
+        self.__buffer = np.zeros(batch, dtype=TELEMETRY_DTYPE)
+        self.__pending = 0
+        self.__lastFlush = time.monotonic()
+        self.__file = None
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def record(self, index: int, state: controller_state, curvePercent: float, timestamp: float = None):
+        """ stores a control tick of card `index` """
+        sample = state.sample
+
+        self.__buffer[self.__pending] = (
+            time.time() if timestamp is None else timestamp,
+            index,
+            sample.pwm1_enable,
+            sample.temp1_input_degrees,
+            sample.fan1_input,
+            sample.pwm1,
+            sample.pwm1_max,
+            state.targetSpeed,
+            curvePercent,
+            sample.power1_average_watts,
+            sample.pp_dpm_sclk_mhz,
+            sample.pp_dpm_mclk_mhz,
+        )
+
+        self.__pending += 1
+
+        if (self.__pending == len(self.__buffer)):
+            self.flush()
+        else:
+            self.flushDue()
+
+    def flushDue(self):
+        """ writes the pending records once `flushInterval` seconds passed, called periodically when ticks may stop """
+        if ((time.monotonic() - self.__lastFlush) >= self.flushInterval):
+            self.flush()
+
+    def flush(self):
+        """ writes the pending records """
+        self.__lastFlush = time.monotonic()
+
+        if (self.__pending == 0):
+            return
+
+        if (self.__file is not None) and (self.__file.tell() >= self.maxBytes):
+            self.__rotate()
+
+        if (self.__file is None):
+            self.__open()
+
+        self.__file.write(self.__buffer[:self.__pending].tobytes())
+        self.__file.flush()
+
+        self.__pending = 0
+
+    def close(self):
+        self.flush()
+
+        if (self.__file is not None):
+            self.__file.close()
+            self.__file = None
+
+    def __open(self):
+        try:
+            with open(self.path, 'rb+') as f:
+                valid = (f.read(len(TELEMETRY_MAGIC)) == TELEMETRY_MAGIC) and (read_telemetry_header(f) == TELEMETRY_DTYPE)
+
+                if valid:
+                    # drop a record cut short by a crash so appended records stay aligned
+                    size = os.fstat(f.fileno()).st_size
+                    f.truncate(size - ((size - f.tell()) % TELEMETRY_DTYPE.itemsize))
+        except FileNotFoundError:
+            valid = None
+        except (OSError, ValueError):
+            valid = False
+
+        if (valid is False):
+            # written by another version, keep it as a backup
+            self.__rotate()
+
+        self.__file = open(self.path, 'ab')
+
+        if (self.__file.tell() == 0):
+            self.__file.write(telemetry_header())
+
+    def __rotate(self):
+        if (self.__file is not None):
+            self.__file.close()
+            self.__file = None
+
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+
+        if os.path.exists(self.path):
+            if (self.backups > 0):
+                os.replace(self.path, f'{self.path}.1')
+            else:
+                os.remove(self.path)
+
+        LOG.debug(f'rotated {self.path}')
+
+def read_telemetry_header(f) -> np.dtype:
+    """ dtype of the records following the header, `f` is positioned after the magic """
+    length = int.from_bytes(f.read(4), 'little')
+    header = json.loads(f.read(length).decode('utf-8'))
+
+    return np.dtype([tuple(field) for field in header['descr']])
+
+def read_telemetry(path: str = None, backups: int = TELEMETRY_BACKUPS) -> np.ndarray:
+    """
+    every record of the telemetry file `path` (default `telemetry_path()`) and
+    its `backups` as a structured array ordered from oldest to newest, `backups`
+    is the count the `TelemetryLogger` was created with
+    """
+    path = path or telemetry_path()
+    paths = [f'{path}.{i}' for i in range(backups, 0, -1)] + [path]
+
+    arrays = []
+
+    for name in paths:
+        if not os.path.isfile(name):
+            continue
+
+        with open(name, 'rb') as f:
+            if (f.read(len(TELEMETRY_MAGIC)) != TELEMETRY_MAGIC):
+                LOG.warning(f'{name} is not a telemetry file')
+                continue
+
+            dtype = read_telemetry_header(f)
+
+            # a record cut short by a crash is dropped
+            arrays.append(np.fromfile(f, dtype=dtype, count=(os.fstat(f.fileno()).st_size - f.tell()) // dtype.itemsize))
+
+    if not arrays:
+        return np.zeros(0, dtype=TELEMETRY_DTYPE)
+
+    return np.concatenate(arrays) if all(a.dtype == arrays[0].dtype for a in arrays) else np.concatenate([a.astype(TELEMETRY_DTYPE) for a in arrays])
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import functools
+from typing import NamedTuple
+
+#
+# timings.py
+#
+#  Times the phases of the update and monitor ticks, each phase keeps its most
+#   recent durations so their percentiles can be shown in the debug panel or
+#   dumped to the log. Timing is enabled by the `TIMINGS_ENV_VAR` environment
+#   variable, or at runtime through `TIMINGS.enabled`
+#
+
+LOG = logging.getLogger(__name__)
+
+TIMINGS_ENV_VAR = "AMDGPU_FAN_TIMINGS"
+
+# durations kept per phase, the percentiles describe this many recent ticks
+TIMINGS_WINDOW = 1024
+
+class phase_stats(NamedTuple):
+    """
+    percentiles of the recent durations of a phase in milliseconds
+    """
+    count: int
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+class LatencyWindow:
+    """
+    The most recent `length` durations of a phase, adding one costs a store
+    into a preallocated list, percentiles are only computed when asked for
+    """
+    __slots__ = ('samples', 'index', 'count')
+
+    def __init__(self, length: int = TIMINGS_WINDOW):
+        self.samples = [0.0] * length
+        self.index = 0
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples[self.index] = seconds
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def stats(self) -> phase_stats:
+        recent = sorted(self.samples[:min(self.count, len(self.samples))])
+        if not recent:
+            return phase_stats(0, 0.0, 0.0, 0.0, 0.0)
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p / 100 * len(recent)))] * 1000
+
+        return phase_stats(self.count, percentile(50), percentile(95), percentile(99), recent[-1] * 1000)
+
+class PhaseTimings:
+    """
+    A `LatencyWindow` per phase name, phases are timed by methods decorated
+    with `timed`, which only check `enabled` while timing is disabled
+    """
+    def __init__(self, enabled: bool = False, window: int = TIMINGS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.phases = {}
+
+    def record(self, name: str, seconds: float):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases.setdefault(name, LatencyWindow(self.window))
+
+        phase.add(seconds)
+
+    def timed(self, name: str):
+        """ decorator recording the duration of every call as phase `name` while enabled """
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorate
+
+    def reset(self):
+        self.phases = {}
+
+    def stats(self) -> dict:
+        """ `phase_stats` of every phase by name """
+        return { name: phase.stats() for name, phase in sorted(self.phases.items()) }
+
+    def format(self) -> str:
+        lines = [f'{"phase":32} {"count":>8} {"p50":>9} {"p95":>9} {"p99":>9} {"max":>9} (ms)']
+
+        for name, s in self.stats().items():
+            lines.append(f'{name:32} {s.count:8d} {s.p50:9.3f} {s.p95:9.3f} {s.p99:9.3f} {s.max:9.3f}')
+
+        return '\n'.join(lines)
+
+    def dump(self):
+        """ logs the percentiles of every phase """
+        if not self.phases:
+            LOG.info('no tick timings recorded' + ('' if self.enabled else f', set {TIMINGS_ENV_VAR}=1 to record them'))
+            return
+
+        LOG.info(f'tick timings of the last {self.window} ticks per phase\n{self.format()}')
+
+# shared by every instrumented module
+TIMINGS = PhaseTimings(enabled=os.environ.get(TIMINGS_ENV_VAR, '0') not in ('', '0'))
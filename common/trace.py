@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import json
+import time
+import atexit
+import bisect
+import logging
+import threading
+
+from common.backends import HwMonBackend
+
+#
+# trace.py
+#
+#  Records every read and write `HwMon` makes through a backend, with its time,
+#   and replays a recorded session as a backend, in real time or sped up, so
+#   the GUI and the control loop can be driven without the hardware
+#
+#  A trace holds a JSON object per line, the first one is the header holding
+#   the discovered interfaces, every following one an event:
+#
+#   [seconds since the start, "r" or "w", interface path, attribute, value]
+#
+#  Unsupported attributes are read as null. Traces ending in `.gz` are gzip
+#   compressed
+#
+
+LOG = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+TRACE_READ = 'r'
+TRACE_WRITE = 'w'
+
+# buffered events are written at least this often (seconds)
+TRACE_FLUSH_INTERVAL = 5
+
+def open_trace(path: str, mode: str):
+    """ opens the trace file `path` as text, compressed when it ends in `.gz` """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+class RecordingBackend(HwMonBackend):
+    """
+    Forwards everything to `backend` and appends every read and write to the
+    trace file `path`, timed by `clock`, the file is flushed on `close` and at exit
+    """
+    def __init__(self, backend: HwMonBackend, path: str, clock = time.monotonic):
+        self.backend = backend
+        self.path = path
+        self.clock = clock
+
+        self.__start = clock()
+        self.__lastFlush = self.__start
+        self.__lock = threading.Lock()
+        self.__file = open_trace(path, 'w')
+        self.__header = False
+
+        atexit.register(self.close)
+
+    def __record(self, kind: str, path: str, attribute: str, value):
+        now = self.clock()
+        line = json.dumps([round(now - self.__start, 6), kind, path, attribute, value]) + '\n'
+
+        with self.__lock:
+            if self.__file is None:
+                return
+
+            self.__file.write(line)
+
+            if (now - self.__lastFlush) >= TRACE_FLUSH_INTERVAL:
+                self.__lastFlush = now
+                self.__file.flush()
+
+    def discover(self) -> dict:
+        interfaces = self.backend.discover()
+
+        with self.__lock:
+            # the header is the first line, later discoveries are expected to match it
+            if (self.__file is not None) and (not self.__header):
+                self.__header = True
+                self.__file.write(json.dumps({ 'version': TRACE_VERSION, 'time': time.time(), 'interfaces': list(interfaces.values()) }) + '\n')
+
+        return interfaces
+
+    def read(self, path: str, attribute: str):
+        value = self.backend.read(path, attribute)
+        self.__record(TRACE_READ, path, attribute, value)
+
+        return value
+
+    def write(self, path: str, attribute: str, value: str):
+        self.backend.write(path, attribute, value)
+        self.__record(TRACE_WRITE, path, attribute, str(value))
+
+    def release(self, path: str):
+        self.backend.release(path)
+
+    def close(self):
+        with self.__lock:
+            if self.__file is None:
+                return
+
+            self.__file.close()
+            self.__file = None
+
+        self.backend.close()
+        LOG.info(f'hwmon trace written to {self.path}')
+
+class replay_series:
+    """
+    every value recorded for a single attribute, ordered by time
+    """
+    __slots__ = ('times', 'values', 'cursor')
+
+    def __init__(self):
+        self.times = []
+        self.values = []
+        self.cursor = 0
+
+class ReplayBackend(HwMonBackend):
+    """
+    Serves the reads of a trace recorded by `RecordingBackend`
+
+    At a `speed` above 0 a read returns the value the attribute had at the
+    replay time, which runs `speed` times faster than `clock`. At speed 0 the
+    trace is replayed as fast as it is read, every read of an attribute
+    returning its next recorded value. The trace starts over once it ends.
+    Writes are accepted and counted in `writes` but change nothing, the
+    recorded reads already reflect the writes of the recorded session
+    """
+    def __init__(self, path: str, speed: float = 1.0, clock = time.monotonic):
+        self.path = path
+        self.speed = float(speed)
+        self.clock = clock
+
+        self.interfaces = []
+        self.series = {}
+        self.duration = 0.0
+        self.writes = 0
+
+        self.__load()
+
+        self.__start = clock()
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        with open_trace(self.path, 'r') as f:
+            header = json.loads(f.readline() or 'null')
+
+            if (not isinstance(header, dict)) or (header.get('version') != TRACE_VERSION):
+                raise ValueError(f'{self.path} is not a version {TRACE_VERSION} hwmon trace')
+
+            self.interfaces = header['interfaces']
+
+            for line in f:
+                try:
+                    timestamp, kind, path, attribute, value = json.loads(line)
+                except ValueError:
+                    # the last line of a trace cut short by a crash
+                    break
+
+                if (kind != TRACE_READ):
+                    continue
+
+                series = self.series.get((path, attribute))
+                if series is None:
+                    series = self.series[(path, attribute)] = replay_series()
+
+                series.times.append(timestamp)
+                series.values.append(value)
+                self.duration = max(self.duration, timestamp)
+
+        LOG.info(f'replaying {sum(len(s.values) for s in self.series.values())} reads over {self.duration:.1f}s from {self.path}')
+
+    @property
+    def position(self) -> float:
+        """ replay time in seconds since the start of the trace """
+        elapsed = (self.clock() - self.__start) * self.speed
+
+        return (elapsed % self.duration) if (self.duration > 0) else 0.0
+
+    def discover(self) -> dict:
+        return { index: dict(interface) for index, interface in enumerate(self.interfaces) }
+
+    def read(self, path: str, attribute: str):
+        series = self.series.get((path, attribute))
+        if series is None:
+            return None
+
+        if (self.speed > 0):
+            return series.values[max(0, bisect.bisect_right(series.times, self.position) - 1)]
+
+        with self.__lock:
+            value = series.values[series.cursor]
+            series.cursor = (series.cursor + 1) % len(series.values)
+
+        return value
+
+    def write(self, path: str, attribute: str, value: str):
+        if path not in (interface['path'] for interface in self.interfaces):
+            raise FileNotFoundError(f'{path}/{attribute}')
+
+        with self.__lock:
+            self.writes += 1
+
+        LOG.debug(f'replay ignores {path}/{attribute} = {value}')
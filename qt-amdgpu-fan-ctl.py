@@ -1,20 +1,59 @@
 # -*- coding: utf-8 -*-
 
 import sys, os
+import signal
+import argparse
+import logging
+
+def parse_args(argv):
+    """ Parses the command line, unknown arguments are left for Qt """
+    parser = argparse.ArgumentParser(description='GUI controllable fan-curve for the AMDGPU driver')
+    parser.add_argument('--daemon', action='store_true', help='apply the saved fan curve without the GUI')
+    parser.add_argument('--card', default=None, help='hwmon interface index or PCI slot of the card to control in daemon mode')
+    parser.add_argument('--all-cards', action='store_true', help='control every discovered card in daemon mode')
+    parser.add_argument('--backend', default=None, help='hwmon backend: sysfs (default), fake[:DIR], sim[:CARDS] or replay:FILE[@SPEED|@max]')
+    parser.add_argument('--record', default=None, metavar='FILE', help='record every hwmon read and write to the trace FILE')
+
+    return parser.parse_known_args(argv[1:])
+
+if __name__ == '__main__':
+    ARGS, QT_ARGV = parse_args(sys.argv)
+
+    if ARGS.backend is not None:
+        # read by `common.backends.get_backend` when the first `HwMon` is created
+        os.environ['AMDGPU_FAN_BACKEND'] = ARGS.backend
+
+    if ARGS.record is not None:
+        os.environ['AMDGPU_FAN_RECORD'] = ARGS.record
+
+    if ARGS.daemon:
+        # headless mode, Qt, pyqtgraph and numpy are never imported
+        logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
+
+        from common.daemon import main as daemon_main
+        sys.exit(daemon_main(ARGS))
+
 os.environ['PYQTGRAPH_QT_LIB'] = 'PyQt5'
 
 import pyqtgraph as pg
 import ui.mainwindow as mainwindow
 from ui.monitorwindow import MonitorWindow
+from ui.debugwindow import DebugWindow
 
 from PyQt5 import QtCore, QtWidgets
 
-from common.hwmonInterface import HwMon, accepted_pwm1_enable, accepted_power_dpm_force_performance_level
-from common.graphs  import InitPlotWidget, EditableGraph, get_plotwidget_item, graph_from_widget
-from common.config import Config, CONFIG_INTERVAL_VAR, CONFIG_POINT_VAR
+from common.hwmonInterface import HwMon, sysfs_device, accepted_pwm1_enable, accepted_power_dpm_force_performance_level, read_identity
+from common.graphs  import InitPlotWidget, EditableGraph, get_plotwidget_item, graph_from_widget, plotwidget_add_item
+from common.config import Config, CONFIG_POINT_VAR, CONFIG_HISTORY_VAR, CONFIG_HISTORY_DAYS_VAR, CONFIG_METRICS_PORT_VAR, CONFIG_LOGGING_VAR
+from common.poller import HwMonPoller
+from common.sampler import HwMonSampler
+from common.profiles import ProfileStore
+from common.adaptive import adaptive_from_config
+from common.exporter import MetricsStore, exporter_from_config
+from common.timings import TIMINGS
+from common.profiling import ProfileSession, PROFILE_ENV_VAR, PROFILE_SIGNAL, profile_seconds
 from common.theme import *
 
-import logging
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 
 LOG = logging.getLogger(__name__)
@@ -32,28 +71,48 @@ class MainWindow(QtWidgets.QMainWindow):
         self._init_drivervalues()
         self._init_styles()
         self._init_monitor_ui()
+        self._init_profiling()
 
-        # start working now
-        self._timer_update_tick()
+        # start working now, the first sample arrives once the sampler thread runs
+        self.sampler.start()
 
     def _init_locals(self):
         """ Initializes `local` variables """
         pg.setConfigOptions(antialias=True)
 
+        # every card is controlled by the poller on the sampler thread, this one is only read here
         self.hwmon = HwMon()
         self.config = Config()
-        
-        self.lastFanValue = -1
 
-    def _init_timers(self):
-        """ Initializes timers and starts them """
-        self.timerUI = QtCore.QTimer()
-        self.timerUI.timeout.connect(self._timer_update_tick)
-        self.timerUI.start()
+        # the fan profile shown is the one of `profileIndex`
+        self.profiles = ProfileStore(self.config)
+        self.profiles.setPresent(read_identity(self.hwmon.backend, iface['path']) for iface in self.hwmon.interfaces.values())
+        self.profileIndex = self.hwmon.index
 
-        self.timerMonitor = QtCore.QTimer() 
-        self.timerMonitor.timeout.connect(self._timer_monitor_tick)
-        self.timerMonitor.start(1000)
+        self.poller = HwMonPoller(self.config.getValue(CONFIG_POINT_VAR))
+        self.poller.bindProfiles(self.profiles)
+
+        # the sampler thread has not started yet, the constants of every card are read now
+        self.crit = { index: controller.hwmon.temp1_crit_degrees for index, controller in self.poller.controllers.items() }
+
+    def _init_timers(self):
+        """ Initializes the `HwMonSampler` which controls every card, it is started last """
+        self.sampler = HwMonSampler(
+            self.poller,
+            intervals={ index: self.profiles.profile(index).interval for index in self.poller.controllers },
+            adaptive={ index: adaptive_from_config(self.config, self.profiles.profile(index).interval) for index in self.poller.controllers },
+            historyCapacity=int(self.config.getValue(CONFIG_HISTORY_DAYS_VAR)) * 24 * 60 * 60,
+            metrics=MetricsStore(),
+            telemetry=bool(self.config.getValue(CONFIG_LOGGING_VAR))
+        )
+        self.exporter = exporter_from_config(self.sampler.metrics, self.config.getValue(CONFIG_METRICS_PORT_VAR))
+        # the curve is compiled here whenever the points change, the sampler thread only receives it
+        get_plotwidget_item(self.ui.graphicsView).curveChanged.connect(self._graph_curve_changed)
+        self.sampler.updated.connect(self._timer_update_tick)
+        self.sampler.monitored.connect(self._timer_monitor_tick)
+        self.sampler.intervalChanged.connect(self._sampler_interval_changed)
+        self.sampler.historyLoaded.connect(self._sampler_history_loaded)
+        self._sampler_interval_changed(self.profileIndex, self.sampler.cards[self.profileIndex].effectiveInterval)
 
     def _init_pyqtsignals(self):
         """ Connects pyqt5 signals to various slots """
@@ -64,11 +123,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.comboBoxPerfProfile.currentTextChanged.connect(self._combo_perf_profile_changed)
         self.ui.pushButtonMonitor.clicked.connect(self._button_monitor_toggled)
 
-        self._spin_interval_changed(self.config.getValue(CONFIG_INTERVAL_VAR))
+        self.ui.checkBoxEnableLogging.setChecked(bool(self.config.getValue(CONFIG_LOGGING_VAR)))
+        self.ui.checkBoxEnableLogging.toggled.connect(self._check_logging_toggled)
+
+        self._show_profile(self.profileIndex)
 
         self.ui.pushButtonAdd.clicked.connect(get_plotwidget_item(self.ui.graphicsView).addPoint)
         self.ui.pushButtonRemove.clicked.connect(get_plotwidget_item(self.ui.graphicsView).removePoint)
 
+        QtWidgets.QShortcut(QtCore.Qt.Key_F12, self, self._shortcut_debug_activated)
+
         self.closeEvent = self._mainwindow_closeevent
 
     def _init_graphview(self):
@@ -98,8 +162,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         EditableGraph(
             self.ui.graphicsView,
-            data=self.config.getValue(CONFIG_POINT_VAR),
-            staticPos=[self.hwmon.temp1_crit / 1000, 100]
+            data=self.profiles.profile(self.profileIndex).points,
+            staticPos=[self.crit[self.profileIndex], 100]
         )
        
     def _init_graph_lines(self):
@@ -114,26 +178,24 @@ class MainWindow(QtWidgets.QMainWindow):
         pg.InfLineLabel(lineCurrTemp, text="Temp {value}°C'", position=0.9, rotateAxis=(-1,0))
         pg.InfLineLabel(lineCurrFan, text="Fan {value}%", position=0.2, rotateAxis=(0,0))
 
-        self.ui.graphicsView.addItem(lineCurrTemp)
-        self.ui.graphicsView.addItem(lineCurrFan)
+        plotwidget_add_item(self.ui.graphicsView, lineCurrTemp)
+        plotwidget_add_item(self.ui.graphicsView, lineCurrFan)
 
     def _init_graph_legend(self):
         """ Adds a `LegendItem` which has a `ScatterPlotItem` for both the Max Temperature and Fan Targets """
         legendItem = pg.LegendItem(offset=[0, 100])
         
         tempMax = pg.ScatterPlotItem(pen=pg.mkPen('#ff0000'), width=2)
-        tempMax._name = 'tMax'
-        tempMax.setData([int(self.hwmon.temp1_crit / 1000)], [100], symbol='d')
+        tempMax.setData([int(self.crit[self.profileIndex])], [100], symbol='d')
 
         fanTarget = pg.ScatterPlotItem(pen=pg.mkPen('#0000ff'), width=2)
-        fanTarget._name = 'targetFan'
         fanTarget.setData([-10], [-10], symbol='d')
 
         legendItem.addItem(tempMax, name='GPU tMax')
         legendItem.addItem(fanTarget, name='Fan PWM')
 
-        self.ui.graphicsView.addItem(tempMax)
-        self.ui.graphicsView.addItem(fanTarget)
+        plotwidget_add_item(self.ui.graphicsView, tempMax, 'tMax')
+        plotwidget_add_item(self.ui.graphicsView, fanTarget, 'targetFan')
         # self.ui.graphicsView.addItem(legendItem)
 
     def _init_styles(self):
@@ -151,9 +213,55 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.pushButtonMonitor.setChecked(False)
 
     def _init_monitor_ui(self):
-        self.monwindow = MonitorWindow(self.hwmon)
+        self.monwindow = MonitorWindow(self.hwmon, int(self.config.getValue(CONFIG_HISTORY_VAR)))
         self.monwindow.closeEvent = self._monitor_closed
 
+        self.debugwindow = DebugWindow()
+
+        self.sampler.loadHistory(self.profileIndex, self.monwindow.history)
+
+    def _init_profiling(self):
+        """ Starts a profiling session from `PROFILE_ENV_VAR`, `PROFILE_SIGNAL` starts or stops one """
+        self.profile = None
+
+        self.timerProfile = QtCore.QTimer(self)
+        self.timerProfile.setSingleShot(True)
+        self.timerProfile.timeout.connect(self._stop_profiling)
+
+        # python runs the handler once the main thread runs python again, at the latest on the next tick
+        signal.signal(PROFILE_SIGNAL, lambda signum, frame: QtCore.QTimer.singleShot(0, self._toggle_profiling))
+
+        if os.environ.get(PROFILE_ENV_VAR):
+            self._start_profiling(float(os.environ[PROFILE_ENV_VAR]))
+
+    def _toggle_profiling(self):
+        if (self.profile is None):
+            self._start_profiling(profile_seconds())
+        else:
+            self._stop_profiling()
+
+    def _start_profiling(self, seconds):
+        """ Profiles the gui and the sampler thread for `seconds` """
+        self.profile = ProfileSession(seconds)
+        self.profile.start()
+        self.sampler.invoke(self.profile.enableThread)
+
+        self.timerProfile.start(int(seconds * 1000))
+
+    def _stop_profiling(self):
+        """ Writes the results once the sampler thread stopped profiling as well """
+        session, self.profile = self.profile, None
+        if (session is None):
+            return
+
+        self.timerProfile.stop()
+        session.disableThread()
+
+        if self.sampler.worker.isRunning():
+            self.sampler.invoke(session.finish)
+        else:
+            session.finish()
+
     def _button_monitor_toggled(self, value):
         if (value):
             self.monwindow.move(self.pos().x() + self.frameGeometry().width(), self.pos().y())
@@ -162,83 +270,121 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             self.monwindow.hide()
 
+    def _shortcut_debug_activated(self):
+        """ Shows the tick timings, recording them from now on """
+        TIMINGS.enabled = True
+
+        self.debugwindow.checkBoxRecord.setChecked(True)
+        self.debugwindow.show()
+        self.debugwindow.activateWindow()
+
+    def _show_profile(self, index):
+        """ Shows the fan profile of interface `index` to be edited """
+        profile = self.profiles.profile(index)
+
+        get_plotwidget_item(self.ui.graphicsView).setPoints(profile.points)
+        self._spin_interval_changed(profile.interval)
+
+    def _graph_curve_changed(self, curve):
+        """ Applies the curve shown to its card as it is being edited """
+        self.sampler.setCurve(self.profileIndex, curve)
+
     def _button_enable_toggled(self, value):
         """ Changes the control state """
-        self.hwmon.pwm1_enable = accepted_pwm1_enable.Manual if value else accepted_pwm1_enable.Auto
+        self.profiles.update(self.profileIndex, mode=accepted_pwm1_enable.Manual if value else accepted_pwm1_enable.Auto)
+        self.sampler.setEnabled(self.profileIndex, value)
+
+    def _check_logging_toggled(self, value):
+        """ Starts or stops recording the telemetry of every control tick """
+        self.config.setValue(CONFIG_LOGGING_VAR, value)
+        self.sampler.setTelemetry(value)
 
     def _button_save_clicked(self):
-        """ Saves and applies the fan curve """
+        """ Saves and applies the fan curve to the profile of the card """
         data = get_plotwidget_item(self.ui.graphicsView).pos.tolist()
 
-        self.config.setValue(CONFIG_POINT_VAR, data)
+        self.profiles.update(self.profileIndex, points=data)
         self.config.save()
 
     def _spin_interval_changed(self, value):
-        """ Set the `mainwindow` timer timeout """
-        self.config.setValue(CONFIG_INTERVAL_VAR, value)
-        self.timerUI.setInterval(int(value))
+        """ Set the control interval of the card """
+        self.profiles.update(self.profileIndex, interval=int(value))
+        self.sampler.setInterval(self.profileIndex, int(value))
 
         if ( self.ui.spinBoxInterval.value != value ):
             self.ui.spinBoxInterval.setValue(int(value))
     
+    def _sampler_interval_changed(self, index, value):
+        """ Shows the effective control period chosen in adaptive mode """
+        if (index == self.profileIndex) and (self.sampler.cards[index].adaptive is not None):
+            self.ui.labelSLabel.setText(f"ms (now {value:.0f} ms, {1000 / value:.1f} Hz)")
+
+    def _sampler_history_loaded(self, index, records):
+        """ Shows the recorded history of the card shown, it holds every sample published so far """
+        if (index != self.profileIndex):
+            return
+
+        self.monwindow.clear()
+
+        if (records is not None):
+            self.monwindow.load_history(records)
+
     def _combo_card_index_changed(self, value):
-        if (value == -1):
+        """ Shows the card `value`, every card stays controlled by its own profile """
+        if (value == -1) or (value == self.profileIndex):
             return
-        self.hwmon.interface = value
+
+        # edits of the previous card which were not saved are dropped with it
+        self.sampler.setCurve(self.profileIndex, self.profiles.curve(self.profileIndex))
+
+        self.profileIndex = value
+
+        # the curve of this card ends at its own critical temperature
+        crit = self.crit[value]
+        get_plotwidget_item(self.ui.graphicsView).staticPos = [crit, 100]
+        get_plotwidget_item(self.ui.graphicsView, 'tMax').setData([int(crit)], [100], symbol='d')
+
+        self._show_profile(value)
+        self._sampler_interval_changed(value, self.sampler.cards[value].effectiveInterval)
+
+        self.sampler.loadHistory(value, self.monwindow.history)
 
     def _combo_perf_profile_changed(self, value):
         """ Set the `power_dpm_force_performance_level` when the user changes the value """
         for level in accepted_power_dpm_force_performance_level:
             if (str(value.lower()) == str(level)):
-                self.hwmon.power_dpm_force_performance_level = level
+                self.sampler.write(self.profileIndex, sysfs_device.power_dpm_force_performance_level, level)
                 
-    def _timer_update_tick(self):
-        """ Event occurs on timertick from the Update Interval on the `mainwindow` """
-        self._get_hwmon_values()
-        self._refresh_main_ui()
-        self._set_hwmon_values()
+    @TIMINGS.timed('MainWindow._timer_update_tick')
+    def _timer_update_tick(self, index, state):
+        """ Event occurs for every `controller_state` published by the sampler thread """
+        if (index != self.profileIndex):
+            return
 
-    def _get_hwmon_values(self):
-        """ Retrieves values from `hwmon` interface and stores them in global variables """
-        # acquire hardware values
-        self.pwm1_max = self.hwmon.pwm1_max
-        self.temp1_input = self.hwmon.temp1_input_degrees
-        
-        self.temp1_crit = self.hwmon.temp1_crit_degrees
-        self.pwm1_enable = self.hwmon.pwm1_enable
-        
-        intesect = graph_from_widget(self.ui.graphicsView).getIntersection(x=self.temp1_input)
+        self.sample = state.sample
+        self.targetSpeed = state.targetSpeed
 
-        self.targetSpeed = int((intesect / 100) * self.pwm1_max)
-        self.fanSpeed = int((self.hwmon.pwm1 / self.pwm1_max) * 100)
+        self._refresh_main_ui()
 
     def is_hwmon_ctrl_state_manual(self):
         """ checks if the manual state is set in hardware """
         # compare the local value against it's corresponding enum
-        return ( self.pwm1_enable == accepted_pwm1_enable.Manual.value )
-
-    def _set_hwmon_values(self):
-        """ Sends values to the `hwmon` interface """
-        if ( self.is_hwmon_ctrl_state_manual() ):
-            if ( self.lastFanValue != self.targetSpeed ):
-                self.hwmon.pwm1 = self.targetSpeed
-                self.lastFanValue = self.targetSpeed
-        else:
-            if ( self.ui.pushButtonEnable.isChecked() ):
-                # restore the state we set last
-                self.hwmon.pwm1_enable = accepted_pwm1_enable.Manual
+        return ( self.sample.pwm1_enable == accepted_pwm1_enable.Manual.value )
 
+    @TIMINGS.timed('MainWindow._refresh_main_ui')
     def _refresh_main_ui(self):
         """ Refresh the user interface with data aquired from the `hwmon` interface """
         # calculate red (higher or hotter) vs green (cooler or normal) balance
 
+        sample = self.sample
+
         base_temp = 0
-        delta = (self.temp1_input - base_temp) / (self.temp1_crit - base_temp) % 1
+        delta = (sample.temp1_input_degrees - base_temp) / (sample.temp1_crit_degrees - base_temp) % 1
 
         r = int(255 * delta)
         g = 255 - r
 
-        LOG.debug(f'tdiff={self.temp1_input - base_temp}, delta={delta}, r={r}, g={g} b=255')
+        LOG.debug(f'tdiff={sample.temp1_input_degrees - base_temp}, delta={delta}, r={r}, g={g} b=255')
 
         if ( self.is_hwmon_ctrl_state_manual() ):
             color = BG_COLOR_MANUAL
@@ -247,33 +393,33 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             color = BG_COLOR_AUTO
             button = "Enable"
-            target_indicator_y = [self.fanSpeed]
+            target_indicator_y = [sample.fan1_percent]
 
         get_plotwidget_item(self.ui.graphicsView, 'targetFan').setPen(color)
-        get_plotwidget_item(self.ui.graphicsView, 'targetFan').setData(self.temp1_input, target_indicator_y)
+        get_plotwidget_item(self.ui.graphicsView, 'targetFan').setData(sample.temp1_input_degrees, target_indicator_y)
 
-        get_plotwidget_item(self.ui.graphicsView, 'currTemp').setValue(self.temp1_input)
-        get_plotwidget_item(self.ui.graphicsView, 'currFan').setValue(self.fanSpeed)
+        get_plotwidget_item(self.ui.graphicsView, 'currTemp').setValue(sample.temp1_input_degrees)
+        get_plotwidget_item(self.ui.graphicsView, 'currFan').setValue(sample.fan1_percent)
 
         self.ui.pushButtonEnable.setText(button)
         self.ui.pushButtonEnable.setChecked(self.is_hwmon_ctrl_state_manual())
 
-        self.ui.labelTemperature.setText("%s °C" % self.temp1_input)
+        self.ui.labelTemperature.setText("%s °C" % sample.temp1_input_degrees)
         self.ui.labelTemperature.setStyleSheet(UI_QLABEL_BG_CSS % '#{:02x}{:02x}{:02x}'.format(r, g, 0))
 
-        self.ui.labelFanSpeed.setText("%s RPM" % self.hwmon.fan1_input)
+        self.ui.labelFanSpeed.setText("%s RPM" % sample.fan1_input)
 
-        self.ui.labelFanProfileStatus.setText("%s" % accepted_pwm1_enable(self.pwm1_enable))
+        self.ui.labelFanProfileStatus.setText("%s" % accepted_pwm1_enable(sample.pwm1_enable))
         self.ui.labelFanProfileStatus.setStyleSheet(UI_QLABEL_BG_CSS % color)
 
-        self.ui.labelPower.setText("%.1f W" % (self.hwmon.power1_average_watts))
-        self.ui.labelVoltage.setText("%d mV" % self.hwmon.in0_input)
+        self.ui.labelPower.setText("%.1f W" % (sample.power1_average_watts))
+        self.ui.labelVoltage.setText("%d mV" % sample.in0_input)
 
-        self.ui.labelMemClock.setText("%s MHz" % self.hwmon.pp_dpm_mclk_mhz)
-        self.ui.labelCoreClock.setText("%s MHz" % self.hwmon.pp_dpm_sclk_mhz)
+        self.ui.labelMemClock.setText("%s MHz" % sample.pp_dpm_mclk_mhz)
+        self.ui.labelCoreClock.setText("%s MHz" % sample.pp_dpm_sclk_mhz)
 
-        self.ui.comboBoxPerfProfile.setCurrentText(self.hwmon.power_dpm_force_performance_level.title())
-        self.ui.labelPowerProfile.setText(self.hwmon.pp_power_profile_mode_active.mode_name.title())
+        self.ui.comboBoxPerfProfile.setCurrentText(sample.power_dpm_force_performance_level.title())
+        self.ui.labelPowerProfile.setText(sample.pp_power_profile_mode_name.title())
     
 
         if (len(self.hwmon.interfaces) != self.ui.comboBoxCardIndex.count()):
@@ -281,20 +427,37 @@ class MainWindow(QtWidgets.QMainWindow):
             for i in range(len(self.hwmon.interfaces)):
                 self.ui.comboBoxCardIndex.addItem(f'{str(i)} - {self.hwmon.interfaces[i]["name"]}')
 
-        self.ui.labelCurrentLinkSpeed.setText(self.hwmon.current_link_speed.title())
+        self.ui.labelCurrentLinkSpeed.setText(sample.current_link_speed.title())
+
+    def _timer_monitor_tick(self, index, sample):
+        if (index != self.profileIndex):
+            return
 
-    def _timer_monitor_tick(self):
-        self.monwindow.refresh_monitors()
+        self.monwindow.refresh_monitors(sample)
         
     def _mainwindow_closeevent(self, *args, **kwargs):
         """ Handles `mainwindow` closeEvent"""
-        # mainwindow is closing, reset the pwm1_enable to Auto if we have Manually set the value
-        if (accepted_pwm1_enable(self.hwmon.pwm1_enable) == accepted_pwm1_enable.Manual):
-            self.hwmon.pwm1_enable = accepted_pwm1_enable.Auto
+        # queued ahead of the sampler stopping
+        self._stop_profiling()
+
+        # every card is handed back to the driver as the sampler stops
+        self.sampler.stop()
+        self.poller.close()
+
+        if (self.exporter is not None):
+            self.exporter.close()
+
+        self.debugwindow.close()
+
+        # changes still waiting for the quiet period
+        self.config.flush()
+
+        if TIMINGS.enabled:
+            TIMINGS.dump()
 
 def main():
         
-    app = QtWidgets.QApplication(sys.argv)
+    app = QtWidgets.QApplication(sys.argv[:1] + QT_ARGV)
 
     my_mainWindow = MainWindow()
     my_mainWindow.show()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from common.curve import FanCurve
+from common.adaptive import AdaptiveInterval
+from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR, CONFIG_INTERVAL_VAR, CONFIG_INTERVAL_MIN_VAR, CONFIG_INTERVAL_MAX_VAR
+
+#
+# test_adaptive.py
+#
+#  Runs the control loop against a simulated GPU, idle followed by a step to
+#   full load and back, at the fixed interval and adaptive. The load step is
+#   moved across a whole period so neither loop is favoured by where its ticks
+#   fall, peaks are compared at their worst alignment
+#
+
+SIM_STEP = 0.05         # integration step (s)
+AMBIENT = 25.0          # °C
+THERMAL_RESISTANCE = 0.4  # °C/W with the fan stopped
+FAN_COOLING = 3.0       # thermal resistance is divided by 1 + FAN_COOLING at 100%
+FAN_TAU = 1.5           # fan spin-up time constant (s)
+IDLE_WATTS = 20.0
+LOAD_WATTS = 250.0
+TEMPERATURE_SENSOR_STEP = 1  # temp1_input resolution as presented in degrees
+
+# heatsink time constant (s), with a much slower heatsink every loop peaks at the same
+# temperature whatever its period, this one is fast enough for the period to matter
+THERMAL_TAU = 15.0
+
+PHASE_SECONDS = 120
+ALIGNMENTS = 20
+
+def simulate(curve: FanCurve, phases, interval: float, adaptive: AdaptiveInterval = None) -> list:
+    """
+    runs the loop through `phases` of (seconds, watts), returns per phase the
+    number of control ticks and the peak temperature
+    """
+    temp = AMBIENT + (IDLE_WATTS * THERMAL_RESISTANCE)
+    fan = curve.speed(temp)
+    target = fan
+
+    now = 0.0
+    nextTick = 0.0
+    results = []
+
+    for duration, watts in phases:
+        end = now + duration
+        ticks = 0
+        peak = temp
+
+        while now < end:
+            if now >= nextTick:
+                measured = int(temp / TEMPERATURE_SENSOR_STEP) * TEMPERATURE_SENSOR_STEP
+                target = curve.speed(measured)
+                ticks += 1
+
+                period = adaptive.update(measured, now, curve) if adaptive is not None else interval
+                nextTick = now + period
+
+            fan += (target - fan) * (SIM_STEP / FAN_TAU)
+
+            resistance = THERMAL_RESISTANCE / (1 + (FAN_COOLING * fan / 100))
+            temp += ((AMBIENT + (watts * resistance)) - temp) * (SIM_STEP / THERMAL_TAU)
+
+            peak = max(peak, temp)
+            now += SIM_STEP
+
+        results.append((ticks, peak))
+
+    return results
+
+class SimulatedLoadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        curve = FanCurve(DEFAULTCONFIG[CONFIG_POINT_VAR], staticPos=[100, 100])
+
+        cls.interval = int(DEFAULTCONFIG[CONFIG_INTERVAL_VAR]) / 1000
+        cls.minimum = int(DEFAULTCONFIG[CONFIG_INTERVAL_MIN_VAR]) / 1000
+        cls.maximum = int(DEFAULTCONFIG[CONFIG_INTERVAL_MAX_VAR]) / 1000
+
+        def run(interval, adaptive = False):
+            results = []
+
+            for step in range(ALIGNMENTS):
+                idle = PHASE_SECONDS + (step * cls.maximum / ALIGNMENTS)
+                phases = ((idle, IDLE_WATTS), (PHASE_SECONDS, LOAD_WATTS), (PHASE_SECONDS, IDLE_WATTS))
+
+                results.append(simulate(curve, phases, interval, AdaptiveInterval(cls.minimum, cls.maximum, interval) if adaptive else None))
+
+            return results
+
+        cls.fixed = run(cls.interval)
+        cls.slow = run(cls.maximum)
+        cls.adapted = run(cls.interval, adaptive=True)
+
+    @staticmethod
+    def worst_peak(results):
+        return max(load[1] for _, load, _ in results)
+
+    def test_fewer_ticks_while_idle(self):
+        for fixed, adapted in zip(self.fixed, self.adapted):
+            self.assertLess(adapted[0][0], fixed[0][0])
+
+    def test_no_more_ticks_while_cooling(self):
+        for fixed, adapted in zip(self.fixed, self.adapted):
+            self.assertLessEqual(adapted[2][0], fixed[2][0])
+
+    def test_peak_not_higher_than_fixed(self):
+        self.assertLessEqual(self.worst_peak(self.adapted), self.worst_peak(self.fixed))
+
+    def test_peak_depends_on_the_period(self):
+        # a loop idling at the adaptive rate without adapting overshoots, the comparison above is not vacuous
+        self.assertGreater(self.worst_peak(self.slow), self.worst_peak(self.fixed) + 1.0)
+
+class AdaptiveIntervalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.adaptive = AdaptiveInterval(0.5, 5.0, 2.5)
+        self.curve = FanCurve([[0, 0], [39, 0], [40, 40], [65, 100]], staticPos=[100, 100])
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(0, 5.0)
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(2.0, 1.0)
+
+    def test_grows_while_stable(self):
+        periods = [self.adaptive.update(30, t) for t in range(10)]
+
+        self.assertEqual(periods[0], 2.5 * 1.5)
+        self.assertEqual(periods[-1], 5.0)
+
+    def test_shortens_while_rising(self):
+        for t in range(5):
+            period = self.adaptive.update(30 + (t * 4), t)
+
+        self.assertEqual(period, 0.5)
+
+    def test_bounded_below_a_knee(self):
+        for t in range(10):
+            period = self.adaptive.update(37, t * 5, self.curve)
+
+        self.assertEqual(period, (39 - 37) / 2.0)
+
+    def test_not_bounded_by_a_knee_while_cooling(self):
+        temps = [60, 55, 50, 46, 43, 41, 39, 38]
+        for t, temp in enumerate(temps):
+            period = self.adaptive.update(temp, t * 2, self.curve)
+
+        self.assertGreater(period, (39 - 38) / 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
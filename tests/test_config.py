@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from common.config import Config, config_path, CONFIG_FILE, CONFIG_ENV_VAR, CONFIG_INTERVAL_VAR, CONFIG_POINT_VAR
+
+#
+# test_config.py
+#
+#  Writes of the configuration file, the debounce of `setValue`, the atomic
+#   replace and the move from the working directory to the XDG location
+#
+
+# long enough for a burst of `setValue` calls to land within it
+SAVE_DELAY = 0.2
+
+class ConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.root.name, 'xdg', 'qt-amdgpu-fan-ctl', CONFIG_FILE)
+
+        # the working directory is checked for a configuration to move
+        self.cwd = os.getcwd()
+        os.chdir(self.root.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.root.cleanup()
+
+    def stored(self, path = None) -> dict:
+        with open(path or self.path) as f:
+            return json.load(f)
+
+    def test_defaults_are_written(self):
+        config = Config(self.path)
+
+        self.assertEqual(self.stored(), json.loads(json.dumps(config.myConfig)))
+        self.assertFalse(config.dirty)
+
+    def test_unchanged_configuration_is_not_written(self):
+        config = Config(self.path)
+
+        self.assertFalse(config.save())
+
+        config.setValue(CONFIG_INTERVAL_VAR, config.getValue(CONFIG_INTERVAL_VAR))
+        self.assertFalse(config.dirty)
+
+    def test_changes_are_debounced(self):
+        config = Config(self.path, SAVE_DELAY)
+
+        with mock.patch('common.config.os.replace', wraps=os.replace) as replace:
+            for interval in ('1000', '1500', '2000'):
+                config.setValue(CONFIG_INTERVAL_VAR, interval)
+
+            self.assertTrue(config.dirty)
+            self.assertNotEqual(self.stored()[CONFIG_INTERVAL_VAR], '2000')
+
+            time.sleep(SAVE_DELAY * 3)
+
+        self.assertEqual(replace.call_count, 1)
+        self.assertFalse(config.dirty)
+        self.assertEqual(self.stored()[CONFIG_INTERVAL_VAR], '2000')
+
+    def test_flush(self):
+        config = Config(self.path, 3600)
+        config.setValue(CONFIG_INTERVAL_VAR, '1000')
+
+        config.flush()
+
+        self.assertFalse(config.dirty)
+        self.assertEqual(self.stored()[CONFIG_INTERVAL_VAR], '1000')
+
+    def test_save_is_atomic(self):
+        config = Config(self.path, 3600)
+        os.chmod(self.path, 0o600)
+        before = self.stored()
+
+        config.setValue(CONFIG_INTERVAL_VAR, '1000')
+
+        # a write failing before the rename leaves the previous file and no temporary one
+        with mock.patch('common.config.os.replace', side_effect=OSError('disk full')):
+            self.assertFalse(config.save())
+
+        self.assertEqual(self.stored(), before)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [CONFIG_FILE])
+
+        config.setValue(CONFIG_INTERVAL_VAR, '1500')
+        self.assertTrue(config.save())
+
+        self.assertEqual(self.stored()[CONFIG_INTERVAL_VAR], '1500')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [CONFIG_FILE])
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_configuration_is_moved_from_the_working_directory(self):
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump({ CONFIG_INTERVAL_VAR: '1234', CONFIG_POINT_VAR: [[0, 0], [80, 100]] }, f)
+
+        config = Config(self.path)
+
+        self.assertEqual(config.getValue(CONFIG_INTERVAL_VAR), '1234')
+        self.assertEqual(self.stored()[CONFIG_INTERVAL_VAR], '1234')
+        self.assertEqual(self.stored()[CONFIG_POINT_VAR], [[0, 0], [80, 100]])
+
+        # once moved the file in the working directory is ignored
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump({ CONFIG_INTERVAL_VAR: '4321' }, f)
+
+        self.assertEqual(Config(self.path).getValue(CONFIG_INTERVAL_VAR), '1234')
+
+    def test_config_path(self):
+        with mock.patch.dict(os.environ, { 'XDG_CONFIG_HOME': os.path.join(self.root.name, 'xdg') }):
+            os.environ.pop(CONFIG_ENV_VAR, None)
+            self.assertEqual(config_path(), self.path)
+
+            os.environ[CONFIG_ENV_VAR] = os.path.join(self.root.name, 'other.json')
+            self.assertEqual(config_path(), os.path.join(self.root.name, 'other.json'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import re
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR
+from common.poller import HwMonPoller
+from common.exporter import MetricsStore, MetricsExporter, METRICS_PATH, METRICS_PREFIX
+from common.fakesysfs import make_fake_sysfs
+from common.backends import FakeSysfsBackend, set_backend
+
+#
+# test_exporter.py
+#
+#  Scrapes the metrics exporter over HTTP while a fake sysfs tree of several
+#   cards is controlled, scrapes are answered from the store alone
+#
+
+CARDS = 4
+SCRAPES = 5
+
+SERIES_RE = re.compile(r'^(\w+)\{card="(\d+)",name="([^"]*)"\} (\S+)$')
+
+class ExporterTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.TemporaryDirectory()
+        set_backend(FakeSysfsBackend(make_fake_sysfs(cls.root.name, CARDS)))
+
+        cls.poller = HwMonPoller(DEFAULTCONFIG[CONFIG_POINT_VAR])
+        cls.store = MetricsStore()
+
+        # a control tick as the sampler does it, the states are pushed to the store
+        for index in cls.poller.poll():
+            controller = cls.poller.controllers[index]
+            state = controller.control(cls.poller.schedulers[index].sample())
+            cls.store.update(index, controller.hwmon.interface['name'], state, controller.curve.speed(state.sample.temp1_input_degrees), controller.enabled)
+
+        cls.exporter = MetricsExporter(cls.store, 0)
+        cls.exporter.start()
+
+        cls.url = f'http://{cls.exporter.address[0]}:{cls.exporter.address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.exporter.close()
+        cls.poller.close()
+
+        set_backend(None)
+        cls.root.cleanup()
+
+    def reads(self) -> int:
+        return sum(controller.hwmon.reads for controller in self.poller.controllers.values())
+
+    def scrape(self):
+        with urllib.request.urlopen(self.url + METRICS_PATH) as response:
+            return response.status, response.headers['Content-Type'], response.read().decode('utf-8')
+
+    def test_response(self):
+        status, content_type, _ = self.scrape()
+
+        self.assertEqual(status, 200)
+        self.assertTrue(content_type.startswith('text/plain; version=0.0.4'))
+
+    def test_one_series_per_card(self):
+        _, _, body = self.scrape()
+
+        families = {}
+        for line in body.splitlines():
+            if line.startswith('#'):
+                continue
+
+            match = SERIES_RE.match(line)
+            self.assertIsNotNone(match, line)
+            self.assertTrue(match[1].startswith(METRICS_PREFIX))
+
+            families.setdefault(match[1], []).append(int(match[2]))
+            float(match[4])
+
+        self.assertIn(f'{METRICS_PREFIX}temp1_input_degrees', families)
+
+        for name, cards in families.items():
+            with self.subTest(metric=name):
+                self.assertEqual(sorted(cards), list(range(CARDS)))
+
+    def test_scrapes_read_nothing(self):
+        reads = self.reads()
+
+        for _ in range(SCRAPES):
+            self.scrape()
+
+        self.assertEqual(self.reads(), reads)
+
+    def test_other_paths(self):
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(self.url + '/')
+
+        self.assertEqual(context.exception.code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
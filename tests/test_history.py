@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from common.history import HistoryFile, HISTORY_SAMPLE_FIELDS, HISTORY_HEADER_DTYPE, HISTORY_DTYPE
+
+#
+# test_history.py
+#
+#  Records of the memory-mapped `HistoryFile` across wrap-around, reopening
+#   and a change of capacity
+#
+
+CAPACITY = 8
+
+class HistoryFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.root.name, 'card.history')
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def append(self, history, timestamps):
+        for timestamp in timestamps:
+            history.append(float(timestamp), *(timestamp + i for i in range(len(HISTORY_SAMPLE_FIELDS))))
+
+    def timestamps(self, history, last = None):
+        return history.records(last)['timestamp'].tolist()
+
+    def test_append(self):
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, range(3))
+
+        records = history.records()
+
+        self.assertEqual(history.count, 3)
+        self.assertEqual(records['timestamp'].tolist(), [0.0, 1.0, 2.0])
+        self.assertEqual(records[HISTORY_SAMPLE_FIELDS[-1]].tolist(), [float(len(HISTORY_SAMPLE_FIELDS) - 1 + t) for t in range(3)])
+        self.assertEqual(os.path.getsize(self.path), HISTORY_HEADER_DTYPE.itemsize + CAPACITY * HISTORY_DTYPE.itemsize)
+
+        history.close()
+
+    def test_wrap_around(self):
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, range(CAPACITY + 3))
+
+        self.assertEqual(history.count, CAPACITY)
+        self.assertEqual(self.timestamps(history), [float(t) for t in range(3, CAPACITY + 3)])
+        self.assertEqual(self.timestamps(history, 5), [float(t) for t in range(CAPACITY - 2, CAPACITY + 3)])
+        self.assertEqual(self.timestamps(history, 100), self.timestamps(history))
+
+        # the file never grows
+        self.assertEqual(os.path.getsize(self.path), HISTORY_HEADER_DTYPE.itemsize + CAPACITY * HISTORY_DTYPE.itemsize)
+
+        history.close()
+
+    def test_reopen(self):
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, range(CAPACITY + 3))
+        history.close()
+
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, [100])
+
+        self.assertEqual(self.timestamps(history), [float(t) for t in range(4, CAPACITY + 3)] + [100.0])
+
+        history.close()
+
+    def test_shrink(self):
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, range(CAPACITY + 3))
+        history.close()
+
+        # the most recent records of the previous capacity are kept
+        history = HistoryFile(self.path, 4)
+
+        self.assertEqual(history.count, 4)
+        self.assertEqual(self.timestamps(history), [float(t) for t in range(CAPACITY - 1, CAPACITY + 3)])
+        self.assertEqual(os.path.getsize(self.path), HISTORY_HEADER_DTYPE.itemsize + 4 * HISTORY_DTYPE.itemsize)
+
+        self.append(history, [100])
+        self.assertEqual(self.timestamps(history), [float(t) for t in range(CAPACITY, CAPACITY + 3)] + [100.0])
+
+        history.close()
+
+    def test_grow(self):
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, range(CAPACITY + 3))
+        history.close()
+
+        history = HistoryFile(self.path, CAPACITY * 2)
+
+        self.assertEqual(history.count, CAPACITY)
+        self.assertEqual(self.timestamps(history), [float(t) for t in range(3, CAPACITY + 3)])
+
+        self.append(history, range(100, 100 + CAPACITY + 1))
+
+        self.assertEqual(history.count, CAPACITY * 2)
+        self.assertEqual(self.timestamps(history), [float(t) for t in range(4, CAPACITY + 3)] + [float(t) for t in range(100, 100 + CAPACITY + 1)])
+
+        history.close()
+
+    def test_unknown_layout(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\xff' * 4096)
+
+        history = HistoryFile(self.path, CAPACITY)
+
+        self.assertEqual(history.count, 0)
+        self.assertEqual(len(history.records()), 0)
+
+        history.close()
+
+    def test_readonly(self):
+        history = HistoryFile(self.path, CAPACITY)
+        self.append(history, range(3))
+        history.close()
+
+        history = HistoryFile(self.path, CAPACITY, readonly=True)
+
+        self.assertEqual(self.timestamps(history), [0.0, 1.0, 2.0])
+        with self.assertRaises(ValueError):
+            self.append(history, [3])
+
+        history.close()
+
+if __name__ == '__main__':
+    unittest.main()
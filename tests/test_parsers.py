@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from common.fakesysfs import PP_POWER_PROFILE_MODE_TABLES, PP_DPM_SCLK_TABLES
+from common.hwmonInterface import parse_pp_power_profile_mode, parse_pp_dpm_levels, active_pp_dpm_mhz
+
+#
+# test_parsers.py
+#
+#  pp_power_profile_mode and pp_dpm_sclk tables as reported by several GPU
+#   generations, see `common.fakesysfs`
+#
+
+ALL_PROFILES = ['BOOTUP DEFAULT', '3D FULL SCREEN', 'POWER SAVING', 'VIDEO', 'VR', 'COMPUTE', 'CUSTOM']
+
+def active(profiles):
+    return [p.mode_name for p in profiles if p.active]
+
+class PowerProfileModeTest(unittest.TestCase):
+
+    def parse(self, generation):
+        return parse_pp_power_profile_mode(PP_POWER_PROFILE_MODE_TABLES[generation])
+
+    def test_polaris(self):
+        profiles = self.parse('polaris')
+
+        self.assertEqual([p.mode_name for p in profiles], ALL_PROFILES)
+        self.assertEqual([p.num for p in profiles], list(range(7)))
+        self.assertEqual(active(profiles), ['3D FULL SCREEN'])
+
+        full_screen = profiles[1]
+        self.assertEqual(full_screen.values, ('0', '100', '30', '0', '100', '10'))
+        self.assertEqual(full_screen.sclk_down_hyst, '100')
+        self.assertEqual(full_screen.mclk_active_level, '10')
+
+        self.assertEqual(profiles[2].values, ('10', '0', '30', '-', '-', '-'))
+        self.assertEqual(profiles[0].sclk_up_hyst, '-')
+
+    def test_vega20(self):
+        profiles = self.parse('vega20')
+
+        self.assertEqual([p.mode_name for p in profiles], ALL_PROFILES)
+        self.assertEqual(active(profiles), ['3D FULL SCREEN'])
+        self.assertEqual(profiles[1].values, ('70', '60', '0', '3'))
+        self.assertEqual(profiles[5].values, ('30', '60', '0', '6'))
+
+    def test_navi10_skips_clock_rows(self):
+        profiles = self.parse('navi10')
+
+        self.assertEqual([p.num for p in profiles], [0, 1, 2, 5])
+        self.assertEqual([p.mode_name for p in profiles], ['BOOTUP DEFAULT', '3D FULL SCREEN', 'POWER SAVING', 'COMPUTE'])
+        self.assertEqual(active(profiles), ['3D FULL SCREEN'])
+        self.assertTrue(all(p.values == () for p in profiles))
+
+    def test_vangogh_without_values(self):
+        profiles = self.parse('vangogh')
+
+        self.assertEqual([p.mode_name for p in profiles], ALL_PROFILES)
+        self.assertEqual(active(profiles), ['POWER SAVING'])
+        self.assertTrue(all(p.values == () for p in profiles))
+
+    def test_smu13_single_header_row(self):
+        profiles = self.parse('smu13')
+
+        self.assertEqual([p.mode_name for p in profiles], ALL_PROFILES + ['WINDOW 3D'])
+        self.assertEqual([p.num for p in profiles], list(range(8)))
+        self.assertEqual(active(profiles), ['3D FULL SCREEN'])
+
+    def test_every_generation_has_one_active_profile(self):
+        for generation in PP_POWER_PROFILE_MODE_TABLES:
+            with self.subTest(generation=generation):
+                self.assertEqual(len(active(self.parse(generation))), 1)
+
+    def test_unsupported(self):
+        self.assertEqual(parse_pp_power_profile_mode('Unsupported'), ())
+        self.assertEqual(parse_pp_power_profile_mode(''), ())
+
+class DpmLevelsTest(unittest.TestCase):
+
+    def parse(self, generation):
+        return [(level.index, level.mhz, level.active) for level in parse_pp_dpm_levels(PP_DPM_SCLK_TABLES[generation])]
+
+    def test_polaris(self):
+        levels = self.parse('polaris')
+
+        self.assertEqual(len(levels), 8)
+        self.assertEqual([mhz for _, mhz, _ in levels], [300, 608, 910, 1077, 1145, 1191, 1236, 1266])
+        self.assertEqual([index for index, _, active in levels if active], ['2'])
+        self.assertEqual(active_pp_dpm_mhz(PP_DPM_SCLK_TABLES['polaris']), 910)
+
+    def test_navi10(self):
+        self.assertEqual(self.parse('navi10'), [('0', 800, False), ('1', 1300, True), ('2', 2100, False)])
+        self.assertEqual(active_pp_dpm_mhz(PP_DPM_SCLK_TABLES['navi10']), 1300)
+
+    def test_rdna2_sleep_level(self):
+        self.assertEqual(self.parse('rdna2'), [('S', 19, True), ('0', 500, False), ('1', 2575, False)])
+        self.assertEqual(active_pp_dpm_mhz(PP_DPM_SCLK_TABLES['rdna2']), 19)
+
+    def test_unsupported(self):
+        self.assertEqual(parse_pp_dpm_levels('Unsupported'), ())
+        self.assertEqual(parse_pp_dpm_levels(''), ())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from common.config import Config, CONFIG_PROFILES_VAR, CONFIG_SLOTS_VAR, CONFIG_INTERVAL_VAR
+from common.profiles import ProfileStore
+from common.hwmonInterface import card_identity, accepted_pwm1_enable
+
+#
+# test_profiles.py
+#
+#  Fan profiles resolved for the cards present, including cards moved to
+#   another slot and the cases where a moved card cannot be told apart
+#
+
+RX580 = ('1002:67DF', '1DA2:E366')
+RX6800 = ('1002:73BF', '1458:2327')
+
+SLOT_A = '0000:03:00.0'
+SLOT_B = '0000:04:00.0'
+SLOT_C = '0000:05:00.0'
+
+def card(slot, model = RX580) -> card_identity:
+    return card_identity(slot, *model)
+
+def profile(interval, model = RX580, mode = 'Manual') -> dict:
+    return { 'points': [[0, 0], [interval // 100, 100]], 'interval': str(interval), 'mode': mode, 'model': card('', model).model }
+
+class ProfileStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.root.name, 'config.json')
+
+        self.configs = []
+
+    def tearDown(self):
+        # pending changes are written before the directory is gone
+        for config in self.configs:
+            config.flush()
+
+        self.root.cleanup()
+
+    def store(self, profiles: dict, present: list, slots: list = ()) -> ProfileStore:
+        config = Config(self.path, 3600)
+        config.setValue(CONFIG_PROFILES_VAR, profiles)
+        config.setValue(CONFIG_SLOTS_VAR, list(slots))
+        config.save(False)
+        self.configs.append(config)
+
+        store = ProfileStore(config)
+        store.setPresent(present)
+
+        return store
+
+    def test_profile_by_slot(self):
+        store = self.store({ SLOT_A: profile(1000), SLOT_B: profile(2000) }, [card(SLOT_A), card(SLOT_B)])
+
+        self.assertEqual(store.resolve(card(SLOT_A)).interval, 1000)
+        self.assertEqual(store.resolve(card(SLOT_B)).interval, 2000)
+        self.assertEqual(store.resolve(card(SLOT_B)).mode, accepted_pwm1_enable.Manual)
+        self.assertIn(card(SLOT_A), store)
+
+    def test_default(self):
+        store = self.store({ SLOT_A: profile(1000) }, [card(SLOT_A), card(SLOT_B, RX6800)])
+
+        self.assertIs(store.resolve(card(SLOT_B, RX6800)), store.default)
+        self.assertNotIn(card(SLOT_B, RX6800), store)
+        self.assertEqual(store.default.interval, int(store.config.getValue(CONFIG_INTERVAL_VAR)))
+        self.assertEqual(store.default.mode, accepted_pwm1_enable.Auto)
+
+    def test_slots_are_remembered(self):
+        store = self.store({}, [card(SLOT_B), card(SLOT_A)], [SLOT_C])
+
+        self.assertEqual(store.config.getValue(CONFIG_SLOTS_VAR), [SLOT_C, SLOT_A, SLOT_B])
+
+    def test_moved_card(self):
+        store = self.store({ SLOT_A: profile(1000) }, [card(SLOT_B)], [SLOT_A])
+
+        self.assertEqual(store.resolve(card(SLOT_B)).interval, 1000)
+
+        # the profile moved with the card, the next start finds it by slot
+        self.assertEqual(list(store.config.getValue(CONFIG_PROFILES_VAR)), [SLOT_B])
+        self.assertEqual(self.store(store.config.getValue(CONFIG_PROFILES_VAR), [card(SLOT_B)], [SLOT_A, SLOT_B]).resolve(card(SLOT_B)).interval, 1000)
+
+    def test_card_of_a_seen_slot_keeps_no_profile(self):
+        store = self.store({ SLOT_A: profile(1000) }, [card(SLOT_B)], [SLOT_A, SLOT_B])
+
+        self.assertIs(store.resolve(card(SLOT_B)), store.default)
+        self.assertEqual(list(store.config.getValue(CONFIG_PROFILES_VAR)), [SLOT_A])
+
+    def test_several_cards_without_a_profile(self):
+        store = self.store({ SLOT_A: profile(1000) }, [card(SLOT_B), card(SLOT_C)], [SLOT_A])
+
+        self.assertIs(store.resolve(card(SLOT_B)), store.default)
+        self.assertIs(store.resolve(card(SLOT_C)), store.default)
+
+    def test_several_profiles_without_a_card(self):
+        store = self.store({ SLOT_A: profile(1000), SLOT_B: profile(2000) }, [card(SLOT_C)], [SLOT_A, SLOT_B])
+
+        self.assertIs(store.resolve(card(SLOT_C)), store.default)
+
+    def test_other_model(self):
+        store = self.store({ SLOT_A: profile(1000) }, [card(SLOT_B, RX6800)], [SLOT_A])
+
+        self.assertIs(store.resolve(card(SLOT_B, RX6800)), store.default)
+
+    def test_update(self):
+        store = self.store({}, [card(SLOT_A)])
+        store.bind(0, card(SLOT_A), 90)
+
+        self.assertIs(store.profile(0), store.default)
+
+        store.update(0, points=[[0, 0], [70, 100]], mode=accepted_pwm1_enable.Manual)
+
+        self.assertAlmostEqual(store.curve(0).speed(35), 50)
+        self.assertEqual(store.config.getValue(CONFIG_PROFILES_VAR)[SLOT_A]['mode'], 'Manual')
+        self.assertIs(store.resolve(card(SLOT_A)), store.profile(0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import re
+import tempfile
+import unittest
+
+from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR
+from common.poller import HwMonPoller
+from common.sampler import HwMonSampler
+from common.exporter import MetricsStore
+from common.fakesysfs import make_fake_sysfs
+from common.backends import FakeSysfsBackend, set_backend
+from common.hwmonInterface import accepted_pwm1_enable
+
+#
+# test_sampler.py
+#
+#  Control ticks of the GUI sampler over a fake sysfs tree of several cards,
+#   the ticks are driven from here and the sampler thread is never started
+#
+
+CARDS = 3
+MANUAL = (0, 2)
+
+class SamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.backend = set_backend(FakeSysfsBackend(make_fake_sysfs(self.root.name, CARDS)))
+
+        self.poller = HwMonPoller(DEFAULTCONFIG[CONFIG_POINT_VAR])
+        for index in MANUAL:
+            self.poller.controllers[index].setEnabled(True)
+
+        self.sampler = HwMonSampler(self.poller, { index: 1000 for index in range(CARDS) }, metrics=MetricsStore())
+        self.sampler._schedule_next = lambda: None
+
+        self.sampler._timer_update_tick()
+
+    def tearDown(self):
+        self.poller.release()
+        self.poller.close()
+
+        set_backend(None)
+        self.root.cleanup()
+
+    def read(self, index, attribute):
+        return int(self.backend.read(self.poller.controllers[index].hwmon.interface['path'], attribute))
+
+    def test_every_card_is_controlled(self):
+        for index, controller in self.poller.controllers.items():
+            with self.subTest(card=index):
+                if index in MANUAL:
+                    self.assertEqual(self.read(index, 'pwm1_enable'), accepted_pwm1_enable.Manual.value)
+                    self.assertEqual(self.read(index, 'pwm1'), controller.curve.pwm(45, 255))
+                else:
+                    self.assertEqual(self.read(index, 'pwm1_enable'), accepted_pwm1_enable.Auto.value)
+                    self.assertEqual(self.read(index, 'pwm1'), 128)
+
+    def test_metrics_of_every_card(self):
+        series = re.findall(r'^(\w+)\{card="(\d+)"', self.sampler.metrics.render(), re.MULTILINE)
+
+        families = {}
+        for name, card in series:
+            families.setdefault(name, []).append(int(card))
+
+        self.assertTrue(families)
+        for name, cards in families.items():
+            self.assertEqual(cards, list(range(CARDS)), name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import tempfile
+import unittest
+
+from common.setperms import serve
+
+#
+# test_setperms.py
+#
+#  Requests to the permission helper against a tree laid out like sysfs, the
+#   hwmon class links to nodes below their PCI device
+#
+
+def write(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as f:
+        f.write(value)
+
+class ServeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+
+        self.classDir = os.path.join(root, 'class', 'hwmon')
+        os.makedirs(self.classDir)
+
+        for node, device, name in (('hwmon0', '0000:03:00.0', 'amdgpu'), ('hwmon1', '0000:00:18.3', 'k10temp')):
+            device = os.path.join(root, 'devices', 'pci0000:00', device)
+            hwmon = os.path.join(device, 'hwmon', node)
+
+            write(os.path.join(hwmon, 'name'), name)
+            write(os.path.join(hwmon, 'pwm1'), '128')
+            write(os.path.join(device, 'power_dpm_force_performance_level'), 'auto')
+            os.symlink(os.path.relpath(device, hwmon), os.path.join(hwmon, 'device'))
+            os.symlink(os.path.relpath(hwmon, self.classDir), os.path.join(self.classDir, node))
+
+        write(os.path.join(root, 'devices', 'system', 'cpu', 'online'), '0-7')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def request(self, *paths):
+        wfile = io.StringIO()
+        serve(os.geteuid(), io.StringIO(''.join(f'{path}\n' for path in paths)), wfile, self.classDir)
+
+        return wfile.getvalue().splitlines()
+
+    def test_accepts_amdgpu_attributes(self):
+        responses = self.request(
+            os.path.join(self.classDir, 'hwmon0', 'pwm1'),
+            os.path.join(self.classDir, 'hwmon0', 'device', 'power_dpm_force_performance_level')
+        )
+
+        self.assertEqual(responses, ['OK', 'OK'])
+
+    def test_refuses_other_paths(self):
+        responses = self.request(
+            os.path.join(self.classDir, 'hwmon1', 'pwm1'),
+            os.path.join(self.classDir, 'hwmon1', 'device', 'power_dpm_force_performance_level'),
+            os.path.join(self.tmp.name, 'devices', 'system', 'cpu', 'online'),
+            os.path.join(self.classDir, 'hwmon0', 'device', '..', '..', 'system', 'cpu', 'online'),
+            os.path.join(self.classDir, 'hwmon0', 'device'),
+            '/etc/passwd'
+        )
+
+        self.assertEqual(len(responses), 6)
+        for response in responses:
+            self.assertTrue(response.startswith('ERR '), response)
+
+if __name__ == '__main__':
+    unittest.main()
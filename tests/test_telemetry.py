@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from common.controller import controller_state
+from common.hwmonInterface import hwmon_sample
+from common.telemetry import TelemetryLogger, TELEMETRY_DTYPE, read_telemetry
+
+#
+# test_telemetry.py
+#
+#  Control ticks written by the `TelemetryLogger` and read back, across
+#   batches, rotated files and a record cut short by a crash
+#
+
+def state(temp: int) -> controller_state:
+    return controller_state(hwmon_sample(
+        temp1_input_degrees=temp, temp1_crit_degrees=100, pwm1=temp * 2, pwm1_max=255, pwm1_enable=1,
+        fan1_percent=temp, fan1_input=temp * 30, power1_average_watts=temp + 100, in0_input=800,
+        pp_dpm_mclk_mhz=1000, pp_dpm_sclk_mhz=temp * 10, power_dpm_force_performance_level='auto',
+        pp_power_profile_mode_name='3D FULL SCREEN', current_link_speed='8.0 GT/s PCIe'
+    ), temp * 2 + 1)
+
+class TelemetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.root.name, 'telemetry.bin')
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def record(self, logger, temps, card = 0):
+        for temp in temps:
+            logger.record(card, state(temp), temp / 2, timestamp=float(temp))
+
+    def test_round_trip(self):
+        logger = TelemetryLogger(self.path, batch=4)
+        self.record(logger, range(40, 50), card=3)
+        logger.close()
+
+        records = read_telemetry(self.path)
+
+        self.assertEqual(records.dtype, TELEMETRY_DTYPE)
+        self.assertEqual(records['timestamp'].tolist(), [float(t) for t in range(40, 50)])
+        self.assertTrue((records['card'] == 3).all())
+        self.assertEqual(records['temp1_input_degrees'].tolist(), list(range(40, 50)))
+        self.assertEqual(records['pwm1'].tolist(), [t * 2 for t in range(40, 50)])
+        self.assertEqual(records['target_pwm'].tolist(), [t * 2 + 1 for t in range(40, 50)])
+        self.assertEqual(records['curve_percent'].tolist(), [t / 2 for t in range(40, 50)])
+        self.assertEqual(records['pp_dpm_sclk_mhz'].tolist(), [t * 10 for t in range(40, 50)])
+
+    def test_batches_are_written_when_full(self):
+        logger = TelemetryLogger(self.path, batch=4, flushInterval=3600)
+
+        self.record(logger, range(3))
+        self.assertEqual(len(read_telemetry(self.path)), 0)
+
+        self.record(logger, [3])
+        self.assertEqual(len(read_telemetry(self.path)), 4)
+
+        logger.close()
+
+    def test_flush_due(self):
+        logger = TelemetryLogger(self.path, batch=16, flushInterval=3600)
+        self.record(logger, range(3))
+
+        logger.flushDue()
+        self.assertEqual(len(read_telemetry(self.path)), 0)
+
+        logger.flushInterval = 0
+        logger.flushDue()
+        self.assertEqual(len(read_telemetry(self.path)), 3)
+
+        logger.close()
+
+    def test_rotation(self):
+        # a record per batch and a file per record, the oldest records fall off the backups
+        logger = TelemetryLogger(self.path, batch=1, maxBytes=1, backups=3)
+        self.record(logger, range(6))
+        logger.close()
+
+        self.assertEqual(sorted(os.listdir(self.root.name)), ['telemetry.bin', 'telemetry.bin.1', 'telemetry.bin.2', 'telemetry.bin.3'])
+
+        self.assertEqual(read_telemetry(self.path, backups=3)['timestamp'].tolist(), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(read_telemetry(self.path, backups=1)['timestamp'].tolist(), [4.0, 5.0])
+
+    def test_truncated_record(self):
+        logger = TelemetryLogger(self.path)
+        self.record(logger, range(3))
+        logger.close()
+
+        with open(self.path, 'ab') as f:
+            f.write(b'\0' * (TELEMETRY_DTYPE.itemsize // 2))
+
+        self.assertEqual(len(read_telemetry(self.path)), 3)
+
+        # appending drops the partial record so the new ones stay aligned
+        logger = TelemetryLogger(self.path)
+        self.record(logger, [3])
+        logger.close()
+
+        self.assertEqual(read_telemetry(self.path)['timestamp'].tolist(), [0.0, 1.0, 2.0, 3.0])
+
+    def test_missing_file(self):
+        records = read_telemetry(self.path)
+
+        self.assertEqual(records.dtype, TELEMETRY_DTYPE)
+        self.assertEqual(len(records), 0)
+
+if __name__ == '__main__':
+    unittest.main()
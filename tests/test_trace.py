@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from common.config import DEFAULTCONFIG, CONFIG_POINT_VAR
+from common.backends import SimulatedBackend, set_backend, SIM_LOAD_PERIOD
+from common.trace import RecordingBackend, ReplayBackend
+from common.hwmonInterface import HwMon
+from common.controller import FanController
+from common.curve import FanCurve
+
+#
+# test_trace.py
+#
+#  A simulated session recorded to a trace and replayed, as fast as it is
+#   read and against a clock, the replayed control ticks match the recorded ones
+#
+
+CARDS = 2
+
+# a full idle and load cycle of every card
+SECONDS = int(SIM_LOAD_PERIOD)
+
+class TraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.clock = [0.0]
+
+    def tearDown(self):
+        set_backend(None)
+        self.root.cleanup()
+
+    def controllers(self):
+        return [FanController(HwMon(index), FanCurve(DEFAULTCONFIG[CONFIG_POINT_VAR]), enabled=True) for index in range(CARDS)]
+
+    def run_session(self, controllers, seconds = SECONDS):
+        """ a control tick of every card per second of `clock`, the samples by card """
+        samples = [[] for _ in controllers]
+
+        for second in range(seconds):
+            self.clock[0] = float(second)
+
+            for card, controller in enumerate(controllers):
+                samples[card].append(controller.tick().sample)
+
+        return samples
+
+    def record(self, name):
+        path = os.path.join(self.root.name, name)
+        clock = lambda: self.clock[0]
+
+        backend = set_backend(RecordingBackend(SimulatedBackend(CARDS, clock=clock), path, clock=clock))
+        self.interfaces = backend.discover()
+
+        controllers = self.controllers()
+        samples = self.run_session(controllers)
+
+        for controller in controllers:
+            controller.release()
+
+        backend.close()
+
+        return path, samples
+
+    def test_replay_as_fast_as_read(self):
+        path, recorded = self.record('session.trace')
+
+        backend = set_backend(ReplayBackend(path, speed=0))
+
+        self.assertEqual(backend.discover(), self.interfaces)
+        self.assertAlmostEqual(backend.duration, SECONDS - 1)
+
+        replayed = self.run_session(self.controllers())
+
+        self.assertEqual(replayed, recorded)
+        for samples in recorded:
+            self.assertGreater(len({ sample.temp1_input_degrees for sample in samples }), 1)
+
+        # writes reach nothing, the recorded reads already reflect them
+        self.assertGreater(backend.writes, 0)
+
+    def test_replay_against_the_clock(self):
+        path, recorded = self.record('session.trace.gz')
+
+        clock = [0.0]
+        backend = set_backend(ReplayBackend(path, speed=10, clock=lambda: clock[0]))
+        hwmon = HwMon(1)
+
+        for second in (0, 5, 37, SECONDS - 2):
+            clock[0] = second / 10
+            self.assertEqual(hwmon.snapshot().temp1_input_degrees, recorded[1][second].temp1_input_degrees, second)
+
+        # the trace starts over once it ends
+        clock[0] = (SECONDS - 1 + 5) / 10
+        self.assertEqual(hwmon.snapshot().temp1_input_degrees, recorded[1][5].temp1_input_degrees)
+
+    def test_unknown_interface(self):
+        path, _ = self.record('session.trace')
+
+        backend = ReplayBackend(path, speed=0)
+
+        self.assertIsNone(backend.read('/nonexistent', 'temp1_input'))
+        with self.assertRaises(FileNotFoundError):
+            backend.write('/nonexistent', 'pwm1', '128')
+
+    def test_invalid_trace(self):
+        path = os.path.join(self.root.name, 'invalid.trace')
+        with open(path, 'w') as f:
+            f.write('{"version": 0}\n')
+
+        with self.assertRaises(ValueError):
+            ReplayBackend(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtCore, QtWidgets
+from common.timings import PhaseTimings, TIMINGS, phase_stats
+
+import logging
+
+LOG = logging.getLogger(__name__)
+
+class DebugWindow(QtWidgets.QDialog):
+    """
+    Shows the percentiles of every timed phase of the ticks, refreshed every
+    `REFRESH` milliseconds while visible
+    """
+    REFRESH = 1000
+
+    def __init__(self, timings: PhaseTimings = TIMINGS):
+
+        super(DebugWindow, self).__init__()
+
+        self.setWindowTitle('Tick Timings')
+        self.resize(560, 260)
+        self.setWindowFlag(QtCore.Qt.SubWindow)
+
+        self.timings = timings
+
+        self._init_layout()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def _init_layout(self):
+        layout = QtWidgets.QVBoxLayout(self)
+
+        self.table = QtWidgets.QTableWidget(0, len(phase_stats._fields), self)
+        self.table.setHorizontalHeaderLabels([field if field == 'count' else f'{field} (ms)' for field in phase_stats._fields])
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons = QtWidgets.QHBoxLayout()
+
+        self.checkBoxRecord = QtWidgets.QCheckBox('Record timings', self)
+        self.checkBoxRecord.setChecked(self.timings.enabled)
+        self.checkBoxRecord.toggled.connect(self._check_record_toggled)
+        buttons.addWidget(self.checkBoxRecord)
+        buttons.addStretch()
+
+        self.pushButtonReset = QtWidgets.QPushButton('Reset', self)
+        self.pushButtonReset.clicked.connect(self._button_reset_clicked)
+        buttons.addWidget(self.pushButtonReset)
+
+        self.pushButtonDump = QtWidgets.QPushButton('Dump to Log', self)
+        self.pushButtonDump.clicked.connect(lambda: self.timings.dump())
+        buttons.addWidget(self.pushButtonDump)
+
+        layout.addLayout(buttons)
+
+    def _check_record_toggled(self, value):
+        self.timings.enabled = value
+
+    def _button_reset_clicked(self):
+        self.timings.reset()
+        self.refresh()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(self.REFRESH)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        stats = self.timings.stats()
+
+        self.table.setRowCount(len(stats))
+        self.table.setVerticalHeaderLabels(list(stats))
+
+        for row, s in enumerate(stats.values()):
+            for column, value in enumerate(s):
+                text = str(value) if column == 0 else f'{value:.3f}'
+                item = self.table.item(row, column)
+
+                if item is None:
+                    item = QtWidgets.QTableWidgetItem()
+                    item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+
+                item.setText(text)
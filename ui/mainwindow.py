@@ -150,7 +150,6 @@ class Ui_MainWindow(object):
         self.labelSLabel.setObjectName("labelSLabel")
         self.horizontalLayout_2.addWidget(self.labelSLabel)
         self.checkBoxEnableLogging = QtWidgets.QCheckBox(self.centralwidget)
-        self.checkBoxEnableLogging.setCheckable(False)
         self.checkBoxEnableLogging.setObjectName("checkBoxEnableLogging")
         self.horizontalLayout_2.addWidget(self.checkBoxEnableLogging)
         spacerItem1 = QtWidgets.QSpacerItem(40, 18, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
@@ -3,18 +3,30 @@
 import pyqtgraph as pg
 
 from enum import Enum
+from typing import NamedTuple
 from PyQt5 import QtCore, QtGui, QtWidgets
 from pyqtgraph import PlotWidget
-from common.graphs import InitPlotWidget, ScrollingGraph, graph_add_data
-from common.hwmonInterface import sysfs_device_hwmon_monitors_amdgpu, HwMon
+from common.graphs import InitPlotWidget, ScrollingGraph
+from common.hwmonInterface import sysfs_device_hwmon_monitors_amdgpu, HwMon, hwmon_sample
 from common.theme import set_dark_rounded_css
+from common.timings import TIMINGS
 
 import logging
 
 LOG = logging.getLogger(__name__)
 
+class monitor_handles(NamedTuple):
+    """
+    widgets belonging to a single monitor, created by `_add_monitor_widget`
+    """
+    value: QtWidgets.QLabel
+    min: QtWidgets.QLabel
+    max: QtWidgets.QLabel
+    plotWidget: PlotWidget
+    graph: ScrollingGraph
+
 class MonitorWindow(QtWidgets.QDialog):
-    def __init__(self, hwmon: HwMon):
+    def __init__(self, hwmon: HwMon, history: int = ScrollingGraph.HISTORY):
 
         super(MonitorWindow, self).__init__()
         
@@ -24,6 +36,7 @@ class MonitorWindow(QtWidgets.QDialog):
         self.setContentsMargins(0, 0, 0, 0)
 
         self.hwmon = hwmon
+        self.history = history
         self.objects = {}
 
         self._init_layout()
@@ -96,54 +109,63 @@ class MonitorWindow(QtWidgets.QDialog):
         gridLayout.addWidget(labelDeviceMax, 2, 1, 1, 1)
 
         InitPlotWidget(graphicsView)
-        ScrollingGraph(graphicsView, getattr(self.hwmon, attr['attribute']), attr['maximum'])
+        graph = ScrollingGraph(graphicsView, getattr(self.hwmon, attr['attribute']), attr['maximum'], self.history)
         set_dark_rounded_css(graphicsView)
 
         self.centralwidget.layout().addWidget(frame)
 
-    def _get_monitor_widget(self, base_name, ext):
-
-        for i in range(1, self.centralwidget.layout().count()):
-            frame = self.centralwidget.layout().itemAt(i).widget()
-
-            if (frame.objectName() == f'{base_name}_frame'):
-                for child in frame.children():
-                    if (not hasattr(child, 'objectName')):
-                        continue
-
-                    if (child.objectName() == f'{base_name}_{ext}'):
-                        return child
+        # keep the widgets at hand so refreshing never searches the layout
+        self.objects[attr['attribute']] = monitor_handles(
+            value=labelDeviceValue,
+            min=labelDeviceMin,
+            max=labelDeviceMax,
+            plotWidget=graphicsView,
+            graph=graph
+        )
 
-        raise LookupError(f'No child found matching {base_name}_{ext}...')
+    def _get_monitor_widget(self, base_name, ext):
+        try:
+            return getattr(self.objects[base_name], ext)
+        except (KeyError, AttributeError):
+            raise LookupError(f'No child found matching {base_name}_{ext}...')
         
-    def append_monitor_data(self, monitor: sysfs_device_hwmon_monitors_amdgpu):
+    def append_monitor_data(self, monitor: sysfs_device_hwmon_monitors_amdgpu, sample: hwmon_sample):
         
         base_attr = monitor['attribute']
-        base_value = getattr(self.hwmon, base_attr)
+        base_value = getattr(sample, base_attr)
+        handles = self.objects[base_attr]
+
+        # update each label with their respective values, min and max are tracked by `hwmon`
+        handles.value.setText(f"Value: {base_value} {monitor['unit']}")
+        handles.min.setText(f"Min: {getattr(self.hwmon, f'{base_attr}_min')} {monitor['unit']}")
+        handles.max.setText(f"Max: {getattr(self.hwmon, f'{base_attr}_max')} {monitor['unit']}")
 
-        # update each widget with their respective values
-        for key in ['value', 'min', 'max']:
-            widget = self._get_monitor_widget(base_attr, key)
+        # update the graph for monitor with the new value
+        handles.graph.append_data(base_value)
 
-            if ((type(widget) == PlotWidget) or (widget == None)):
-                continue
+    def clear(self):
+        """ empties the graphs and the min and max of every monitor, e.g. when another card is shown """
+        self.hwmon.reset_ext_attributes()
 
-            sub_attr = '' if (key == 'value') else f'_{key}'
-            
-            # find the value for associated label
-            value = getattr(self.hwmon, f'{base_attr}{sub_attr}')
+        for handles in self.objects.values():
+            handles.graph.clear_data()
+
+    def load_history(self, records):
+        """ fills the graphs with `HISTORY_DTYPE` records ordered from oldest to newest """
+        for attr in sysfs_device_hwmon_monitors_amdgpu:
+            base_attr = attr.value['attribute']
 
-            # update the label text
-            widget.setText(f"{key.title()}: {value} {monitor['unit']}")
+            if base_attr in records.dtype.names:
+                self.objects[base_attr].graph.extend_data(records[base_attr])
 
-        # acquire graph for monitor, and update with the new value
-        graph = self._get_monitor_widget(base_attr, 'plotWidget')
-        graph_add_data(graph, base_value)
+    @TIMINGS.timed('MonitorWindow.refresh_monitors')
+    def refresh_monitors(self, sample: hwmon_sample = None):
 
-    def refresh_monitors(self):
+        if sample is None:
+            sample = self.hwmon.snapshot()
 
-        self.hwmon.update_ext_attributes()
+        self.hwmon.update_ext_attributes(sample)
 
         for attr in sysfs_device_hwmon_monitors_amdgpu:
-            if hasattr(self.hwmon, attr.value['attribute']):
-                self.append_monitor_data(attr.value)
+            if hasattr(sample, attr.value['attribute']):
+                self.append_monitor_data(attr.value, sample)